@@ -63,7 +63,19 @@ LOGOUT_REDIRECT_URL = '/'
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+# Per-view query counts and timings: Server-Timing response headers and
+# Prometheus metrics at /metrics (staff, or METRICS_TOKEN as a bearer
+# token). Off by default; when off the middleware removes itself.
+REQUEST_METRICS = os.environ.get(
+    "REQUEST_METRICS", "").lower() in ("1", "true", "yes")
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+# Requests running more SQL queries than this are logged as warnings
+QUERY_BUDGET = int(os.environ.get("QUERY_BUDGET", 25))
+
 MIDDLEWARE = [
+    # Outermost, so its timings cover every other middleware
+    'shop.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -71,6 +83,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'shop.guest_cart.GuestCartMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
 ]
@@ -79,7 +92,8 @@ ROOT_URLCONF = 'dragonshoard.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timing renders for the request metrics
+        'BACKEND': 'shop.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -88,12 +102,14 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'shop.context_processors.badge_counts',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'dragonshoard.wsgi.application'
+ASGI_APPLICATION = 'dragonshoard.asgi.application'
 
 
 # Database
@@ -106,12 +122,150 @@ WSGI_APPLICATION = 'dragonshoard.wsgi.application'
 #     }
 # }
 
+# Served through ASGI (uvicorn workers) rather than WSGI, see gunicorn.conf.py
+ASGI = os.environ.get("ASGI", "").lower() in ("1", "true", "yes")
+
+# Persistent connections: seconds a connection is reused across requests
+# (0 closes it after every request), checked for health before reuse.
+# Under ASGI each request may run on a new thread, so connections are not
+# kept; use DB_POOL there instead.
 DATABASES = {
-    'default': dj_database_url.parse(os.environ.get("DATABASE_URL"))
+    'default': dj_database_url.parse(
+        os.environ.get("DATABASE_URL"),
+        conn_max_age=int(
+            os.environ.get("DB_CONN_MAX_AGE", 0 if ASGI else 600)),
+        conn_health_checks=True,
+    )
+}
+
+if 'test' in sys.argv and os.environ.get("TEST_DATABASE_URL"):
+    # Tests on another database, e.g. Postgres for the row lock races
+    # SQLite cannot produce
+    DATABASES['default'] = dj_database_url.parse(
+        os.environ["TEST_DATABASE_URL"])
+elif 'test' in sys.argv:
+    # A file rather than an in-memory database, so the cart concurrency
+    # tests can write from several threads. IMMEDIATE transactions take
+    # the write lock up front and wait for it, instead of failing when a
+    # read lock cannot be upgraded. Writers therefore never overlap, so
+    # row lock races are only tested with TEST_DATABASE_URL.
+    DATABASES['default'].update({
+        'ENGINE': 'django.db.backends.sqlite3',
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
+    })
+
+# Optional native connection pool (Postgres with psycopg 3 and
+# psycopg-pool installed). Pooling replaces persistent connections.
+if (os.environ.get("DB_POOL", "").lower() in ("1", "true", "yes")
+        and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+        'max_size': int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+        'timeout': int(os.environ.get("DB_POOL_TIMEOUT", 10)),
+    }
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Backend for rendered product pages: "locmem" (dev), "file" or "redis"
+PRODUCT_PAGE_CACHE = os.environ.get("PRODUCT_PAGE_CACHE", "locmem")
+
+# Backend for catalog facet counts. Every worker updates these counters,
+# so production needs a cache shared between processes ("redis")
+CATALOG_CACHE = os.environ.get("CATALOG_CACHE", PRODUCT_PAGE_CACHE)
+
+# Backend for sessions (and the guest carts kept in them) under the
+# "cached_db" and "cache" session engines, and for the navbar badge
+# counts; shared between processes in production ("redis")
+SESSION_CACHE = os.environ.get("SESSION_CACHE", CATALOG_CACHE)
+
+# Backend the workers publish their request metrics to. /metrics only
+# sums every worker's totals in a cache shared between them ("redis")
+METRICS_CACHE = os.environ.get("METRICS_CACHE", CATALOG_CACHE)
+
+# Backends shared by the product_pages, catalog, sessions and metrics
+# caches. redis is the only one shared between servers; locmem is per process.
+SHARED_CACHES = ('redis',)
+
+
+def shared_cache(backend, name):
+    """
+    Settings for one cache alias on the given backend. Aliases on the
+    same backend get their own store, so they cannot evict, or clear,
+    each other's entries.
+    """
+    if backend == 'locmem':
+        return {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': name,
+        }
+    if backend == 'file':
+        return {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(os.environ.get(
+                "PRODUCT_PAGE_CACHE_DIR", os.path.join(BASE_DIR, 'cache')),
+                name),
+        }
+    if backend == 'redis':
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get("REDIS_URL", "redis://127.0.0.1:6379"),
+            'KEY_PREFIX': name,
+        }
+    raise ValueError(f"Unknown cache backend {backend!r}")
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'product_pages': {
+        **shared_cache(PRODUCT_PAGE_CACHE, 'product-pages'),
+        'TIMEOUT': int(os.environ.get("PRODUCT_PAGE_CACHE_TIMEOUT", 3600)),
+    },
+    'catalog': shared_cache(CATALOG_CACHE, 'catalog'),
+    'sessions': shared_cache(SESSION_CACHE, 'session'),
+    'metrics': shared_cache(METRICS_CACHE, 'metrics'),
 }
 
 if 'test' in sys.argv:
-    DATABASES['default']['ENGINE'] = 'django.db.backends.sqlite3'
+    # Tests opt in to page caching explicitly
+    CACHES['product_pages'] = {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+    CACHES['catalog'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+    }
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    }
+    CACHES['metrics'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'metrics',
+    }
+
+# Sessions
+# https://docs.djangoproject.com/en/5.2/topics/http/sessions/
+
+# Where sessions live: "db", "cached_db" (reads from the cache, writes
+# through to the database), "cache" (no database writes, but sessions
+# are lost on eviction) or "signed_cookies" (kept by the browser)
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+# A session cached in one worker's memory goes stale when another
+# worker changes it, so sessions are only cached in a shared cache
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get(
+    "SESSION_BACKEND",
+    "cached_db" if SESSION_CACHE in SHARED_CACHES else "db")]
+SESSION_CACHE_ALIAS = 'sessions'
 
 CSRF_TRUSTED_ORIGINS = [
     "https://*.codeinstitute-ide.net/",
@@ -138,6 +292,10 @@ AUTH_PASSWORD_VALIDATORS = [
 
 ACCOUNT_EMAIL_VERIFICATION = 'none'
 
+# Minutes a cart line holds its reserved stock before it is swept back
+CART_RESERVATION_MINUTES = int(
+    os.environ.get("CART_RESERVATION_MINUTES", 30))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -158,6 +316,27 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static'), ]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic bundles, hashes and gzip/Brotli-compresses static files;
+# Whitenoise serves the hashed names with immutable far-future headers
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'shop.storage.BundledStaticFilesStorage',
+    },
+}
+
+# Small CSS/JS files joined into one file each at collectstatic time,
+# linked with {% static_bundle %}
+STATIC_BUNDLES = {
+    'js/product.js': ['js/reviews.js', 'js/wishlist.js'],
+}
+
+# Tests run against the same storage, after collecting static files
+# into a temporary STATIC_ROOT (see shop.runner)
+TEST_RUNNER = 'shop.runner.StaticFilesTestRunner'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,16 @@
+"""
+Gunicorn configuration for The Dragon's Hoard.
+
+Serves the WSGI app with sync workers by default. Set ASGI=true to serve
+the ASGI app with uvicorn workers instead, so the async cart, wishlist
+and product views do not pin a worker while waiting on the database.
+"""
+import os
+
+if os.environ.get("ASGI", "").lower() in ("1", "true", "yes"):
+    wsgi_app = "dragonshoard.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "dragonshoard.wsgi"
+
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
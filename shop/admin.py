@@ -1,16 +1,32 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django_summernote.admin import SummernoteModelAdmin
 from .models import Product, Cart_Item, Wishlist, Wishlist_Item, Review
+from .cart import set_on_hand
+from .forms import ProductAdminForm
+from .search import matching_products
+from .facets import set_listed
+from .reviews import (
+    approve_reviews, reject_reviews, rebuild_review_aggregates)
 
 
 @admin.action(description="List Items")
 def list_items(productadmin, request, queryset):
-    queryset.update(status=True)
+    set_listed(queryset, True)
 
 
 @admin.action(description="Delist Items")
 def delist_items(productadmin, request, queryset):
-    queryset.update(status=False)
+    set_listed(queryset, False)
+
+
+@admin.action(description="Approve Reviews")
+def approve_selected(reviewadmin, request, queryset):
+    approve_reviews(queryset)
+
+
+@admin.action(description="Reject (Delete) Reviews")
+def reject_selected(reviewadmin, request, queryset):
+    reject_reviews(queryset)
 
 
 @admin.register(Product)
@@ -19,21 +35,93 @@ class ProductAdmin(SummernoteModelAdmin):
     Lists fields for display in admin, fileds for search,
     field filters, fields to prepopulate and rich-text editor.
     """
+    form = ProductAdminForm
     list_display = (
         'product_name',
+        'sku',
         'price',
-        'stock_quantity',
+        'available',
+        'reserved_quantity',
         'category',
         'updated_on',
     )
+    readonly_fields = ('reserved_quantity',)
     search_fields = ['product_name', 'subtitle', 'description',]
     list_filter = ('category', 'updated_on')
     summernote_fields = ('description',)
     actions = [list_items, delist_items]
 
+    @admin.display(description="Available stock", ordering='stock_quantity')
+    def available(self, obj):
+        return obj.stock_quantity
+
+    def save_model(self, request, obj, form, change):
+        """
+        Save only the fields on the form, so stock reserved or released
+        while the form was open is not overwritten, then set stock on
+        hand under a row lock if it was changed.
+        """
+        on_hand = form.cleaned_data['on_hand']
+        if not change:
+            obj.stock_quantity = on_hand
+            obj.save()
+            return
+        obj.save(update_fields=[
+            *(name for name in form.fields if name != 'on_hand'),
+            'updated_on'])
+        if 'on_hand' in form.changed_data and not set_on_hand(obj.pk, on_hand):
+            self.message_user(
+                request,
+                f"Stock on hand of {obj} was not changed: more units are "
+                "now held in carts.", messages.WARNING)
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search through the full-text index instead of icontains scans.
+        """
+        if not search_term.strip():
+            return queryset, False
+        return matching_products(queryset, search_term), False
+
+
+@admin.register(Review)
+class ReviewAdmin(admin.ModelAdmin):
+    """
+    Moderation queue: pending reviews first, with bulk approve/reject
+    actions that keep product ratings in step.
+    """
+    list_display = (
+        'title',
+        'product_id',
+        'username',
+        'review_score',
+        'approved',
+        'created_on',
+    )
+    list_filter = ('approved', 'created_on')
+    list_select_related = ('product_id', 'username')
+    ordering = ('approved', 'created_on')
+    actions = [approve_selected, reject_selected]
+
+    def save_model(self, request, obj, form, change):
+        """
+        Editing a review (e.g. ticking approved) can change its
+        product's rating, so recompute it.
+        """
+        super().save_model(request, obj, form, change)
+        product_ids = {obj.product_id_id}
+        if change and 'product_id' in form.changed_data:
+            product_ids.add(form.initial['product_id'])
+        rebuild_review_aggregates(Product.objects.filter(pk__in=product_ids))
+
+    def delete_model(self, request, obj):
+        reject_reviews(Review.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        reject_reviews(queryset)
+
 
 # Register your models here.
-admin.site.register(Review)
 admin.site.register(Cart_Item)
 admin.site.register(Wishlist)
 admin.site.register(Wishlist_Item)
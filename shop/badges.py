@@ -0,0 +1,116 @@
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Cart_Item, Wishlist_Item
+
+# Cache alias for the counts: per-user data, kept alongside the sessions.
+# Every worker adjusts the counts, so production needs this cache shared
+# between processes (SESSION_CACHE=redis); with a per-process cache a
+# worker shows its own copy until BADGE_TIMEOUT expires it.
+BADGE_CACHE = 'sessions'
+
+# Counts changed outside the cart and wishlist views (e.g. a product
+# deleted in the admin) are corrected at most this many seconds later
+BADGE_TIMEOUT = 3600
+
+# Units in the cart, and products on the wishlist
+BADGES = ('cart', 'wishlist')
+
+
+def _cache():
+    return caches[BADGE_CACHE]
+
+
+def _key(badge, user_id):
+    return f'badge:{badge}:{user_id}'
+
+
+def _version_key(user_id):
+    return f'badge:version:{user_id}'
+
+
+def _counted_key(user_id):
+    return f'badge:counted:{user_id}'
+
+
+def _bump_version(user_id):
+    """
+    Mark counts recounted before now as possibly stale. The version is
+    stored with the counts as of their recount, so a recount that raced
+    a change it may have missed no longer matches, and is counted again.
+    """
+    cache = _cache()
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=BADGE_TIMEOUT):
+            cache.incr(key)
+
+
+def count_badges(user_id):
+    """
+    Count a user's cart units and wishlist items in one query.
+    """
+    cart = Cart_Item.objects.filter(
+        user=OuterRef('pk')
+    ).order_by().values('user').annotate(total=Sum('quantity')).values('total')
+    wishlist = Wishlist_Item.objects.filter(
+        wishlist__user=OuterRef('pk')
+    ).order_by().values('wishlist__user').annotate(
+        total=Count('pk')).values('total')
+    counts = User.objects.filter(pk=user_id).values(
+        cart=Coalesce(Subquery(cart), 0),
+        wishlist=Coalesce(Subquery(wishlist), 0),
+    ).first()
+    return counts or dict.fromkeys(BADGES, 0)
+
+
+def user_badges(user_id):
+    """
+    A user's badge counts, from the cache when present (no queries), or
+    counted and cached.
+    """
+    keys = {_key(badge, user_id): badge for badge in BADGES}
+    version_key, counted_key = _version_key(user_id), _counted_key(user_id)
+    cached = _cache().get_many([*keys, version_key, counted_key])
+    version = cached.pop(version_key, 0)
+    if (cached.pop(counted_key, None) == version
+            and len(cached) == len(keys)):
+        return {keys[key]: count for key, count in cached.items()}
+    counts = count_badges(user_id)
+    _cache().set_many({
+        **{_key(badge, user_id): counts[badge] for badge in BADGES},
+        counted_key: version,
+    }, timeout=BADGE_TIMEOUT)
+    return counts
+
+
+def adjust_badge(user_id, badge, delta):
+    """
+    Atomically add delta to one of a user's counts once the current
+    transaction commits. A count that is not cached is left to be
+    counted on its next read, and a recount already under way is
+    marked as possibly missing this change.
+    """
+    def adjust():
+        try:
+            _cache().incr(_key(badge, user_id), delta)
+        except ValueError:
+            _bump_version(user_id)
+
+    if delta:
+        transaction.on_commit(adjust)
+
+
+def forget_badge(user_ids, badge):
+    """
+    Drop cached counts whose change is not known exactly, once the
+    current transaction commits, so they are counted again.
+    """
+    keys = [_key(badge, user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: _cache().delete_many(keys))
@@ -0,0 +1,174 @@
+import re
+import statistics
+import subprocess
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .catalog import listed_products
+from .models import Cart_Item, Product, Review, Wishlist_Item
+
+# Views the storefront benchmark requests, in report order
+BENCH_VIEWS = (
+    'product_list', 'product_page', 'search', 'view_cart', 'view_wishlist')
+
+# Product pages rotated through, so one cached page does not stand in
+# for all of them
+BENCH_PRODUCTS = 20
+
+PERCENTILES = (50, 95, 99)
+
+# Query count in the Server-Timing header of RequestMetricsMiddleware
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(timings, percent):
+    """
+    Nearest-rank percentile of a sorted list.
+    """
+    rank = max(1, -(-len(timings) * percent // 100))
+    return timings[rank - 1]
+
+
+def summarize(timings, queries, errors=0):
+    """
+    Latency percentiles (in ms) and queries per request of one view.
+    queries holds None for requests whose query count is unknown.
+    """
+    timings = sorted(timings)
+    counted = [count for count in queries if count is not None]
+    summary = {
+        'requests': len(timings),
+        'errors': errors,
+        'mean_ms': round(statistics.mean(timings), 2),
+    }
+    for percent in PERCENTILES:
+        summary[f'p{percent}_ms'] = round(percentile(timings, percent), 2)
+    summary['queries'] = (
+        round(statistics.mean(counted), 2) if counted else None)
+    summary['max_queries'] = max(counted) if counted else None
+    return summary
+
+
+def bench_user():
+    """
+    The user with the most cart lines, whose cart and wishlist pages do
+    the most work.
+    """
+    return User.objects.annotate(
+        lines=Count('cart_item')).order_by('-lines', 'pk').first()
+
+
+def bench_paths(count=BENCH_PRODUCTS):
+    """
+    Paths to request for each view in BENCH_VIEWS; product pages are the
+    listed products with the most reviews, searches the first word of
+    their names.
+    """
+    products = listed_products().order_by('-review_count', 'pk')[:count]
+    words = dict.fromkeys(
+        product.product_name.split()[0] for product in products)
+    return {
+        'product_list': [reverse('product_list')],
+        'product_page': [product.get_absolute_url() for product in products],
+        'search': [f"{reverse('search')}?{urlencode({'q': word})}"
+                   for word in words],
+        'view_cart': [reverse('view_cart')],
+        'view_wishlist': [reverse('view_wishlist')],
+    }
+
+
+def run_client(client, paths, requests, warmup=10):
+    """
+    Request paths in turn through a Django test client, in process.
+    Returns the summary of the last requests requests, after warmup
+    unmeasured ones to fill caches and compile templates.
+    """
+    timings, queries, errors = [], [], 0
+    for i in range(warmup + requests):
+        path = paths[i % len(paths)]
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(path)
+            elapsed = (time.perf_counter() - start) * 1000
+        if i < warmup:
+            continue
+        timings.append(elapsed)
+        queries.append(len(captured))
+        errors += response.status_code >= 400
+    return summarize(timings, queries, errors)
+
+
+def _fetch(url, headers):
+    start = time.perf_counter()
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            ok = response.status < 400
+            timing = response.headers.get('Server-Timing', '')
+    except (urllib.error.URLError, OSError):
+        ok, timing = False, ''
+    match = SERVER_TIMING_QUERIES.search(timing)
+    return ((time.perf_counter() - start) * 1000, ok,
+            int(match.group(1)) if match else None)
+
+
+def run_http(base_url, paths, requests, concurrency, session=None,
+             warmup=10):
+    """
+    Request paths in turn from a running server, concurrency at a time,
+    like load_test. Query counts are read from the Server-Timing header,
+    so they are only known when the server has REQUEST_METRICS on.
+    """
+    headers = {'Cookie': f'sessionid={session}'} if session else {}
+    urls = [base_url.rstrip('/') + paths[i % len(paths)]
+            for i in range(warmup + requests)]
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(lambda url: _fetch(url, headers), urls[:warmup]))
+        results = list(pool.map(lambda url: _fetch(url, headers),
+                                urls[warmup:]))
+    return summarize(
+        [ms for ms, ok, queries in results],
+        [queries for ms, ok, queries in results],
+        sum(1 for ms, ok, queries in results if not ok))
+
+
+def git_commit():
+    """
+    Commit the code under test was checked out at, if known.
+    """
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_metadata():
+    """
+    What a benchmark ran against, saved with its results so runs can be
+    compared.
+    """
+    return {
+        'commit': git_commit(),
+        'timestamp': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'rows': {
+            'products': Product.objects.count(),
+            'reviews': Review.objects.count(),
+            'cart_items': Cart_Item.objects.count(),
+            'wishlist_items': Wishlist_Item.objects.count(),
+        },
+    }
@@ -0,0 +1,293 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Case, DecimalField, ExpressionWrapper, F, IntegerField, Max, OuterRef,
+    Subquery, Sum, Value, When)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .badges import adjust_badge
+from .models import Cart_Item, Product
+
+# Expired reservations are returned to stock this many cart lines at a time
+SWEEP_BATCH_SIZE = 500
+
+# Cost of a cart line (product.price * cart_item.quantity)
+LINE_COST = ExpressionWrapper(
+    F('product__price') * F('quantity'),
+    output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+class OutOfStock(Exception):
+    """
+    Raised when a cart change needs more stock than is available.
+    """
+
+
+def reservation_expiry():
+    """
+    Time at which a reservation made now lapses.
+    """
+    return timezone.now() + timedelta(
+        minutes=getattr(settings, 'CART_RESERVATION_MINUTES', 30))
+
+
+def reserve_stock(product_id, quantity):
+    """
+    Move quantity units of a product from available to reserved stock
+    with one conditional UPDATE, which only succeeds while enough stock
+    is available. Stock on hand stays the same, so cached product pages
+    (found by stock on hand) stay valid without a save signal.
+    Returns whether the reservation was made.
+    """
+    return bool(Product.objects.filter(
+        pk=product_id, stock_quantity__gte=quantity
+    ).update(
+        stock_quantity=F('stock_quantity') - quantity,
+        reserved_quantity=F('reserved_quantity') + quantity,
+    ))
+
+
+def release_stock(product_id, quantity):
+    """
+    Return quantity reserved units of a product to available stock.
+    """
+    Product.objects.filter(pk=product_id).update(
+        stock_quantity=F('stock_quantity') + quantity,
+        reserved_quantity=F('reserved_quantity') - quantity,
+    )
+
+
+def set_on_hand(product_id, on_hand):
+    """
+    Set a product's stock on hand, e.g. after a stock count, keeping the
+    units held in carts reserved: available stock becomes on_hand less
+    the reserved units. The product row is locked while it is read and
+    saved, so concurrent reservations are not overwritten.
+    Returns False, changing nothing, when more units are reserved than
+    on_hand.
+    """
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product_id)
+        if on_hand < product.reserved_quantity:
+            return False
+        product.stock_quantity = on_hand - product.reserved_quantity
+        product.save(update_fields=['stock_quantity'])
+    return True
+
+
+def add_to_cart_item(user, product_id, quantity=1):
+    """
+    Reserve quantity units of a product and add them to the user's cart
+    as a single atomic upsert: increment the existing line in the
+    database, or insert it. Relies on the unique (user, product)
+    constraint so concurrent first adds cannot create two lines.
+    An existing line whose reservation lapsed reserves its units again.
+    Raises OutOfStock when not enough stock is available.
+    """
+    lines = Cart_Item.objects.filter(user=user, product_id=product_id)
+    with transaction.atomic():
+        # Locked whether or not it holds stock, so the sweep cannot
+        # release the line in the meantime
+        line = lines.select_for_update().values(
+            'quantity', 'reserved_until').first()
+        unheld = (line['quantity']
+                  if line and line['reserved_until'] is None else 0)
+        if not reserve_stock(product_id, quantity + unheld):
+            raise OutOfStock(product_id)
+        adjust_badge(user.pk, 'cart', quantity)
+        expiry = reservation_expiry()
+        if lines.update(quantity=F('quantity') + quantity,
+                        reserved_until=expiry):
+            return
+        try:
+            with transaction.atomic():
+                Cart_Item.objects.create(
+                    user=user, product_id=product_id, quantity=quantity,
+                    reserved_until=expiry)
+        except IntegrityError:
+            # Another request inserted the line first; add on top of it
+            lines.update(quantity=F('quantity') + quantity,
+                         reserved_until=expiry)
+
+
+def merge_cart_lines(user, quantities):
+    """
+    Add several products to the user's cart at once, e.g. the cart a
+    visitor built before logging in. quantities maps product ids to
+    units; each product gets as many of its units as are in stock.
+    Stock is reserved with one UPDATE and the lines are upserted with
+    one INSERT, so the number of queries does not grow with the cart.
+    Returns a dict of the units actually added per product id.
+    """
+    if not quantities:
+        return {}
+    with transaction.atomic():
+        stock = dict(Product.objects.select_for_update().filter(
+            pk__in=quantities).order_by('pk').values_list(
+                'pk', 'stock_quantity'))
+        lines = {
+            line.product_id: line
+            for line in Cart_Item.objects.select_for_update().filter(
+                user=user, product_id__in=stock)}
+        expiry = reservation_expiry()
+        added, reserve, merged = {}, {}, []
+        for product_id, available in stock.items():
+            line = lines.get(product_id)
+            current = line.quantity if line else 0
+            # A line added outside the cart API holds no stock yet, so
+            # its whole quantity is reserved along with the new units
+            unheld = current if line and line.reserved_until is None else 0
+            units = min(quantities[product_id], available - unheld)
+            if units <= 0:
+                continue
+            added[product_id] = units
+            reserve[product_id] = units + unheld
+            merged.append(Cart_Item(
+                user=user, product_id=product_id, quantity=current + units,
+                reserved_until=expiry))
+        if not merged:
+            return added
+        held = Case(
+            *[When(pk=product_id, then=Value(units))
+              for product_id, units in reserve.items()],
+            output_field=IntegerField())
+        Product.objects.filter(pk__in=reserve).update(
+            stock_quantity=F('stock_quantity') - held,
+            reserved_quantity=F('reserved_quantity') + held,
+        )
+        Cart_Item.objects.bulk_create(
+            merged, update_conflicts=True,
+            unique_fields=['user', 'product'],
+            update_fields=['quantity', 'reserved_until'])
+        adjust_badge(user.pk, 'cart', sum(added.values()))
+    return added
+
+
+def adjust_cart_item(user, item_id, delta):
+    """
+    Atomically change the quantity of one of the user's cart lines by
+    delta, reserving or releasing stock to match and deleting the line
+    once it reaches zero.
+    Returns the new quantity (0 when the line was removed), or None if
+    the user has no such cart line. Raises OutOfStock when an increase
+    needs more stock than is available.
+    """
+    lines = Cart_Item.objects.filter(id=item_id, user=user)
+    with transaction.atomic():
+        # Locked, so the sweep cannot release the line in the meantime
+        line = lines.select_for_update().values(
+            'product_id', 'quantity', 'reserved_until').first()
+        if line is None:
+            return None
+        product_id = line['product_id']
+        held = line['reserved_until'] is not None
+        if delta > 0:
+            # A line added outside the cart API holds no stock yet, so
+            # reserve its whole new quantity to start tracking it
+            reserve = delta if held else line['quantity'] + delta
+            if not reserve_stock(product_id, reserve):
+                raise OutOfStock(product_id)
+        # Never take the quantity below zero, even under concurrent clicks
+        updated = lines.filter(quantity__gte=max(0, -delta)).update(
+            quantity=F('quantity') + delta,
+            reserved_until=(
+                reservation_expiry() if held or delta > 0 else None))
+        if not updated:
+            if delta > 0:
+                # The line was removed concurrently; undo the reservation
+                transaction.set_rollback(True)
+                return None
+        elif delta < 0 and held:
+            release_stock(product_id, -delta)
+        if updated:
+            adjust_badge(user.pk, 'cart', delta)
+        removed, _ = lines.filter(quantity__lte=0).delete()
+        if removed:
+            return 0
+        return lines.values_list('quantity', flat=True).first() or 0
+
+
+def cart_totals(user, line):
+    """
+    Total cost of the user's cart, with the id, quantity and cost of the
+    line matching the Q object line (e.g. Q(id=item_id)), in one query.
+    The line's id is None once it has been removed.
+    """
+    totals = Cart_Item.objects.filter(user=user).aggregate(
+        total=Coalesce(Sum(LINE_COST), Decimal('0.00')),
+        item_id=Max('id', filter=line),
+        # Named apart from the quantity field it sums
+        line_quantity=Coalesce(Sum('quantity', filter=line), 0),
+        line_total=Coalesce(Sum(LINE_COST, filter=line), Decimal('0.00')),
+    )
+    totals['quantity'] = totals.pop('line_quantity')
+    return totals
+
+
+def _return_held_stock(ids):
+    """
+    Return the stock reserved by the cart lines with the given ids to
+    available stock, with one UPDATE. Lines holding no stock are skipped.
+    """
+    held = Cart_Item.objects.filter(
+        id__in=ids, product=OuterRef('pk'), reserved_until__isnull=False
+    ).order_by().values('product').annotate(
+        total=Sum('quantity')).values('total')
+    held = Coalesce(Subquery(held), 0)
+    Product.objects.filter(stagedproduct__id__in=ids).update(
+        stock_quantity=F('stock_quantity') + held,
+        reserved_quantity=F('reserved_quantity') - held,
+    )
+
+
+def release_cart_items(lines, skip_locked=False):
+    """
+    Delete the given cart lines and return the stock they reserved,
+    using a fixed number of queries however many lines there are.
+    With skip_locked, lines another transaction is changing are left
+    for a later pass instead of being waited on.
+    Returns the number of lines removed.
+    """
+    with transaction.atomic():
+        removed = list(lines.select_for_update(skip_locked=skip_locked)
+                       .values_list('id', 'user_id', 'quantity'))
+        if not removed:
+            return 0
+        ids = [item_id for item_id, _, _ in removed]
+        _return_held_stock(ids)
+        Cart_Item.objects.filter(id__in=ids).delete()
+        units = defaultdict(int)
+        for _, user_id, quantity in removed:
+            units[user_id] += quantity
+        for user_id, quantity in units.items():
+            adjust_badge(user_id, 'cart', -quantity)
+    return len(ids)
+
+
+def release_expired_reservations(batch_size=SWEEP_BATCH_SIZE):
+    """
+    Return the stock of cart lines whose reservation has lapsed,
+    batch_size lines per transaction so no lock is held for long. The
+    lines stay in the cart holding no stock (reserved_until is None),
+    and reserve it again when next added to or increased.
+    Returns the total number of lines released.
+    """
+    released = 0
+    while True:
+        with transaction.atomic():
+            ids = list(Cart_Item.objects.filter(
+                reserved_until__lt=timezone.now()
+            ).order_by('reserved_until').select_for_update(
+                skip_locked=True).values_list('id', flat=True)[:batch_size])
+            if ids:
+                _return_held_stock(ids)
+                Cart_Item.objects.filter(id__in=ids).update(
+                    reserved_until=None)
+        released += len(ids)
+        if len(ids) < batch_size:
+            return released
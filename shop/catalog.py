@@ -0,0 +1,162 @@
+import base64
+from datetime import datetime
+
+from django.core.cache import caches
+from django.db.models import F, Q
+from django.http import Http404
+
+from .models import Product
+
+# Cache alias configured in settings.CACHES for catalog data
+CATALOG_CACHE = 'catalog'
+
+# Number of product cards shown per catalog page
+CATALOG_PAGE_SIZE = 12
+
+# Only the columns product_list.html renders (plus created_on for the cursor)
+CARD_FIELDS = (
+    'id',
+    'product_name',
+    'slug',
+    'subtitle',
+    'main_image',
+    'has_image',
+    'price',
+    'stock_quantity',
+    'reserved_quantity',
+    'created_on',
+)
+
+
+def category_groups():
+    """
+    Map each category group label in Product.CATEGORY_CHOICES
+    (e.g. 'Ranged Weapons') to the list of category values it contains.
+    Ungrouped choices such as 'unknown' map to themselves.
+    """
+    groups = {}
+    for value, label in Product.CATEGORY_CHOICES:
+        if isinstance(label, (list, tuple)):
+            groups[value] = [choice for choice, _ in label]
+        else:
+            groups[value] = [value]
+    return groups
+
+
+def category_values(category):
+    """
+    Resolve a category filter (either a single category value or a group
+    label) to the list of category values to filter on.
+    Returns None for an unknown filter.
+    """
+    groups = category_groups()
+    if category in groups:
+        return groups[category]
+    for values in groups.values():
+        if category in values:
+            return [category]
+    return None
+
+
+def encode_cursor(row):
+    """
+    Build an opaque cursor pointing just after the given product
+    (or review) in (created_on, id) order.
+    """
+    raw = f"{row.created_on.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Turn a cursor back into a (created_on, id) pair.
+    Raises Http404 for anything that was not produced by encode_cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_on, product_id = raw.split('|')
+        return datetime.fromisoformat(created_on), int(product_id)
+    except (ValueError, UnicodeError):
+        raise Http404("Invalid catalog cursor")
+
+
+def on_hand(queryset):
+    """
+    Narrow a product queryset to products with stock on hand: units
+    available plus units reserved in carts, so a product whose units
+    are all held in carts is still found.
+    """
+    return queryset.alias(
+        on_hand=F('stock_quantity') + F('reserved_quantity')
+    ).filter(on_hand__gt=0)
+
+
+def listed_products(category=None):
+    """
+    Listed products with stock on hand for the storefront, optionally
+    narrowed to a category value or category group, fetching only the
+    product card fields. Uses the same stock rule as the facet counts.
+    """
+    queryset = on_hand(
+        Product.objects.filter(status=True)).only(*CARD_FIELDS)
+    if category:
+        values = category_values(category)
+        if values is None:
+            raise Http404("Unknown category")
+        queryset = queryset.filter(category__in=values)
+    return queryset
+
+
+def catalog_page(category=None, cursor=None, page_size=CATALOG_PAGE_SIZE):
+    """
+    Fetch one page of the catalog using keyset pagination on
+    (created_on, id), so every page costs the same regardless of depth.
+    Returns the list of products and the cursor for the next page
+    (None on the last page).
+    """
+    queryset = listed_products(category)
+    if cursor:
+        created_on, product_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_on__gt=created_on)
+            | Q(created_on=created_on, id__gt=product_id)
+        )
+    # Fetch one extra row to find out whether another page exists
+    products = list(queryset.order_by('created_on', 'id')[:page_size + 1])
+    next_cursor = None
+    if len(products) > page_size:
+        products = products[:page_size]
+        next_cursor = encode_cursor(products[-1])
+    return products, next_cursor
+
+
+def _slug_key(product_id):
+    return f'product_slug:{product_id}'
+
+
+def product_slug(product_id):
+    """
+    Current slug of a product, from a cached id -> slug map so old-style
+    URLs can be redirected without a database hit.
+    Returns None if there is no such product.
+    """
+    cache = caches[CATALOG_CACHE]
+    slug = cache.get(_slug_key(product_id))
+    if slug is None:
+        slug = Product.objects.filter(pk=product_id).values_list(
+            'slug', flat=True).first()
+        if slug is not None:
+            cache.set(_slug_key(product_id), slug, timeout=None)
+    return slug
+
+
+def remember_slug(product_id, slug):
+    """
+    Store a product's slug in the cached map, or drop it (slug=None)
+    when the product is deleted.
+    """
+    cache = caches[CATALOG_CACHE]
+    if slug is None:
+        cache.delete(_slug_key(product_id))
+    else:
+        cache.set(_slug_key(product_id), slug, timeout=None)
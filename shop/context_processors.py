@@ -0,0 +1,23 @@
+from django.utils.functional import SimpleLazyObject
+
+from .badges import user_badges
+from .guest_cart import guest_cart
+
+
+def request_badges(request):
+    """
+    Cart and wishlist counts of the user making the request, or of the
+    guest cart in a visitor's cookie.
+    """
+    if request.user.is_authenticated:
+        return user_badges(request.user.pk)
+    return {'cart': sum(guest_cart(request).values()), 'wishlist': 0}
+
+
+def badge_counts(request):
+    """
+    Cart and wishlist counts for the navbar badges, as `badges.cart` and
+    `badges.wishlist`. Only worked out when a template uses them, and
+    then from the cache (or the guest cart cookie) without any queries.
+    """
+    return {'badges': SimpleLazyObject(lambda: request_badges(request))}
@@ -0,0 +1,202 @@
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count
+
+from .catalog import CATALOG_CACHE, category_groups, on_hand
+from .models import Product
+from .page_cache import invalidate_product
+
+# Counts are rebuilt from the database at least this often (seconds),
+# so any drift, e.g. from raw SQL edits, corrects itself
+FACET_TIMEOUT = 60 * 60
+
+# Fields deciding whether and where a product is counted
+FACET_FIELDS = {'status', 'category', 'stock_quantity', 'reserved_quantity'}
+
+# Marks a product loaded without the fields its facet depends on
+_UNKNOWN = object()
+
+
+def _cache():
+    return caches[CATALOG_CACHE]
+
+
+def _key(category):
+    return f'facet:{category}'
+
+
+def _categories():
+    return [value for values in category_groups().values()
+            for value in values]
+
+
+def counted_products():
+    """
+    Products that count towards the catalog facets: listed, with stock
+    on hand. Units held in carts still count, so reserving and releasing
+    stock never moves a product in or out of its facet.
+    """
+    return on_hand(Product.objects.filter(status=True))
+
+
+def facet_category(product):
+    """
+    Category a product instance counts towards, or None when it does
+    not count.
+    """
+    if product.status and (
+            product.stock_quantity + product.reserved_quantity > 0):
+        return product.category
+    return None
+
+
+def rebuild_facet_counts():
+    """
+    Recount every category with one GROUP BY and store the counts.
+    Returns the counts by category value.
+    """
+    counts = dict.fromkeys(_categories(), 0)
+    rows = counted_products().order_by().values_list(
+        'category').annotate(n=Count('id'))
+    for category, n in rows:
+        if category in counts:
+            counts[category] = n
+    _cache().set_many(
+        {_key(category): n for category, n in counts.items()},
+        timeout=FACET_TIMEOUT)
+    return counts
+
+
+def category_counts():
+    """
+    Number of counted products in each category value, read from the
+    cache in one round trip. Rebuilds all counts if any are missing.
+    """
+    keys = {_key(category): category for category in _categories()}
+    cached = _cache().get_many(keys)
+    if len(cached) < len(keys):
+        return rebuild_facet_counts()
+    return {keys[key]: n for key, n in cached.items()}
+
+
+def facet_counts(selected=None):
+    """
+    Category navigation for the catalog, following Product.CATEGORY_CHOICES
+    order: each group with its total and the counts of its categories.
+    Ungrouped choices such as 'unknown' have no sub-categories. The group
+    containing the selected category filter is marked active.
+    """
+    counts = category_counts()
+    labels = dict(Product._meta.get_field('category').flatchoices)
+    facets = []
+    for group, values in category_groups().items():
+        categories = [
+            {'value': value, 'label': labels[value], 'count': counts[value]}
+            for value in values
+        ]
+        facets.append({
+            'value': group,
+            'label': labels.get(group, group),
+            'count': sum(category['count'] for category in categories),
+            'categories': [] if values == [group] else categories,
+            'active': selected == group or selected in values,
+        })
+    return facets
+
+
+def _apply(deltas):
+    cache = _cache()
+    for category, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            cache.incr(_key(category), delta)
+        except ValueError:
+            # Not cached; the next read rebuilds every count
+            pass
+
+
+def adjust_facet_counts(deltas):
+    """
+    Add {category: change} to the cached counts once the current
+    transaction commits, so rolled back changes are never counted.
+    """
+    deltas = {category: delta for category, delta in deltas.items()
+              if category is not None}
+    if deltas:
+        transaction.on_commit(lambda: _apply(deltas))
+
+
+def _loaded_category(product):
+    """
+    Facet a product counted towards as last loaded or saved, or _UNKNOWN
+    when the fields it depends on were not loaded.
+    """
+    if hasattr(product, '_facet_category'):
+        return product._facet_category
+    loaded = getattr(product, '_loaded_values', {})
+    if not FACET_FIELDS <= loaded.keys():
+        return _UNKNOWN
+    if loaded['status'] and (
+            loaded['stock_quantity'] + loaded['reserved_quantity'] > 0):
+        return loaded['category']
+    return None
+
+
+def product_saving(product):
+    """
+    Before a save, note the facet the product counted towards, from the
+    values it was loaded with, or from the database for new instances
+    with an explicit pk and ones loaded with the facet fields deferred.
+    """
+    if product._state.adding and product.pk is None:
+        product._facet_category = None
+        return
+    old = _UNKNOWN if product._state.adding else _loaded_category(product)
+    if old is _UNKNOWN:
+        old = counted_products().filter(
+            pk=product.pk).values_list('category', flat=True).first()
+    product._facet_category = old
+
+
+def product_saved(product):
+    """
+    Move a saved product between facets if its category, status or
+    stock changed whether or where it is counted.
+    """
+    old = product._facet_category
+    new = facet_category(product)
+    product._facet_category = new
+    if old != new:
+        adjust_facet_counts({old: -1, new: 1})
+
+
+def product_deleted(product):
+    """
+    Take a deleted product out of its facet.
+    """
+    old = _loaded_category(product)
+    if old is _UNKNOWN:
+        old = facet_category(product)
+    adjust_facet_counts({old: -1})
+
+
+def set_listed(queryset, listed):
+    """
+    List or delist the given products with one UPDATE, which skips save
+    signals, and adjust the facet counts and drop the cached pages of
+    the products whose status actually changes. Returns the number of products changed.
+    """
+    with transaction.atomic():
+        ids = list(queryset.filter(status=not listed).select_for_update()
+                   .values_list('id', flat=True))
+        changing = Product.objects.filter(id__in=ids)
+        rows = on_hand(changing).order_by().values_list(
+            'category').annotate(n=Count('id'))
+        sign = 1 if listed else -1
+        adjust_facet_counts({category: sign * n for category, n in rows})
+        changing.update(status=listed)
+        for product_id in ids:
+            transaction.on_commit(
+                lambda product_id=product_id: invalidate_product(product_id))
+    return len(ids)
@@ -1,5 +1,5 @@
 from django import forms
-from .models import Review
+from .models import Product, Review
 
 
 class ReviewForm(forms.ModelForm):
@@ -13,3 +13,33 @@ class ReviewForm(forms.ModelForm):
         """
         model = Review
         fields = ['title', 'content', 'review_score',]
+
+
+class ProductAdminForm(forms.ModelForm):
+    """
+    Product form for the admin. Stock is entered as stock on hand, and
+    saved with shop.cart.set_on_hand so units held in carts stay reserved.
+    """
+    on_hand = forms.IntegerField(
+        min_value=0, label="Stock on hand",
+        help_text="Units in stock, including units held in carts.")
+
+    class Meta:
+        model = Product
+        exclude = ['stock_quantity']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            self.fields['on_hand'].initial = (
+                self.instance.stock_quantity
+                + self.instance.reserved_quantity)
+
+    def clean_on_hand(self):
+        on_hand = self.cleaned_data['on_hand']
+        reserved = self.instance.reserved_quantity
+        if 'on_hand' in self.changed_data and on_hand < reserved:
+            raise forms.ValidationError(
+                f"{reserved} units are held in carts; stock on hand "
+                "cannot be lower.")
+        return on_hand
@@ -0,0 +1,197 @@
+import json
+from decimal import Decimal
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib import messages
+
+from .cart import OutOfStock, merge_cart_lines
+from .models import Product
+
+# Signed cookie holding an anonymous visitor's cart as {product id: units}.
+# Kept out of the session so a guest with a cart has no session to load:
+# cached product pages and the navbar badge then cost no queries.
+GUEST_CART_COOKIE = 'guest_cart'
+
+
+class GuestCartLine:
+    """
+    One line of a guest cart, shaped like a Cart_Item for the cart
+    template. Its id is the product id, as guest lines have no row.
+    """
+
+    def __init__(self, product, quantity):
+        self.id = product.id
+        self.product = product
+        self.quantity = quantity
+        self.line_total = product.price * quantity
+
+
+def guest_cart(request):
+    """
+    The visitor's cart as a dict of product id to units. A missing,
+    tampered or malformed cookie is an empty cart.
+    """
+    if hasattr(request, '_guest_cart'):
+        return dict(request._guest_cart)
+    value = request.get_signed_cookie(
+        GUEST_CART_COOKIE, default=None, salt=GUEST_CART_COOKIE,
+        max_age=settings.SESSION_COOKIE_AGE)
+    try:
+        cart = json.loads(value) if value else {}
+        # JSON turns the integer keys into strings
+        return {int(product_id): int(units)
+                for product_id, units in cart.items()}
+    except (ValueError, TypeError, AttributeError):
+        return {}
+
+
+def _save(request, cart):
+    # Written to the response by GuestCartMiddleware
+    request._guest_cart = dict(cart)
+
+
+class GuestCartMiddleware:
+    """
+    Store a guest cart changed during the request in its signed cookie,
+    or delete the cookie once the cart is emptied (or merged on login).
+    Handles sync and async requests without switching modes.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.save(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.save(request, await self.get_response(request))
+
+    def save(self, request, response):
+        if not hasattr(request, '_guest_cart'):
+            return response
+        cart = request._guest_cart
+        if cart:
+            response.set_signed_cookie(
+                GUEST_CART_COOKIE,
+                json.dumps({str(product_id): units
+                            for product_id, units in cart.items()},
+                           separators=(',', ':')),
+                salt=GUEST_CART_COOKIE,
+                max_age=settings.SESSION_COOKIE_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True, samesite='Lax')
+        elif GUEST_CART_COOKIE in request.COOKIES:
+            response.delete_cookie(GUEST_CART_COOKIE, samesite='Lax')
+        return response
+
+
+def add_to_guest_cart(request, product, quantity=1):
+    """
+    Add units of a product to the visitor's cart. Guest carts reserve
+    no stock, so this only checks the units are currently available.
+    Raises OutOfStock otherwise.
+    """
+    cart = guest_cart(request)
+    units = cart.get(product.id, 0) + quantity
+    if units > product.stock_quantity:
+        raise OutOfStock(product.id)
+    cart[product.id] = units
+    _save(request, cart)
+
+
+def adjust_guest_cart(request, product_id, delta):
+    """
+    Change the units of a product in the visitor's cart by delta,
+    dropping it once it reaches zero.
+    Returns the new quantity (0 when removed), or None if the product is
+    not in the cart. Raises OutOfStock when an increase needs more
+    stock than is available.
+    """
+    cart = guest_cart(request)
+    if product_id not in cart:
+        return None
+    units = cart[product_id] + delta
+    if delta > 0 and not Product.objects.filter(
+            pk=product_id, stock_quantity__gte=units).exists():
+        raise OutOfStock(product_id)
+    if units > 0:
+        cart[product_id] = units
+    else:
+        del cart[product_id]
+        units = 0
+    _save(request, cart)
+    return units
+
+
+def remove_from_guest_cart(request, product_id):
+    """
+    Remove a product from the visitor's cart. Returns whether it was there.
+    """
+    cart = guest_cart(request)
+    if cart.pop(product_id, None) is None:
+        return False
+    _save(request, cart)
+    return True
+
+
+def clear_guest_cart(request):
+    """
+    Empty the visitor's cart.
+    """
+    _save(request, {})
+
+
+def guest_cart_lines(request):
+    """
+    The lines of the visitor's cart with their products, sorted by line
+    cost, and the cart total. One query for the whole cart.
+    """
+    cart = guest_cart(request)
+    lines = sorted(
+        (GuestCartLine(product, cart[product.id])
+         for product in Product.objects.filter(pk__in=cart)),
+        key=lambda line: line.line_total, reverse=True)
+    return lines, sum((line.line_total for line in lines), Decimal('0.00'))
+
+
+def guest_cart_totals(request, product_id):
+    """
+    Total cost of the visitor's cart, with the id, quantity and cost of
+    the line for one product, shaped like cart.cart_totals. One query.
+    """
+    cart = guest_cart(request)
+    prices = dict(Product.objects.filter(pk__in=cart).values_list(
+        'pk', 'price'))
+    quantity = cart.get(product_id, 0) if product_id in prices else 0
+    return {
+        'total': sum((price * cart[pk] for pk, price in prices.items()),
+                     Decimal('0.00')),
+        'item_id': product_id if quantity else None,
+        'quantity': quantity,
+        'line_total': prices.get(product_id, Decimal('0.00')) * quantity,
+    }
+
+
+def merge_guest_cart(request, user):
+    """
+    Move the visitor's cart into the cart of the user who just logged
+    in, reserving its stock, and tell them about anything that ran out
+    in the meantime.
+    """
+    cart = guest_cart(request)
+    if not cart:
+        return
+    added = merge_cart_lines(user, cart)
+    clear_guest_cart(request)
+    if any(added.get(product_id, 0) < units
+           for product_id, units in cart.items()):
+        messages.add_message(
+            request, messages.WARNING,
+            "Some items in your cart are no longer in stock")
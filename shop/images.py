@@ -0,0 +1,113 @@
+from functools import lru_cache
+
+from cloudinary import CloudinaryResource
+from django.templatetags.static import static
+
+# Public id of the default image for products without a photo
+PLACEHOLDER_IMAGE = 'placeholder'
+
+# Placeholder shipped with the static files, and its scaled copies
+# (written by `manage.py build_placeholder_variants`)
+PLACEHOLDER_STATIC = 'images/placeholder.webp'
+
+# Distinct (image, transformation) URLs remembered per worker process
+IMAGE_URL_CACHE_SIZE = 4096
+
+# Named image sizes: the width in pixels each variant is scaled down to
+IMAGE_VARIANTS = {
+    'thumb': 240,
+    'card': 480,
+    'detail': 960,
+}
+
+# How wide each variant is drawn on the page, so the browser can pick
+# the smallest srcset candidate that fills it
+IMAGE_SIZES = {
+    'thumb': '(min-width: 768px) 200px, 240px',
+    'card': ('(min-width: 1400px) 440px, (min-width: 992px) 33vw, '
+             '(min-width: 576px) 50vw, 100vw'),
+    'detail': '(min-width: 1400px) 770px, (min-width: 576px) 58vw, 100vw',
+}
+
+# Cloudinary delivery options for every variant: never upscale, and let
+# Cloudinary pick the quality and format (WebP/AVIF) per browser
+VARIANT_OPTIONS = (
+    ('crop', 'limit'),
+    ('fetch_format', 'auto'),
+    ('quality', 'auto'),
+)
+
+
+def is_placeholder(image):
+    """
+    Whether a CloudinaryField value is missing or the placeholder image.
+    """
+    return not image or PLACEHOLDER_IMAGE in str(image)
+
+
+def placeholder_variant(width):
+    """
+    Static path of the placeholder image scaled to the given width.
+    """
+    return f'images/placeholder-{width}.webp'
+
+
+def _key(image):
+    """
+    Hashable identity of a CloudinaryField value.
+    """
+    if not isinstance(image, CloudinaryResource):
+        image = CloudinaryResource(str(image))
+    return (image.public_id, image.format, image.version, image.type,
+            image.resource_type)
+
+
+@lru_cache(maxsize=IMAGE_URL_CACHE_SIZE)
+def _build_url(key, options):
+    public_id, image_format, version, image_type, resource_type = key
+    resource = CloudinaryResource(
+        public_id, format=image_format, version=version, type=image_type,
+        resource_type=resource_type)
+    return resource.build_url(**dict(options))
+
+
+def image_url(image, **options):
+    """
+    URL of a Cloudinary image, optionally with transformation options
+    such as width=400, crop='fill'. Each (image, transformation) pair is
+    built once per process and then served from an LRU cache, instead
+    of being signed and formatted again on every template access.
+    Option values must be hashable.
+    """
+    if not image:
+        return ''
+    return _build_url(_key(image), tuple(sorted(options.items())))
+
+
+def image_url_cache_info():
+    """
+    Hit and miss counts of the image URL cache, for diagnostics.
+    """
+    return _build_url.cache_info()
+
+
+def variant_url(image, width):
+    """
+    URL of an image scaled down to the given width: a Cloudinary
+    transformation for uploads, a local copy for the placeholder.
+    """
+    if is_placeholder(image):
+        return static(placeholder_variant(width))
+    return image_url(image, width=width, **dict(VARIANT_OPTIONS))
+
+
+def responsive_sources(image, variant):
+    """
+    The src, srcset and sizes attributes for showing an image as the
+    named variant. The srcset offers every variant width.
+    """
+    srcset = ', '.join(
+        f'{variant_url(image, width)} {width}w'
+        for width in sorted(IMAGE_VARIANTS.values()))
+    return (variant_url(image, IMAGE_VARIANTS[variant]), srcset,
+            IMAGE_SIZES[variant])
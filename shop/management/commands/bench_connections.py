@@ -0,0 +1,60 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+
+class Command(BaseCommand):
+    """
+    Measure request latency when every request opens a new database
+    connection versus reusing one (persistent connection or pool).
+    Runs against whatever DATABASE_URL points at, so a local Postgres
+    gives real numbers and SQLite serves as a quick stand-in.
+    """
+    help = "Benchmark request latency with and without connection reuse."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help="Requests per mode.")
+        parser.add_argument(
+            '--url', default='/',
+            help="Path to request.")
+
+    def run(self, client, url, requests, reconnect):
+        timings = []
+        for _ in range(requests):
+            if reconnect:
+                # What CONN_MAX_AGE=0 does at the end of every request
+                connection.close()
+            start = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f"{label:<22} mean {statistics.mean(timings):7.2f} ms  "
+            f"p50 {statistics.median(timings):7.2f} ms  p95 {p95:7.2f} ms")
+
+    def handle(self, *args, **options):
+        client = Client(SERVER_NAME='127.0.0.1')
+        url = options['url']
+        requests = options['requests']
+        pooled = 'pool' in connection.settings_dict.get('OPTIONS', {})
+
+        # Warm up templates, URL resolver and the first connection
+        self.run(client, url, 10, reconnect=False)
+
+        self.stdout.write(
+            f"{requests} requests to {url} on {connection.vendor}")
+        self.report(
+            "new connection each",
+            self.run(client, url, requests, reconnect=True))
+        self.report(
+            "pooled" if pooled else "persistent",
+            self.run(client, url, requests, reconnect=pooled))
@@ -0,0 +1,81 @@
+import os
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+
+from shop.catalog import catalog_page
+from shop.images import (
+    IMAGE_VARIANTS, PLACEHOLDER_STATIC, is_placeholder, variant_url)
+from shop.templatetags.product_images import EAGER_IMAGES
+
+
+class Command(BaseCommand):
+    """
+    Add up the image bytes a browser downloads for the first catalog
+    page three ways: full-size originals in every card (the old
+    markup), the srcset variant a card of the given width picks, and
+    what is fetched up front once cards below the first row load lazily.
+    Cloudinary sizes come from HEAD requests, so this needs network
+    access; the placeholder is measured from the static files.
+    """
+    help = "Measure image bytes transferred by the catalog page."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--width', type=int, default=440,
+            help="Rendered card image width in CSS pixels.")
+        parser.add_argument(
+            '--dpr', type=float, default=1.0,
+            help="Device pixel ratio of the simulated screen.")
+        parser.add_argument(
+            '--category',
+            help="Catalog category or group to measure.")
+
+    def size(self, url):
+        if url.startswith(settings.STATIC_URL):
+            path = finders.find(url[len(settings.STATIC_URL):])
+            return os.path.getsize(path) if path else 0
+        # Ask for what a current browser accepts, as f_auto varies on it
+        request = urllib.request.Request(
+            url, method='HEAD',
+            headers={'Accept': 'image/avif,image/webp,image/*,*/*;q=0.8'})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return int(response.headers.get('Content-Length') or 0)
+        except (urllib.error.URLError, OSError, ValueError):
+            self.stderr.write(f"Could not measure {url}")
+            return 0
+
+    def handle(self, *args, **options):
+        products, _ = catalog_page(category=options['category'])
+        needed = options['width'] * options['dpr']
+        widths = sorted(IMAGE_VARIANTS.values())
+        # The browser takes the smallest candidate covering the slot
+        chosen = next((w for w in widths if w >= needed), widths[-1])
+
+        sizes = {}
+        full = variant = eager = 0
+        for position, product in enumerate(products, start=1):
+            if is_placeholder(product.main_image):
+                original = settings.STATIC_URL + PLACEHOLDER_STATIC
+            else:
+                original = product.image_url
+            url = variant_url(product.main_image, chosen)
+            for each in (original, url):
+                if each not in sizes:
+                    sizes[each] = self.size(each)
+            full += sizes[original]
+            variant += sizes[url]
+            if position <= EAGER_IMAGES:
+                eager += sizes[url]
+
+        self.stdout.write(
+            f"{len(products)} cards, {chosen}w variant for a "
+            f"{options['width']}px slot at {options['dpr']}x")
+        self.stdout.write(f"{'full-size originals':<24} {full / 1024:9.1f} KB")
+        self.stdout.write(f"{'srcset variants':<24} {variant / 1024:9.1f} KB")
+        self.stdout.write(
+            f"{'up front (lazy loading)':<24} {eager / 1024:9.1f} KB")
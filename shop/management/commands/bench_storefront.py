@@ -0,0 +1,114 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from shop.benchmark import (
+    BENCH_VIEWS, PERCENTILES, bench_metadata, bench_paths, bench_user,
+    run_client, run_http)
+
+
+class Command(BaseCommand):
+    """
+    Measure p50/p95/p99 latency and queries per request of the product
+    list, product page, cart and wishlist views, e.g. on a database
+    filled by seed_shop. Runs in process through the test client by
+    default, or against a running server with --base-url. Results can
+    be saved as JSON with --output and compared with an earlier run
+    with --compare.
+    """
+    help = "Benchmark latency and queries per request of storefront views."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help="Measured requests per view.")
+        parser.add_argument(
+            '--warmup', type=int, default=10,
+            help="Unmeasured requests per view made first.")
+        parser.add_argument(
+            '--view', action='append', dest='views', choices=BENCH_VIEWS,
+            help="View to benchmark; repeat for several (default: all).")
+        parser.add_argument(
+            '--user',
+            help="Username for the cart and wishlist (default: the user "
+                 "with the most cart lines).")
+        parser.add_argument(
+            '--base-url',
+            help="Benchmark a running server instead, e.g. "
+                 "http://127.0.0.1:8000 (queries need REQUEST_METRICS).")
+        parser.add_argument(
+            '--concurrency', type=int, default=10,
+            help="Requests in flight at once with --base-url.")
+        parser.add_argument(
+            '--session',
+            help="sessionid cookie for the cart and wishlist with "
+                 "--base-url.")
+        parser.add_argument(
+            '--output', help="Write the results to this JSON file.")
+        parser.add_argument(
+            '--compare', help="JSON file of an earlier run to compare with.")
+
+    def get_user(self, username):
+        if username is None:
+            return bench_user()
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            raise CommandError(f"No user named {username!r}")
+        return user
+
+    def handle(self, *args, **options):
+        paths = bench_paths()
+        views = options['views'] or BENCH_VIEWS
+        if not paths['product_page']:
+            raise CommandError(
+                "No listed products to benchmark; run seed_shop first.")
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)['views']
+
+        if options['base_url']:
+            mode = f"http, concurrency {options['concurrency']}"
+        else:
+            mode = 'client'
+            client = Client(SERVER_NAME='127.0.0.1')
+            user = self.get_user(options['user'])
+            if user is not None:
+                client.force_login(user)
+
+        results = {}
+        for view in views:
+            if options['base_url']:
+                results[view] = run_http(
+                    options['base_url'], paths[view], options['requests'],
+                    options['concurrency'], options['session'],
+                    options['warmup'])
+            else:
+                results[view] = run_client(
+                    client, paths[view], options['requests'],
+                    options['warmup'])
+            self.report(view, results[view], (baseline or {}).get(view))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({**bench_metadata(), 'mode': mode,
+                           'views': results}, file, indent=2)
+                file.write('\n')
+            self.stdout.write(f"Saved results to {options['output']}")
+
+    def report(self, view, result, before=None):
+        line = [f"{view:<14}"]
+        for percent in PERCENTILES:
+            key = f'p{percent}_ms'
+            line.append(f"p{percent} {result[key]:8.2f} ms")
+            if before:
+                line.append(f"({result[key] - before[key]:+.2f})")
+        queries = result['queries']
+        line.append(f"queries {'-' if queries is None else queries}")
+        if before and None not in (queries, before['queries']):
+            line.append(f"({queries - before['queries']:+g})")
+        if result['errors']:
+            line.append(f"{result['errors']} errors")
+        self.stdout.write('  '.join(line))
@@ -0,0 +1,37 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.images import IMAGE_VARIANTS, PLACEHOLDER_STATIC, placeholder_variant
+
+
+class Command(BaseCommand):
+    """
+    Write scaled WebP copies of the placeholder image next to it in
+    static/, one per image variant width, so products without a photo
+    get the same srcset treatment as Cloudinary uploads. Only needed
+    when the placeholder or the variant widths change; needs Pillow.
+    """
+    help = "Generate the placeholder image's size variants."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--quality', type=int, default=80,
+            help="WebP quality of the generated files.")
+
+    def handle(self, *args, **options):
+        try:
+            from PIL import Image
+        except ImportError:
+            raise CommandError("Pillow is needed: pip install Pillow")
+
+        static_dir = settings.STATICFILES_DIRS[0]
+        with Image.open(os.path.join(static_dir, PLACEHOLDER_STATIC)) as image:
+            for width in sorted(set(IMAGE_VARIANTS.values())):
+                height = round(image.height * width / image.width)
+                path = os.path.join(static_dir, placeholder_variant(width))
+                image.resize((width, height), Image.LANCZOS).save(
+                    path, 'WEBP', quality=options['quality'])
+                self.stdout.write(
+                    f"{path}: {width}x{height}, {os.path.getsize(path)} bytes")
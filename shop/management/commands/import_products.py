@@ -0,0 +1,81 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.facets import rebuild_facet_counts
+from shop.product_io import (
+    IMPORT_BATCH_SIZE, RowError, categories, chunks, clean_row,
+    import_chunk, read_rows)
+from shop.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    """
+    Create or update products from a CSV or JSON Lines file with the
+    columns of shop.product_io.PRODUCT_FIELDS, matching existing
+    products on their SKU. The file is read and written batch_size rows
+    at a time, one transaction per batch, so memory use does not grow
+    with the file. Invalid rows, and rows with less stock than is held
+    in carts, are reported and skipped. The search index and facet
+    counts, which bulk writes bypass, are rebuilt at the end.
+    """
+    help = "Import products from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help="File to read, or - for standard input.")
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help="File format; by default taken from the file extension.")
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help="Rows per transaction.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        if path == '-':
+            self.load(sys.stdin, file_format, options)
+        else:
+            with open(path, newline='', encoding='utf-8') as file:
+                self.load(file, file_format, options)
+
+    def load(self, file, file_format, options):
+        allowed = categories()
+        created = updated = skipped = 0
+        start = time.perf_counter()
+        rows = enumerate(read_rows(file, file_format), start=1)
+        try:
+            for batch in chunks(rows, options['batch_size']):
+                cleaned, numbers = [], {}
+                for number, row in batch:
+                    try:
+                        cleaned.append(clean_row(row, allowed))
+                    except RowError as e:
+                        skipped += 1
+                        self.stderr.write(f"Row {number}: {e}")
+                    else:
+                        numbers[cleaned[-1]['sku']] = number
+                new, changed, rejected = import_chunk(cleaned)
+                created += new
+                updated += changed
+                for sku, error in rejected.items():
+                    skipped += 1
+                    self.stderr.write(f"Row {numbers[sku]}: {error}")
+                total = batch[-1][0]
+                if options['verbosity'] > 1:
+                    self.stdout.write(
+                        f"{total} rows, "
+                        f"{total / (time.perf_counter() - start):,.0f} rows/s")
+        finally:
+            # Also after a failed batch, for the batches committed before it
+            rebuild_search_index()
+            rebuild_facet_counts()
+        rows_read = created + updated + skipped
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {rows_read} rows in {elapsed:.1f}s "
+            f"({rows_read / elapsed if elapsed else 0:,.0f} rows/s): "
+            f"{created} created, {updated} updated, {skipped} skipped"))
@@ -0,0 +1,67 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    Fire concurrent GET requests at a running server and report
+    throughput and latency, e.g. to compare the sync WSGI deployment
+    with ASGI=true on the same machine.
+    """
+    help = "Measure concurrent-request throughput of a running server."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'base_url',
+            help="Server to test, e.g. http://127.0.0.1:8000")
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help="Path to request; repeat to rotate through several.")
+        parser.add_argument(
+            '--concurrency', type=int, default=20,
+            help="Requests in flight at once.")
+        parser.add_argument(
+            '--requests', type=int, default=500,
+            help="Total requests to send.")
+        parser.add_argument(
+            '--session',
+            help="sessionid cookie, for pages that need a logged-in user.")
+
+    def fetch(self, url, headers):
+        start = time.perf_counter()
+        request = urllib.request.Request(url, headers=headers)
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                ok = response.status < 400
+        except (urllib.error.URLError, OSError):
+            ok = False
+        return (time.perf_counter() - start) * 1000, ok
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+        paths = options['paths'] or ['/']
+        total = options['requests']
+        headers = {}
+        if options['session']:
+            headers['Cookie'] = f"sessionid={options['session']}"
+        urls = [base_url + paths[i % len(paths)] for i in range(total)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(lambda url: self.fetch(url, headers), urls))
+        elapsed = time.perf_counter() - start
+
+        timings = sorted(ms for ms, ok in results)
+        errors = sum(1 for ms, ok in results if not ok)
+        self.stdout.write(
+            f"{total} requests, concurrency {options['concurrency']}: "
+            f"{total / elapsed:.1f} req/s, "
+            f"p50 {statistics.median(timings):.1f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95) - 1]:.1f} ms, "
+            f"{errors} errors")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from shop.reviews import rebuild_review_aggregates
+
+
+class Command(BaseCommand):
+    """
+    Recompute every product's review_count, review_sum and review_average
+    from the Review table, e.g. after reviews were edited in the admin.
+    """
+    help = "Rebuild the denormalized review totals stored on Product."
+
+    def handle(self, *args, **options):
+        updated = rebuild_review_aggregates()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt review totals for {updated} products"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from shop.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    """
+    Re-copy every product into the SQLite full-text table. Postgres
+    indexes the product columns directly and needs no rebuild.
+    """
+    help = "Rebuild the product full-text search index."
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt"))
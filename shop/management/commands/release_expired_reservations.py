@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from shop.cart import SWEEP_BATCH_SIZE, release_expired_reservations
+
+
+class Command(BaseCommand):
+    """
+    Return the stock held by lapsed cart reservations, in batches. The
+    cart lines are kept. Meant to run every few minutes from a scheduler.
+    """
+    help = "Return the reserved stock of expired cart lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=SWEEP_BATCH_SIZE,
+            help="Cart lines released per transaction.")
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations(options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f"Released the stock of {released} expired cart lines"))
@@ -0,0 +1,83 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.facets import rebuild_facet_counts
+from shop.models import Product
+from shop.reviews import rebuild_review_aggregates
+from shop.search import rebuild_search_index
+from shop.seeding import (
+    SEED_BATCH_SIZE, SEED_SKU_PREFIX, seed_carts, seed_products,
+    seed_reviews, seed_users, seed_wishlists)
+
+
+class Command(BaseCommand):
+    """
+    Fill the database with generated products, users, reviews, carts
+    and wishlists at production-like volumes, written with bulk inserts
+    in batches, for load tests and benchmarks (see bench_storefront).
+    Generated rows are numbered after any from earlier runs, and the
+    same --seed gives the same data on an empty database.
+    """
+    help = "Generate products, users, reviews, carts and wishlists."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products', type=int, default=1000,
+            help="Products to create.")
+        parser.add_argument(
+            '--users', type=int, default=100,
+            help="Users to create.")
+        parser.add_argument(
+            '--reviews', type=int, default=5,
+            help="Average reviews per new product.")
+        parser.add_argument(
+            '--cart-lines', type=int, default=5,
+            help="Cart lines per new user.")
+        parser.add_argument(
+            '--wishlist-items', type=int, default=5,
+            help="Wishlist items per new user.")
+        parser.add_argument(
+            '--password', default='password',
+            help="Password of every new user.")
+        parser.add_argument(
+            '--seed', type=int,
+            help="Random seed, to generate the same data again.")
+        parser.add_argument(
+            '--batch-size', type=int, default=SEED_BATCH_SIZE,
+            help="Rows per INSERT batch.")
+
+    def step(self, label, generate, *args):
+        start = time.perf_counter()
+        created = generate(*args)
+        elapsed = time.perf_counter() - start
+        count = created if isinstance(created, int) else len(created)
+        self.stdout.write(
+            f"{count} {label} in {elapsed:.1f}s "
+            f"({count / elapsed if elapsed else 0:,.0f} rows/s)")
+        return created
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        product_ids = self.step(
+            "products", seed_products, options['products'], rng, batch_size)
+        user_ids = self.step(
+            "users", seed_users, options['users'], options['password'],
+            batch_size)
+        self.step("reviews", seed_reviews, product_ids, user_ids,
+                  options['reviews'], rng, batch_size)
+        self.step("cart lines", seed_carts, user_ids, product_ids,
+                  options['cart_lines'], rng, batch_size)
+        self.step("wishlist items", seed_wishlists, user_ids, product_ids,
+                  options['wishlist_items'], rng, batch_size)
+
+        # Bulk inserts skip the signals that keep these in step
+        if product_ids:
+            rebuild_review_aggregates(Product.objects.filter(
+                pk__gte=min(product_ids), sku__startswith=SEED_SKU_PREFIX))
+        rebuild_search_index()
+        rebuild_facet_counts()
+        self.stdout.write(self.style.SUCCESS("Seeded the shop"))
@@ -0,0 +1,324 @@
+import logging
+import os
+import socket
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# Cache alias configured in settings.CACHES the workers publish their
+# totals to; shared between processes in production ("redis")
+METRICS_CACHE = 'metrics'
+
+# Most seconds a worker's latest requests wait to reach /metrics
+METRICS_FLUSH_INTERVAL = 5
+
+# Seconds the totals of a worker that stopped publishing (e.g. one that
+# was restarted) stay in /metrics; dropping them reads as a counter reset
+METRICS_WORKER_TIMEOUT = 24 * 60 * 60
+
+# Cache key of the list of workers that published totals
+METRICS_WORKERS_KEY = 'metrics:workers'
+
+# Timings of the request being handled. A context variable rather than
+# a thread local, so queries an async view runs through sync_to_async
+# in another thread are still counted against its request.
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """
+    Query count, database time and template render time of one request.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        # Templates rendered from inside another template (e.g. crispy
+        # forms) are already part of the outer render's time
+        self.rendering = 0
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper adding each query and its time to the
+    current request's timings.
+    """
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.db_time += time.perf_counter() - start
+        timing.queries += 1
+
+
+def install_query_recorder(connection, **kwargs):
+    """
+    Wrap a database connection's queries with record_query, once.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedTemplate(Template):
+    """
+    Django template that adds its render time to the current request's
+    timings.
+    """
+
+    def render(self, context=None, request=None):
+        timing = _current.get()
+        if timing is None or timing.rendering:
+            return super().render(context, request)
+        timing.rendering += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.template_time += time.perf_counter() - start
+            timing.rendering -= 1
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, with render times recorded for the
+    request metrics. Costs one context variable lookup per render when
+    metrics are off.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(
+            super().get_template(template_name).template, self)
+
+
+class ViewMetrics:
+    """
+    Per-view request totals, rendered in the Prometheus text exposition
+    format. Each worker process adds up its own requests and publishes
+    its totals to the shared metrics cache at most every
+    METRICS_FLUSH_INTERVAL seconds; the exposition sums the totals of
+    every worker, whichever worker serves the scrape.
+    """
+
+    def __init__(self, worker=None):
+        # Name of this worker's totals in the cache; host and pid when
+        # not given, read at flush time so forked workers differ
+        self.worker = worker
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.views = {}
+            self.flushed = time.monotonic()
+            self.dirty = False
+
+    def record(self, view, timing, duration, over_budget):
+        with self.lock:
+            totals = self.views.get(view)
+            if totals is None:
+                totals = self.views[view] = {
+                    'requests': 0, 'seconds': 0.0, 'queries': 0,
+                    'db_seconds': 0.0, 'template_seconds': 0.0,
+                    'over_budget': 0,
+                    'buckets': [0] * len(LATENCY_BUCKETS)}
+            totals['requests'] += 1
+            totals['seconds'] += duration
+            totals['queries'] += timing.queries
+            totals['db_seconds'] += timing.db_time
+            totals['template_seconds'] += timing.template_time
+            totals['over_budget'] += over_budget
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    totals['buckets'][i] += 1
+            self.dirty = True
+            due = time.monotonic() - self.flushed >= METRICS_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def _worker(self):
+        return self.worker or f'{socket.gethostname()}:{os.getpid()}'
+
+    def _snapshot(self):
+        with self.lock:
+            self.flushed = time.monotonic()
+            self.dirty = False
+            return {view: dict(totals, buckets=list(totals['buckets']))
+                    for view, totals in self.views.items()}
+
+    def flush(self):
+        """
+        Publish this worker's totals to the metrics cache, and list the
+        worker among those the exposition reads.
+        """
+        if not self.dirty:
+            return
+        cache = caches[METRICS_CACHE]
+        worker = self._worker()
+        cache.set(f'metrics:worker:{worker}', self._snapshot(),
+                  timeout=METRICS_WORKER_TIMEOUT)
+        # Two workers adding themselves at once can drop one of them;
+        # the next flush of the dropped worker adds it back
+        workers = cache.get(METRICS_WORKERS_KEY, [])
+        if worker not in workers:
+            cache.set(METRICS_WORKERS_KEY, [*workers, worker], timeout=None)
+
+    def totals(self):
+        """
+        The per-view totals of every worker that published any, summed.
+        """
+        self.flush()
+        cache = caches[METRICS_CACHE]
+        workers = cache.get(METRICS_WORKERS_KEY, [])
+        snapshots = cache.get_many(
+            [f'metrics:worker:{worker}' for worker in workers])
+        if len(snapshots) < len(workers):
+            # Forget workers whose totals expired
+            cache.set(METRICS_WORKERS_KEY, [
+                worker for worker in workers
+                if f'metrics:worker:{worker}' in snapshots], timeout=None)
+        views = {}
+        for snapshot in snapshots.values():
+            for view, totals in snapshot.items():
+                summed = views.get(view)
+                if summed is None:
+                    views[view] = dict(totals, buckets=list(totals['buckets']))
+                    continue
+                for key, value in totals.items():
+                    if key == 'buckets':
+                        summed[key] = [a + b for a, b in
+                                       zip(summed[key], value)]
+                    else:
+                        summed[key] += value
+        return dict(sorted(views.items()))
+
+    def exposition(self):
+        """
+        The totals as Prometheus metrics text.
+        """
+        views = self.totals()
+        lines = []
+
+        def family(name, kind, text, key):
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for view, totals in views.items():
+                lines.append(f'{name}{{view="{view}"}} {totals[key]}')
+
+        family('shop_requests_total', 'counter',
+               'Requests handled per view.', 'requests')
+        family('shop_db_queries_total', 'counter',
+               'SQL queries run per view.', 'queries')
+        family('shop_db_seconds_total', 'counter',
+               'Time spent in SQL queries per view.', 'db_seconds')
+        family('shop_template_seconds_total', 'counter',
+               'Time spent rendering templates per view.',
+               'template_seconds')
+        family('shop_query_budget_exceeded_total', 'counter',
+               'Requests that ran more queries than QUERY_BUDGET.',
+               'over_budget')
+
+        name = 'shop_request_duration_seconds'
+        lines.append(f'# HELP {name} Request latency per view.')
+        lines.append(f'# TYPE {name} histogram')
+        for view, totals in views.items():
+            for bound, count in zip(LATENCY_BUCKETS, totals['buckets']):
+                lines.append(
+                    f'{name}_bucket{{view="{view}",le="{bound}"}} {count}')
+            lines.append(
+                f'{name}_bucket{{view="{view}",le="+Inf"}} '
+                f'{totals["requests"]}')
+            lines.append(f'{name}_sum{{view="{view}"}} {totals["seconds"]}')
+            lines.append(
+                f'{name}_count{{view="{view}"}} {totals["requests"]}')
+        return '\n'.join(lines) + '\n'
+
+
+VIEW_METRICS = ViewMetrics()
+
+
+class RequestMetricsMiddleware:
+    """
+    Record each request's query count, database time, template render
+    time and total latency: returned in a Server-Timing header, added to
+    the per-view totals served at /metrics, and logged as a warning when
+    a view runs more queries than settings.QUERY_BUDGET.
+    Removed from the middleware chain unless settings.REQUEST_METRICS
+    is set. Handles sync and async requests without switching modes.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.budget = getattr(settings, 'QUERY_BUDGET', None)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_recorder)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing, start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing, start)
+
+    def finish(self, request, response, timing, start):
+        duration = time.perf_counter() - start
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timing.db_time * 1000:.1f};'
+            f'desc="{timing.queries} queries"',
+            f'tpl;dur={timing.template_time * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ])
+        match = request.resolver_match
+        if match is None:
+            # Static files and unknown URLs
+            return response
+        view = match.view_name
+        over_budget = (
+            self.budget is not None and timing.queries > self.budget)
+        if over_budget:
+            logger.warning(
+                "%s ran %d queries for %s (budget %d)",
+                view, timing.queries, request.path, self.budget)
+        VIEW_METRICS.record(view, timing, duration, over_budget)
+        return response
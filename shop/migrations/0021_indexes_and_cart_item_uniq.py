@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:18
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    """
+    Fold duplicate (user, product) cart lines into the oldest one,
+    summing their quantities, so the unique constraint can be added.
+    """
+    Cart_Item = apps.get_model('shop', 'Cart_Item')
+    duplicates = (
+        Cart_Item.objects.values('user', 'product')
+        .annotate(lines=Count('id'), keep=Min('id'), total=Sum('quantity'))
+        .filter(lines__gt=1)
+    )
+    for dup in duplicates:
+        Cart_Item.objects.filter(id=dup['keep']).update(quantity=dup['total'])
+        Cart_Item.objects.filter(
+            user=dup['user'], product=dup['product']
+        ).exclude(id=dup['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0020_alter_wishlist_options_remove_wishlist_created_on_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['status', 'category', 'created_on'], name='product_status_cat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', True), ('stock_quantity__gt', 0)), fields=['created_on', 'id'], name='product_listed_instock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product_id', '-created_on'], name='review_product_created_idx'),
+        ),
+        migrations.RunPython(
+            merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart_item',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='cart_item_user_product_uniq'),
+        ),
+    ]
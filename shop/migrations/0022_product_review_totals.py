@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:19
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_review_totals(apps, schema_editor):
+    """
+    Fill the new review totals and review_average from existing reviews.
+    """
+    Product = apps.get_model('shop', 'Product')
+    Review = apps.get_model('shop', 'Review')
+    reviews = (
+        Review.objects.filter(product_id=OuterRef('pk'))
+        .order_by()
+        .values('product_id')
+    )
+    Product.objects.update(
+        review_count=Coalesce(
+            Subquery(reviews.annotate(n=Count('id')).values('n')), 0),
+        review_sum=Coalesce(
+            Subquery(reviews.annotate(s=Sum('review_score')).values('s')), 0),
+    )
+    for product in Product.objects.filter(review_count__gt=0).iterator():
+        product.review_average = round(
+            product.review_sum / product.review_count, 1)
+        product.save(update_fields=['review_average'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0021_indexes_and_cart_item_uniq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='review_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(
+            backfill_review_totals, migrations.RunPython.noop),
+    ]
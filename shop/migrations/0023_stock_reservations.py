@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:29
+
+from django.conf import settings
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+
+def reserve_existing_cart_items(apps, schema_editor):
+    """
+    Treat what is already in carts as reserved: move those quantities
+    from available to reserved stock and start their reservations now.
+    Carts holding more than the stock leave none available rather than
+    a negative amount.
+    """
+    Product = apps.get_model('shop', 'Product')
+    Cart_Item = apps.get_model('shop', 'Cart_Item')
+    held = Coalesce(Subquery(
+        Cart_Item.objects.filter(product=OuterRef('pk'))
+        .order_by().values('product')
+        .annotate(total=Sum('quantity')).values('total')), 0)
+    Product.objects.filter(stagedproduct__isnull=False).update(
+        stock_quantity=Greatest(F('stock_quantity') - held, 0),
+        reserved_quantity=held,
+    )
+    Cart_Item.objects.update(reserved_until=timezone.now() + timedelta(
+        minutes=getattr(settings, 'CART_RESERVATION_MINUTES', 30)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0022_product_review_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart_item',
+            name='reserved_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reserved_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='cart_item',
+            index=models.Index(fields=['reserved_until'], name='cart_item_reserved_until_idx'),
+        ),
+        migrations.RunPython(
+            reserve_existing_cart_items, migrations.RunPython.noop),
+    ]
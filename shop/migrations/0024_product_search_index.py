@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:40
+
+from django.db import migrations
+
+PG_DOCUMENT = (
+    "to_tsvector('english', coalesce(product_name, '') || ' ' || "
+    "coalesce(subtitle, '') || ' ' || coalesce(description, ''))"
+)
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Postgres: GIN index over the product text document.
+    SQLite: FTS5 table filled with the existing products' text.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX product_search_gin_idx ON shop_product "
+            f"USING GIN ({PG_DOCUMENT})")
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE shop_product_fts "
+            "USING fts5(product_name, subtitle, description)")
+        schema_editor.execute(
+            "INSERT INTO shop_product_fts "
+            "(rowid, product_name, subtitle, description) "
+            "SELECT id, product_name, subtitle, description FROM shop_product")
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS product_search_gin_idx")
+    elif vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS shop_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0023_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:41
+
+from django.db import migrations, models
+
+
+def flag_existing_images(apps, schema_editor):
+    """
+    Mark products whose main image is a real upload, not the placeholder.
+    """
+    Product = apps.get_model('shop', 'Product')
+    Product.objects.exclude(main_image='').exclude(
+        main_image__contains='placeholder').update(has_image=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0024_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='has_image',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(
+            flag_existing_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:02
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def fill_slugs(apps, schema_editor):
+    """
+    Give every existing product a unique slug made from its name,
+    numbering repeats in id order as Product.unique_slug() does.
+    """
+    Product = apps.get_model('shop', 'Product')
+    taken = set()
+    products = list(Product.objects.order_by('id').only('id', 'product_name'))
+    for product in products:
+        base = slug = slugify(product.product_name)[:200] or 'product'
+        number = 1
+        while slug in taken:
+            number += 1
+            slug = f"{base}-{number}"
+        taken.add(slug)
+        product.slug = slug
+    Product.objects.bulk_update(products, ['slug'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0025_product_has_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='slug',
+            field=models.SlugField(
+                default='', editable=False, max_length=220, db_index=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='product',
+            name='slug',
+            field=models.SlugField(editable=False, max_length=220, unique=True),
+        ),
+    ]
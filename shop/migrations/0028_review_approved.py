@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def approve_existing_reviews(apps, schema_editor):
+    """
+    Reviews written before moderation were already public; keep them so.
+    """
+    Review = apps.get_model('shop', 'Review')
+    Review.objects.update(approved=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0027_review_page_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='review',
+            name='review_product_created_id_idx',
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='approved',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(
+            approve_existing_reviews, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('approved', True)), fields=['product_id', '-created_on', '-id'], name='review_approved_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('approved', False)), fields=['created_on'], name='review_pending_created_idx'),
+        ),
+    ]
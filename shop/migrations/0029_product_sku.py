@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+def fill_skus(apps, schema_editor):
+    """
+    Give every existing product a SKU made from its id, so the current
+    catalog can be exported and imported again by key.
+    """
+    Product = apps.get_model('shop', 'Product')
+    products = list(Product.objects.order_by('id').only('id'))
+    for product in products:
+        product.sku = f"DH-{product.id:06d}"
+    Product.objects.bulk_update(products, ['sku'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0028_review_approved'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(
+                blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(fill_skus, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:05
+
+import django.db.models.expressions
+import django.db.models.lookups
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0029_product_sku'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_listed_instock_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', True), django.db.models.lookups.GreaterThan(django.db.models.expressions.CombinedExpression(models.F('stock_quantity'), '+', models.F('reserved_quantity')), 0)), fields=['created_on', 'id'], name='product_listed_instock_idx'),
+        ),
+    ]
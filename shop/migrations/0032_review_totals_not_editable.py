@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0031_reserved_quantity_not_editable'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='review_average',
+            field=models.DecimalField(decimal_places=1, default=0.0, editable=False, max_digits=3),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='review_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0032_review_totals_not_editable'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='slug',
+            field=models.SlugField(db_index=False, editable=False, max_length=220),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:30
+
+from html import unescape
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+
+def reindex_plain_text(apps, schema_editor):
+    """
+    SQLite: re-copy descriptions into the FTS5 table without their HTML
+    markup. Postgres needs nothing, to_tsvector() skips tags itself.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Product = apps.get_model('shop', 'Product')
+    rows = Product.objects.order_by().values_list(
+        'id', 'description').iterator(chunk_size=1000)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            "UPDATE shop_product_fts SET description = %s WHERE rowid = %s",
+            ((unescape(strip_tags(description or '')), product_id)
+             for product_id, description in rows))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0033_product_slug_not_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex_plain_text, migrations.RunPython.noop),
+    ]
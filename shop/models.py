@@ -1,12 +1,30 @@
 from django.db import models
+from django.db.models.lookups import GreaterThan
 from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils.text import slugify
 from cloudinary.models import CloudinaryField
 
+from .images import PLACEHOLDER_IMAGE, image_url, is_placeholder
+
 STATUS = ((True, "Listed"), (False, "Unlisted"))
 
 # Create your models here.
 
 
+class ProductQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Give products created without a slug the one save() would, as
+        bulk_create skips save().
+        """
+        objs = list(objs)
+        for product in objs:
+            if not product.slug:
+                product.slug = product.slug_base()
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Product(models.Model):
     """
     Stores a single product's information.
@@ -41,25 +59,93 @@ class Product(models.Model):
 
     status = models.BooleanField(default=False)
     product_name = models.CharField(max_length=200, default="newProduct")
+    # URL slug made from product_name by save(); lookups use the id alone,
+    # so products with the same name share a slug
+    slug = models.SlugField(max_length=220, db_index=False, editable=False)
+    # Stock keeping unit: the stable key bulk imports match products on
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     subtitle = models.CharField(max_length=200, default="newProductDesc")
     category = models.CharField(max_length=109,
                                 choices=CATEGORY_CHOICES,
                                 default="unknown")
-    main_image = CloudinaryField('image', default='placeholder')
+    main_image = CloudinaryField('image', default=PLACEHOLDER_IMAGE)
+    # False while main_image is the placeholder; kept in step by save()
+    has_image = models.BooleanField(default=False, editable=False)
     price = models.DecimalField(max_digits=7, decimal_places=2)
+    # Units available to add to carts; units held in carts are reserved
     stock_quantity = models.IntegerField()
+    # Changed only with F() updates in shop.cart, never by forms
+    reserved_quantity = models.PositiveIntegerField(
+        default=0, editable=False)
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
     description = models.TextField()
+    # Running review totals, maintained by shop.reviews with F() updates
+    # and never by forms
     review_average = models.DecimalField(
-        max_digits=3, decimal_places=1, default=0.0)
+        max_digits=3, decimal_places=1, default=0.0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    review_sum = models.IntegerField(default=0, editable=False)
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         ordering = ["created_on"]
+        indexes = [
+            # Catalog filtered by status and category, in date order
+            models.Index(
+                fields=['status', 'category', 'created_on'],
+                name='product_status_cat_created_idx'),
+            # Storefront listing: only listed products with stock on hand
+            models.Index(
+                fields=['created_on', 'id'],
+                condition=models.Q(status=True) & models.Q(GreaterThan(
+                    models.F('stock_quantity') + models.F('reserved_quantity'),
+                    0)),
+                name='product_listed_instock_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product_name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Field values as loaded, for save signals to tell what changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        deferred = self.get_deferred_fields()
+        update_fields = kwargs.get('update_fields')
+        if 'sku' not in deferred and not self.sku:
+            # Blank admin input; unique allows many NULLs but one ''
+            self.sku = None
+        if 'main_image' not in deferred:
+            self.has_image = not is_placeholder(self.main_image)
+            if update_fields is not None and 'main_image' in update_fields:
+                update_fields = {*update_fields, 'has_image'}
+        if 'product_name' not in deferred and 'slug' not in deferred:
+            self.slug = self.slug_base()
+            if update_fields is not None and 'product_name' in update_fields:
+                update_fields = {*update_fields, 'slug'}
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+    def slug_base(self):
+        return slugify(self.product_name)[:200] or 'product'
+
+    def get_absolute_url(self):
+        return reverse('product_page', args=[self.id, self.slug])
+
+    @property
+    def image_url(self):
+        """
+        Cached URL of the product's main image.
+        """
+        return image_url(self.main_image)
+
 
 class Customer(models.Model):
     username = models.CharField(max_length=20, unique=True)
@@ -84,9 +170,23 @@ class Cart_Item(models.Model):
     quantity = models.PositiveIntegerField(default=0)
     user = models.ForeignKey(User, default=None, on_delete=models.CASCADE)
     date_added = models.DateTimeField(auto_now_add=True)
+    # When this line's stock reservation lapses (None: holds no stock)
+    reserved_until = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ["product"]
+        indexes = [
+            # Sweeping expired reservations
+            models.Index(
+                fields=['reserved_until'],
+                name='cart_item_reserved_until_idx'),
+        ]
+        constraints = [
+            # One cart line per product per user
+            models.UniqueConstraint(
+                fields=['user', 'product'],
+                name='cart_item_user_product_uniq'),
+        ]
 
     def __str__(self):
         return f'{self.quantity} x {self.product.product_name}'
@@ -137,9 +237,24 @@ class Review(models.Model):
     content = models.TextField()
     created_on = models.DateTimeField(auto_now_add=True)
     review_score = models.IntegerField()
+    # Only approved reviews are shown and count towards the rating
+    approved = models.BooleanField(default=False)
 
     class Meta:
         ordering = ["created_on"]
+        indexes = [
+            # A product's published reviews, newest first, paged by
+            # (created_on, id)
+            models.Index(
+                fields=['product_id', '-created_on', '-id'],
+                condition=models.Q(approved=True),
+                name='review_approved_product_idx'),
+            # Moderation queue, oldest first
+            models.Index(
+                fields=['created_on'],
+                condition=models.Q(approved=False),
+                name='review_pending_created_idx'),
+        ]
 
     def __str__(self):
         return f"{
@@ -0,0 +1,98 @@
+import time
+
+from django.core.cache import caches
+
+# Cache alias configured in settings.CACHES for rendered product pages
+PRODUCT_PAGE_CACHE = 'product_pages'
+
+HITS_KEY = 'product_page:hits'
+MISSES_KEY = 'product_page:misses'
+
+
+def _cache():
+    return caches[PRODUCT_PAGE_CACHE]
+
+
+def _version_key(product_id):
+    return f'product_page:{product_id}:version'
+
+
+def _incr(key):
+    """
+    Increment a counter in the cache, creating it when missing.
+    """
+    cache = _cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def product_version(product_id):
+    """
+    Current version number of a product's cached page. A missing version
+    (never set, or evicted) starts at the current time in milliseconds so
+    it can never collide with a version used before the eviction.
+    """
+    key = _version_key(product_id)
+    cache = _cache()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1_000_000, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _page_key(product_id, version):
+    return f'product_page:{product_id}:v{version}'
+
+
+def get_product_fragment(product_id, slug, version):
+    """
+    Return the product/reviews HTML cached for a product under version
+    (from product_version()), or None on a miss. The slug is checked so
+    a stale or mistyped URL still gets redirected.
+    """
+    entry = _cache().get(_page_key(product_id, version)) if version else None
+    if entry is None or entry['slug'] != slug:
+        _incr(MISSES_KEY)
+        return None
+    _incr(HITS_KEY)
+    return entry['html']
+
+
+def set_product_fragment(product_id, slug, html, version):
+    """
+    Store the rendered product/reviews HTML under version, which must
+    be read before the data it was rendered from: a change committed
+    while rendering then bumps the version past it, instead of the old
+    HTML being stored under the new one.
+    """
+    if version:
+        _cache().set(
+            _page_key(product_id, version),
+            {'slug': slug, 'html': html})
+
+
+def invalidate_product(product_id):
+    """
+    Retire every cached page of a product by bumping its version.
+    Old entries are never read again and simply expire.
+    """
+    try:
+        _cache().incr(_version_key(product_id))
+    except ValueError:
+        # No version stored, so nothing cached under it either
+        pass
+
+
+def page_cache_stats():
+    """
+    Hit and miss counters for the product page cache.
+    """
+    counters = _cache().get_many([HITS_KEY, MISSES_KEY])
+    return {
+        'hits': counters.get(HITS_KEY, 0),
+        'misses': counters.get(MISSES_KEY, 0),
+    }
@@ -0,0 +1,226 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .catalog import remember_slug
+from .images import PLACEHOLDER_IMAGE, is_placeholder
+from .models import Product
+from .page_cache import invalidate_product
+
+# Rows read, validated and written per transaction
+IMPORT_BATCH_SIZE = 1000
+
+# Rows per INSERT/UPDATE statement (Django lowers it further if the
+# database cannot take that many parameters)
+WRITE_BATCH_SIZE = 500
+
+# Columns of an import or export file, in export order. stock_quantity
+# in a file is stock on hand: units available plus units held in carts.
+PRODUCT_FIELDS = (
+    'sku', 'product_name', 'subtitle', 'category', 'price', 'stock_quantity',
+    'status', 'description', 'main_image',
+)
+
+# Fields an import overwrites on products it matches by SKU
+UPDATE_FIELDS = [
+    field for field in PRODUCT_FIELDS if field != 'sku'
+] + ['slug', 'has_image', 'updated_on']
+
+TRUE_VALUES = {'1', 'true', 'yes', 'listed'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'unlisted'}
+
+MAX_PRICE = Decimal('99999.99')
+
+
+class RowError(ValueError):
+    """
+    Raised for an import row that cannot be turned into a product.
+    """
+
+
+def categories():
+    """
+    The category values Product.CATEGORY_CHOICES allows.
+    """
+    values = set()
+    for value, label in Product.CATEGORY_CHOICES:
+        if isinstance(label, (list, tuple)):
+            values.update(choice for choice, _ in label)
+        else:
+            values.add(value)
+    return values
+
+
+def read_rows(file, file_format):
+    """
+    Yield the rows of a CSV or JSON Lines file as dicts, one at a time.
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield RowError(f"invalid JSON: {e.msg}")
+
+
+def chunks(iterable, size):
+    """
+    Split an iterable into lists of at most size items, lazily.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _text(row, field, default='', max_length=None, required=False):
+    value = row.get(field)
+    value = default if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f"{field} is required")
+    if max_length and len(value) > max_length:
+        raise RowError(f"{field} is longer than {max_length} characters")
+    return value
+
+
+def clean_row(row, allowed_categories):
+    """
+    Validate one import row and convert it to Product field values.
+    Raises RowError when it is invalid.
+    """
+    if isinstance(row, RowError):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError("row is not an object")
+    values = {
+        'sku': _text(row, 'sku', max_length=64, required=True),
+        'product_name': _text(
+            row, 'product_name', max_length=200, required=True),
+        'subtitle': _text(row, 'subtitle', max_length=200),
+        'category': _text(row, 'category', default='unknown') or 'unknown',
+        'description': _text(row, 'description'),
+        'main_image': _text(row, 'main_image') or PLACEHOLDER_IMAGE,
+    }
+    if values['category'] not in allowed_categories:
+        raise RowError(f"unknown category {values['category']!r}")
+    try:
+        price = Decimal(str(row.get('price', '')).strip())
+    except InvalidOperation:
+        raise RowError(f"invalid price {row.get('price')!r}")
+    if not price.is_finite() or not 0 <= price <= MAX_PRICE:
+        raise RowError(f"price {price} is out of range")
+    values['price'] = price.quantize(Decimal('0.01'))
+    try:
+        values['stock_quantity'] = int(
+            str(row.get('stock_quantity', '')).strip() or 0)
+    except ValueError:
+        raise RowError(
+            f"invalid stock_quantity {row.get('stock_quantity')!r}")
+    if values['stock_quantity'] < 0:
+        raise RowError("stock_quantity is negative")
+    status = str(row.get('status', '')).strip().lower()
+    if status not in TRUE_VALUES | FALSE_VALUES:
+        raise RowError(f"invalid status {row.get('status')!r}")
+    values['status'] = status in TRUE_VALUES
+    return values
+
+
+def import_chunk(rows):
+    """
+    Upsert a chunk of cleaned rows by SKU in one transaction: products
+    with a known SKU are bulk updated, the rest bulk created. A later
+    row with the same SKU wins. The file's stock_quantity is stock on
+    hand, so units reserved in carts since an export are subtracted
+    rather than made available again. A row with less stock on hand
+    than its product has reserved is rejected, leaving the product
+    as it was.
+    Returns the number of products created and updated, and a dict of
+    rejected SKUs to the RowError explaining why.
+    """
+    rows = list({row['sku']: row for row in rows}.values())
+    if not rows:
+        return 0, 0, {}
+    now = timezone.now()
+    with transaction.atomic():
+        # Locked, so no cart reserves more of them before the update
+        existing = {
+            sku: (pk, name, slug, reserved)
+            for sku, pk, name, slug, reserved in Product.objects.filter(
+                sku__in=[row['sku'] for row in rows]
+            ).select_for_update().values_list(
+                'sku', 'pk', 'product_name', 'slug', 'reserved_quantity')}
+        created, updated, renamed, rejected = [], [], [], {}
+        for row in rows:
+            product = Product(**row)
+            product.has_image = not is_placeholder(row['main_image'])
+            if row['sku'] in existing:
+                product.pk, name, product.slug, reserved = (
+                    existing[row['sku']])
+                if row['stock_quantity'] < reserved:
+                    rejected[row['sku']] = RowError(
+                        f"stock_quantity {row['stock_quantity']} is below "
+                        f"the {reserved} units held in carts")
+                    continue
+                product.updated_on = now
+                product.stock_quantity = row['stock_quantity'] - reserved
+                updated.append(product)
+                if name != product.product_name:
+                    renamed.append(product)
+            else:
+                created.append(product)
+        for product in created + renamed:
+            product.slug = product.slug_base()
+        Product.objects.bulk_create(created, batch_size=WRITE_BATCH_SIZE)
+        Product.objects.bulk_update(
+            updated, UPDATE_FIELDS, batch_size=WRITE_BATCH_SIZE)
+        # Bulk writes skip the save signals that keep these in step
+        for product in updated:
+            transaction.on_commit(
+                lambda pk=product.pk: invalidate_product(pk))
+        for product in renamed:
+            transaction.on_commit(
+                lambda pk=product.pk, slug=product.slug:
+                remember_slug(pk, slug))
+    return len(created), len(updated), rejected
+
+
+def export_rows(batch_size=IMPORT_BATCH_SIZE):
+    """
+    Yield every product as a dict of PRODUCT_FIELDS in id order,
+    fetching batch_size rows at a time. stock_quantity is stock on hand.
+    """
+    image_field = Product._meta.get_field('main_image')
+    columns = [
+        F('stock_quantity') + F('reserved_quantity')
+        if field == 'stock_quantity' else field
+        for field in PRODUCT_FIELDS]
+    rows = Product.objects.order_by('pk').values_list(
+        *columns).iterator(chunk_size=batch_size)
+    for values in rows:
+        row = dict(zip(PRODUCT_FIELDS, values))
+        row['sku'] = row['sku'] or ''
+        row['price'] = str(row['price'])
+        row['status'] = 'true' if row['status'] else 'false'
+        row['main_image'] = image_field.get_prep_value(row['main_image'])
+        yield row
+
+
+def write_rows(file, rows, file_format):
+    """
+    Write product rows to a CSV or JSON Lines file as they come.
+    """
+    if file_format == 'csv':
+        writer = csv.DictWriter(file, fieldnames=PRODUCT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+    for row in rows:
+        file.write(json.dumps(row) + '\n')
+
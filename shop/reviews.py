@@ -0,0 +1,150 @@
+from django.db import transaction
+from django.db.models import Case, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.lookups import GreaterThan
+
+from .catalog import decode_cursor, encode_cursor
+from .models import Product, Review
+from .page_cache import invalidate_product
+
+# Reviews shown on the product page, and fetched per "load more"
+REVIEW_PAGE_SIZE = 10
+
+
+def _average(count, total):
+    """
+    SQL expression for total / count as a rating average, 0 when count is 0.
+    """
+    return Case(
+        When(GreaterThan(count, 0),
+             then=Cast(total, FloatField()) / count),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def _adjust_review_totals(product_id, count_delta, score_delta):
+    """
+    Shift a product's review_count and review_sum and recompute
+    review_average in a single UPDATE, so concurrent reviews never
+    overwrite each other's totals.
+    """
+    count = F('review_count') + count_delta
+    total = F('review_sum') + score_delta
+    Product.objects.filter(pk=product_id).update(
+        review_count=count,
+        review_sum=total,
+        review_average=_average(count, total),
+    )
+
+
+def record_review(review):
+    """
+    Add a newly saved review to its product's rating totals, if it is
+    approved. Call inside the transaction that saved the review.
+    """
+    if review.approved:
+        _adjust_review_totals(review.product_id_id, 1, review.review_score)
+
+
+def discard_review(review):
+    """
+    Remove a deleted review from its product's rating totals, if it was
+    approved. Call inside the transaction that deleted the review.
+    """
+    if review.approved:
+        _adjust_review_totals(
+            review.product_id_id, -1, -review.review_score)
+
+
+def rebuild_review_aggregates(products=None):
+    """
+    Recompute review_count, review_sum and review_average for the given
+    products (all products by default) from their approved reviews,
+    using one grouped aggregate per product inside a single UPDATE.
+    Returns the number of products updated.
+    """
+    if products is None:
+        products = Product.objects.all()
+    reviews = (
+        Review.objects.filter(product_id=OuterRef('pk'), approved=True)
+        .order_by()
+        .values('product_id')
+    )
+    count = Coalesce(
+        Subquery(reviews.annotate(n=Count('id')).values('n')), 0)
+    total = Coalesce(
+        Subquery(reviews.annotate(s=Sum('review_score')).values('s')), 0)
+    return products.update(
+        review_count=count, review_sum=total,
+        review_average=_average(count, total))
+
+
+def _refresh_products(product_ids):
+    """
+    Recompute the rating totals of the given products and drop their
+    cached pages once the change is committed.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    rebuild_review_aggregates(Product.objects.filter(id__in=product_ids))
+    for product_id in product_ids:
+        transaction.on_commit(
+            lambda product_id=product_id: invalidate_product(product_id))
+
+
+def _product_ids(reviews):
+    return reviews.order_by().values_list('product_id', flat=True).distinct()
+
+
+def approve_reviews(reviews):
+    """
+    Publish the pending reviews among the given ones with a single
+    UPDATE, then recompute the ratings of just the affected products.
+    Returns the number of reviews approved.
+    """
+    with transaction.atomic():
+        pending = reviews.filter(approved=False)
+        product_ids = list(_product_ids(pending))
+        approved = pending.update(approved=True)
+        _refresh_products(product_ids)
+    return approved
+
+
+def reject_reviews(reviews):
+    """
+    Delete the given reviews in bulk, then recompute the ratings of the
+    products that lose published reviews.
+    Returns the number of reviews deleted.
+    """
+    with transaction.atomic():
+        product_ids = list(_product_ids(reviews.filter(approved=True)))
+        deleted, _ = reviews.delete()
+        _refresh_products(product_ids)
+    return deleted
+
+
+def review_page(product_id, cursor=None, page_size=REVIEW_PAGE_SIZE):
+    """
+    Fetch one page of a product's approved reviews, newest first, using
+    keyset pagination on (created_on, id) with each author joined in.
+    Returns the list of reviews and the cursor for the next page
+    (None on the last page).
+    """
+    queryset = Review.objects.filter(
+        product_id=product_id, approved=True).select_related('username')
+    if cursor:
+        created_on, review_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_on__lt=created_on)
+            | Q(created_on=created_on, id__lt=review_id)
+        )
+    # Fetch one extra row to find out whether another page exists
+    reviews = list(queryset.order_by('-created_on', '-id')[:page_size + 1])
+    next_cursor = None
+    if len(reviews) > page_size:
+        reviews = reviews[:page_size]
+        next_cursor = encode_cursor(reviews[-1])
+    return reviews, next_cursor
@@ -0,0 +1,29 @@
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class StaticFilesTestRunner(DiscoverRunner):
+    """
+    Test runner that collects static files into a temporary STATIC_ROOT
+    before the tests, so templates are rendered against the production
+    manifest storage and a {% static %} reference to a missing file
+    fails as it would in production. Files are not precompressed, which
+    would make every run much slower.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.static_root = tempfile.mkdtemp()
+        self.static_settings = override_settings(
+            STATIC_ROOT=self.static_root, STATIC_PRECOMPRESS=False)
+        self.static_settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def teardown_test_environment(self, **kwargs):
+        self.static_settings.disable()
+        shutil.rmtree(self.static_root, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,176 @@
+from html import unescape
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, Count, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+
+from .catalog import category_values, listed_products
+from .models import Product
+
+# Most search results shown on the storefront
+SEARCH_LIMIT = 48
+
+# SQLite: FTS5 table holding a copy of each product's searchable text
+FTS_TABLE = 'shop_product_fts'
+
+# Products read and written per batch when the FTS5 table is rebuilt
+INDEX_BATCH_SIZE = 1000
+
+# Postgres: the document behind the GIN index added in migration 0024.
+# Queries must use exactly this expression for the index to apply.
+PG_DOCUMENT = (
+    "to_tsvector('english', coalesce(product_name, '') || ' ' || "
+    "coalesce(subtitle, '') || ' ' || coalesce(description, ''))"
+)
+
+
+def _fts_query(query):
+    """
+    Turn free text into an FTS5 query matching every word as a prefix,
+    quoting each word so user input cannot inject FTS syntax.
+    """
+    words = query.split()
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def matching_products(queryset, query):
+    """
+    Narrow a Product queryset to products whose name, subtitle or
+    description match the search text, using the database's full-text
+    index (GIN on Postgres, FTS5 on SQLite). Other databases fall back
+    to icontains scans.
+    """
+    query = query.strip()
+    if not query:
+        return queryset.none()
+    if connection.vendor == 'postgresql':
+        return queryset.filter(RawSQL(
+            f"{PG_DOCUMENT} @@ websearch_to_tsquery('english', %s)",
+            [query], output_field=BooleanField()))
+    if connection.vendor == 'sqlite':
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [_fts_query(query)]))
+    match = Q()
+    for word in query.split():
+        match &= (Q(product_name__icontains=word)
+                  | Q(subtitle__icontains=word)
+                  | Q(description__icontains=word))
+    return queryset.filter(match)
+
+
+def ranked_matches(queryset, query):
+    """
+    Narrow a Product queryset to the products matching the search text,
+    like matching_products(), ordered by relevance (best first) with the
+    score as rank. On SQLite the FTS5 table is joined once and bm25()
+    read from it, rather than matched again for every product.
+    """
+    query = query.strip()
+    if connection.vendor == 'sqlite':
+        if not query:
+            return queryset.none()
+        # bm25() is lower for better matches, so negate it
+        queryset = queryset.extra(
+            select={'rank': f'-bm25({FTS_TABLE})'},
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {Product._meta.db_table}.id',
+                   f'{FTS_TABLE} MATCH %s'],
+            params=[_fts_query(query)])
+        return queryset.order_by('-rank', 'id')
+    queryset = matching_products(queryset, query)
+    if connection.vendor == 'postgresql':
+        rank = RawSQL(
+            f"ts_rank({PG_DOCUMENT}, websearch_to_tsquery('english', %s))",
+            [query], output_field=FloatField())
+    else:
+        rank = Value(0.0, output_field=FloatField())
+    return queryset.annotate(rank=rank).order_by('-rank', 'id')
+
+
+def search_products(query, category=None, limit=SEARCH_LIMIT):
+    """
+    Search listed products with stock on hand. Returns the best matches
+    (optionally within a category or category group) and the number of
+    matches in each category across all results, for facet links.
+    """
+    matches = matching_products(listed_products(), query)
+    facets = dict(
+        matches.order_by().values_list('category').annotate(n=Count('id')))
+    products = listed_products()
+    if category:
+        products = products.filter(
+            category__in=category_values(category) or [])
+    products = list(ranked_matches(products, query)[:limit])
+    return products, facets
+
+
+def search_text(html):
+    """
+    Plain text of a rich-text (Summernote HTML) field, so tag and
+    attribute names are not indexed as words.
+    """
+    return unescape(strip_tags(html or ''))
+
+
+def _index_row(product_id, product_name, subtitle, description):
+    return [product_id, product_name, subtitle, search_text(description)]
+
+
+def index_product(product):
+    """
+    Store a product's current text in the SQLite FTS5 table.
+    Postgres indexes the columns directly (its parser skips HTML tags),
+    so there is nothing to do there.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} "
+            "(rowid, product_name, subtitle, description) "
+            "VALUES (%s, %s, %s, %s)",
+            _index_row(product.pk, product.product_name, product.subtitle,
+                       product.description))
+
+
+def unindex_product(product_id):
+    """
+    Remove a deleted product from the SQLite FTS5 table.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+
+def rebuild_search_index(batch_size=INDEX_BATCH_SIZE):
+    """
+    Re-copy every product into the SQLite FTS5 table, e.g. after a bulk
+    import that skipped save signals, batch_size products per INSERT.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    rows = Product.objects.order_by().values_list(
+        'id', 'product_name', 'subtitle', 'description')
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(_index_row(*row))
+            if len(batch) == batch_size:
+                _insert_rows(cursor, batch)
+                batch = []
+        if batch:
+            _insert_rows(cursor, batch)
+
+
+def _insert_rows(cursor, rows):
+    cursor.executemany(
+        f"INSERT INTO {FTS_TABLE} "
+        "(rowid, product_name, subtitle, description) "
+        "VALUES (%s, %s, %s, %s)", rows)
@@ -0,0 +1,179 @@
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .images import PLACEHOLDER_IMAGE
+from .models import Cart_Item, Product, Review, Wishlist, Wishlist_Item
+from .product_io import categories, chunks, import_chunk
+
+# SKU and username prefixes of generated rows, so reruns add to them
+SEED_SKU_PREFIX = 'SEED-'
+SEED_USER_PREFIX = 'seed_user_'
+
+# Rows per INSERT batch and transaction
+SEED_BATCH_SIZE = 1000
+
+ADJECTIVES = (
+    'Ancient', 'Blessed', 'Cursed', 'Dwarven', 'Elven', 'Gilded', 'Grim',
+    'Hallowed', 'Iron', 'Mithril', 'Oaken', 'Rusty', 'Runed', 'Silver',
+    'Storm', 'Vorpal',
+)
+
+NOUNS = {
+    'onehanded': ('Sword', 'Mace', 'Axe', 'Dagger'),
+    'twohanded': ('Greatsword', 'Warhammer', 'Halberd', 'Maul'),
+    'bow': ('Longbow', 'Shortbow'),
+    'crossbow': ('Crossbow', 'Arbalest'),
+    'light': ('Jerkin', 'Leathers'),
+    'medium': ('Hauberk', 'Brigandine'),
+    'heavy': ('Plate', 'Breastplate'),
+    'exotic': ('Chakram', 'Boomerang'),
+}
+
+REVIEW_TITLES = (
+    'Worth every coin', 'Does the job', 'Heavier than it looks',
+    'Slew a dragon with it', 'Came slightly dented', 'Would buy again',
+)
+
+
+def _names(prefix, start, count):
+    return [f"{prefix}{number:07d}" for number in range(start, start + count)]
+
+
+def _next_number(queryset, field, prefix):
+    """
+    One past the highest number used after prefix in field, so a rerun
+    continues where the last one stopped.
+    """
+    last = queryset.filter(**{f'{field}__startswith': prefix}).order_by(
+        f'-{field}').values_list(field, flat=True).first()
+    return int(last[len(prefix):]) + 1 if last else 1
+
+
+def _last_pk(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return last or 0
+
+
+def seed_products(count, rng, batch_size=SEED_BATCH_SIZE):
+    """
+    Create count products, nine in ten of them listed, with the same
+    batched upsert the product import uses. Returns the new products'
+    ids.
+    """
+    allowed = sorted(categories() & set(NOUNS))
+    start = _next_number(Product.objects, 'sku', SEED_SKU_PREFIX)
+    last_pk = _last_pk(Product)
+    for skus in chunks(_names(SEED_SKU_PREFIX, start, count), batch_size):
+        rows = []
+        for sku in skus:
+            category = rng.choice(allowed)
+            noun = rng.choice(NOUNS[category])
+            number = sku[len(SEED_SKU_PREFIX):]
+            rows.append({
+                'sku': sku,
+                'product_name': f"{rng.choice(ADJECTIVES)} {noun} {number}",
+                'subtitle': f"A fine {noun.lower()}",
+                'category': category,
+                'price': Decimal(rng.randint(100, 50000)) / 100,
+                'stock_quantity': rng.randint(0, 50),
+                'status': rng.random() < 0.9,
+                'description': f"{noun} forged for adventurers.",
+                'main_image': PLACEHOLDER_IMAGE,
+            })
+        import_chunk(rows)
+    return list(Product.objects.filter(
+        pk__gt=last_pk, sku__startswith=SEED_SKU_PREFIX
+    ).values_list('pk', flat=True))
+
+
+def seed_users(count, password, batch_size=SEED_BATCH_SIZE):
+    """
+    Create count users sharing one password, hashed once rather than
+    once per user. Returns the new users' ids.
+    """
+    if not count:
+        return []
+    hashed = make_password(password)
+    start = _next_number(User.objects, 'username', SEED_USER_PREFIX)
+    last_pk = _last_pk(User)
+    for group in chunks(_names(SEED_USER_PREFIX, start, count), batch_size):
+        User.objects.bulk_create(
+            [User(username=name, email=f"{name}@example.com", password=hashed)
+             for name in group],
+            batch_size=batch_size)
+    return list(User.objects.filter(
+        pk__gt=last_pk, username__startswith=SEED_USER_PREFIX
+    ).values_list('pk', flat=True))
+
+
+def seed_reviews(product_ids, user_ids, per_product, rng,
+                 batch_size=SEED_BATCH_SIZE):
+    """
+    Create on average per_product reviews for each product, mostly
+    approved, by random users. Returns the number created.
+    """
+    if not (product_ids and user_ids and per_product):
+        return 0
+    reviews = (
+        Review(
+            product_id_id=product_id,
+            username_id=rng.choice(user_ids),
+            title=rng.choice(REVIEW_TITLES),
+            content="Generated review.",
+            review_score=rng.randint(1, 5),
+            approved=rng.random() < 0.9)
+        for product_id in product_ids
+        for _ in range(rng.randint(0, 2 * per_product)))
+    created = 0
+    for batch in chunks(reviews, batch_size):
+        with transaction.atomic():
+            Review.objects.bulk_create(batch, batch_size=batch_size)
+        created += len(batch)
+    return created
+
+
+def seed_carts(user_ids, product_ids, lines, rng, batch_size=SEED_BATCH_SIZE):
+    """
+    Put lines distinct products in the cart of each of the (new) users.
+    The lines hold no stock (reserved_until is None), like lines whose
+    reservation has lapsed. Returns the number created.
+    """
+    lines = min(lines, len(product_ids))
+    items = (
+        Cart_Item(user_id=user_id, product_id=product_id,
+                  quantity=rng.randint(1, 3))
+        for user_id in user_ids
+        for product_id in rng.sample(product_ids, lines))
+    created = 0
+    for batch in chunks(items, batch_size):
+        with transaction.atomic():
+            Cart_Item.objects.bulk_create(batch, batch_size=batch_size)
+        created += len(batch)
+    return created
+
+
+def seed_wishlists(user_ids, product_ids, items, rng,
+                   batch_size=SEED_BATCH_SIZE):
+    """
+    Give each of the (new) users a wishlist of items distinct products.
+    Returns the number of wishlist items created.
+    """
+    items = min(items, len(product_ids))
+    if not items:
+        return 0
+    created = 0
+    for group in chunks(user_ids, batch_size):
+        with transaction.atomic():
+            wishlists = Wishlist.objects.bulk_create(
+                [Wishlist(user_id=user_id) for user_id in group])
+            batch = [
+                Wishlist_Item(wishlist=wishlist, product_id=product_id)
+                for wishlist in wishlists
+                for product_id in rng.sample(product_ids, items)]
+            Wishlist_Item.objects.bulk_create(batch, batch_size=batch_size)
+        created += len(batch)
+    return created
+
@@ -0,0 +1,101 @@
+from allauth.account.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_save)
+from django.dispatch import receiver
+
+from .catalog import remember_slug
+from .facets import (
+    product_deleted, product_saved, product_saving)
+from .guest_cart import merge_guest_cart
+from .models import Product, Review
+from .page_cache import invalidate_product
+from .search import index_product, unindex_product
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, instance, **kwargs):
+    """
+    Drop the cached page of a product once its change is committed.
+    """
+    product_id = instance.pk
+    transaction.on_commit(lambda: invalidate_product(product_id))
+
+
+@receiver([post_save, post_delete], sender=Review)
+def review_changed(sender, instance, **kwargs):
+    """
+    Drop the cached page of the reviewed product once the review
+    change is committed.
+    """
+    product_id = instance.product_id_id
+    transaction.on_commit(lambda: invalidate_product(product_id))
+
+
+@receiver(post_save, sender=Product)
+def product_saved_search(sender, instance, **kwargs):
+    """
+    Keep the product's full-text search entry in step with its text.
+    """
+    index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted_search(sender, instance, **kwargs):
+    """
+    Drop a deleted product from the full-text search index.
+    """
+    unindex_product(instance.pk)
+
+
+@receiver(pre_save, sender=Product)
+def product_saving_facets(sender, instance, **kwargs):
+    """
+    Make sure the facet a product counted towards before saving is known.
+    """
+    product_saving(instance)
+
+
+@receiver(post_save, sender=Product)
+def product_saved_facets(sender, instance, **kwargs):
+    """
+    Keep the catalog facet counts in step with a product's category,
+    status and stock.
+    """
+    product_saved(instance)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted_facets(sender, instance, **kwargs):
+    """
+    Take a deleted product out of the catalog facet counts.
+    """
+    product_deleted(instance)
+
+
+@receiver(post_save, sender=Product)
+def product_saved_slug(sender, instance, **kwargs):
+    """
+    Keep the cached id -> slug map used by old-style URLs up to date.
+    """
+    if 'slug' in instance.get_deferred_fields():
+        return
+    product_id, slug = instance.pk, instance.slug
+    transaction.on_commit(lambda: remember_slug(product_id, slug))
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted_slug(sender, instance, **kwargs):
+    """
+    Drop a deleted product from the cached id -> slug map.
+    """
+    product_id = instance.pk
+    transaction.on_commit(lambda: remember_slug(product_id, None))
+
+
+@receiver(user_logged_in)
+def guest_cart_logged_in(sender, request, user, **kwargs):
+    """
+    Carry the cart a visitor filled before logging in over to their account.
+    """
+    merge_guest_cart(request, user)
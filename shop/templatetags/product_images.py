@@ -0,0 +1,31 @@
+from django import template
+from django.utils.html import format_html
+
+from ..images import responsive_sources
+
+register = template.Library()
+
+# Cards per row on wide screens: images below the first row load lazily
+EAGER_IMAGES = 3
+
+
+@register.simple_tag
+def product_image(product, variant='card', css_class='', position=1):
+    """
+    Render a product's main image as an <img> with srcset and sizes for
+    the named variant (thumb, card or detail). position is the image's
+    place on the page: the first is fetched with high priority, the rest
+    of the first row normally, and anything further down lazily.
+    """
+    src, srcset, sizes = responsive_sources(product.main_image, variant)
+    alt = product.product_name if product.has_image else 'placeholder'
+    if position == 1:
+        loading = format_html(' fetchpriority="high"')
+    elif position > EAGER_IMAGES:
+        loading = format_html(' loading="lazy"')
+    else:
+        loading = ''
+    return format_html(
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" '
+        'decoding="async"{}>',
+        src, srcset, sizes, css_class, alt, loading)
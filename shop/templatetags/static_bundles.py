@@ -0,0 +1,27 @@
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+from ..storage import BundledStaticFilesStorage
+
+register = template.Library()
+
+
+@register.simple_tag
+def static_bundle(name):
+    """
+    Link a bundle from settings.STATIC_BUNDLES: the single joined file
+    once collectstatic has built it, or each source file while
+    developing (DEBUG, or a storage that does not bundle).
+    """
+    bundled = (not settings.DEBUG
+               and isinstance(staticfiles_storage, BundledStaticFilesStorage))
+    names = [name] if bundled else settings.STATIC_BUNDLES[name]
+    if name.endswith('.css'):
+        markup = '<link rel="stylesheet" href="{}">'
+    else:
+        markup = '<script src="{}"></script>'
+    return format_html_join(
+        '\n', markup, ((static(each),) for each in names))
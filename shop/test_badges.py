@@ -0,0 +1,86 @@
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import caches
+from django.test import TestCase, Client, RequestFactory
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from shop.models import Product, Cart_Item
+from shop.badges import count_badges, user_badges
+from shop.context_processors import badge_counts
+
+
+class BadgeCountTest(TestCase):
+    def setUp(self):
+        caches["sessions"].clear()
+        self.user = get_user_model().objects.create_user(username="fern", password="pass")
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.dagger = Product.objects.create(product_name="Dagger", price=Decimal("5.00"),
+                                             stock_quantity=5)
+        self.shield = Product.objects.create(product_name="Shield", price=Decimal("20.00"),
+                                             stock_quantity=5)
+
+    def act(self, method, name, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            getattr(self.client, method)(reverse(name, args=args))
+
+    def assertCachedBadges(self, cart, wishlist):
+        expected = {"cart": cart, "wishlist": wishlist}
+        with mock.patch("shop.badges.count_badges") as count:
+            self.assertEqual(user_badges(self.user.pk), expected)
+        count.assert_not_called()
+        self.assertEqual(count_badges(self.user.pk), expected)
+
+    def test_cart_and_wishlist_changes_keep_counts_cached(self):
+        self.assertContains(self.client.get(reverse("product_list")), "My Horsecart</a>")
+        self.act("get", "add_to_cart", self.dagger.id)
+        self.act("get", "add_to_cart", self.dagger.id)
+        self.act("get", "add_to_cart", self.shield.id)
+        self.assertCachedBadges(3, 0)
+        item = Cart_Item.objects.get(product=self.dagger)
+        self.act("post", "increment_in_cart", item.id, 0)
+        self.act("post", "add_to_wishlist", self.shield.id)
+        self.act("post", "add_to_wishlist", self.shield.id)
+        self.assertCachedBadges(2, 1)
+        self.act("get", "remove_from_cart", item.id)
+        self.assertCachedBadges(1, 1)
+
+        resp = self.client.get(reverse("product_list"))
+        self.assertContains(resp, '<span class="badge text-bg-light" id="cart-badge">1</span>')
+        self.assertContains(resp, '<span class="badge text-bg-light" id="wishlist-badge">1</span>')
+
+    def test_saving_the_cart_to_the_wishlist_recounts_it(self):
+        self.act("get", "add_to_cart", self.dagger.id)
+        self.act("post", "add_to_wishlist", self.shield.id)
+        user_badges(self.user.pk)
+        self.act("get", "save_cart_to_wishlist")
+        self.assertEqual(user_badges(self.user.pk), {"cart": 0, "wishlist": 2})
+        self.act("get", "clear_wishlist")
+        self.assertCachedBadges(0, 0)
+
+    def test_changes_racing_a_recount_are_not_lost(self):
+        real_count = count_badges
+
+        def count_then_add(user_id):
+            counts = real_count(user_id)
+            # Committed after the recount read the cart, before it was cached
+            self.act("get", "add_to_cart", self.dagger.id)
+            return counts
+
+        with mock.patch("shop.badges.count_badges", count_then_add):
+            self.assertEqual(user_badges(self.user.pk), {"cart": 0, "wishlist": 0})
+        self.assertEqual(user_badges(self.user.pk), {"cart": 1, "wishlist": 0})
+        self.assertCachedBadges(1, 0)
+
+    def test_cache_hits_cost_no_queries(self):
+        user_badges(self.user.pk)
+        request = RequestFactory().get("/")
+        request.user = self.user
+        with self.assertNumQueries(0):
+            self.assertEqual(badge_counts(request)["badges"]["cart"], 0)
+
+    def test_guests_see_their_session_cart(self):
+        guest = Client()
+        guest.get(reverse("add_to_cart", args=[self.dagger.id]))
+        guest.get(reverse("add_to_cart", args=[self.dagger.id]))
+        self.assertContains(guest.get(reverse("product_list")), 'id="cart-badge">2</span>')
@@ -1,4 +1,5 @@
 from decimal import Decimal
+from django.core.cache import caches
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model
@@ -7,6 +8,7 @@ from shop.models import Product, Cart_Item
 
 class CartViewTest(TestCase):
     def setUp(self):
+        caches["sessions"].clear()
         User = get_user_model()
         self.user = User.objects.create_user(username="alice", password="pass")
         self.client = Client()
@@ -33,4 +35,91 @@ class CartViewTest(TestCase):
 
         # total_price in context should equal sum(product.price * quantity)
         expected_total = sum(item.product.price * item.quantity for item in cart_items)
-        self.assertEqual(resp.context.get("total_price"), expected_total)
\ No newline at end of file
+        self.assertEqual(resp.context.get("total_price"), expected_total)
+
+
+class CartViewQueryCountTest(TestCase):
+    def setUp(self):
+        caches["sessions"].clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="bert", password="pass")
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def fill_cart(self, size):
+        products = Product.objects.bulk_create(
+            Product(product_name=f"Arrow {i}", price=Decimal("1.50"), stock_quantity=10)
+            for i in range(size)
+        )
+        Cart_Item.objects.bulk_create(
+            Cart_Item(user=self.user, product=product, quantity=2) for product in products
+        )
+
+    def assertCartQueries(self, size):
+        self.fill_cart(size)
+        # The first visit counts the navbar badges into the cache
+        self.client.get(reverse("view_cart"))
+        # session, user, cart items with products, total (the badge
+        # counts are read from the cache)
+        with self.assertNumQueries(4):
+            resp = self.client.get(reverse("view_cart"))
+        self.assertEqual(resp.context["total_price"], Decimal("3.00") * size)
+
+    def test_cart_of_one_item(self):
+        self.assertCartQueries(1)
+
+    def test_cart_of_500_items(self):
+        self.assertCartQueries(500)
+
+
+class CartApiTest(TestCase):
+    def setUp(self):
+        caches["sessions"].clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="cora", password="pass")
+        self.client = Client(HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        self.client.force_login(self.user)
+        self.dagger = Product.objects.create(product_name="Dagger", price=Decimal("5.00"), stock_quantity=2)
+        self.shield = Product.objects.create(product_name="Shield", price=Decimal("20.00"), stock_quantity=5)
+        self.client.get(reverse("add_to_cart", args=[self.dagger.id]))
+        self.client.get(reverse("add_to_cart", args=[self.shield.id]))
+        self.item = Cart_Item.objects.get(user=self.user, product=self.dagger)
+
+    def test_increment_returns_the_changed_line_and_total(self):
+        resp = self.client.post(reverse("increment_in_cart", args=[self.item.id, 1]))
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual((data["status"], data["item_id"], data["quantity"]),
+                         ("ok", self.item.id, 2))
+        self.assertEqual(Decimal(data["line_total"]), Decimal("10.00"))
+        self.assertEqual(Decimal(data["total"]), Decimal("30.00"))
+        # Only the changed line is sent back, not the re-rendered cart page
+        self.assertLess(len(resp.content), 200)
+
+    def test_out_of_stock_is_a_conflict(self):
+        self.client.post(reverse("increment_in_cart", args=[self.item.id, 1]))
+        resp = self.client.post(reverse("increment_in_cart", args=[self.item.id, 1]))
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual((resp.json()["message"], resp.json()["quantity"]), ("No more in stock", 2))
+
+    def test_removing_the_last_unit_drops_the_line(self):
+        data = self.client.post(reverse("increment_in_cart", args=[self.item.id, 0])).json()
+        self.assertEqual((data["item_id"], data["quantity"]), (None, 0))
+        self.assertEqual(Decimal(data["total"]), Decimal("20.00"))
+        shield = Cart_Item.objects.get(user=self.user, product=self.shield)
+        data = self.client.post(reverse("remove_from_cart", args=[shield.id])).json()
+        self.assertEqual(Decimal(data["total"]), Decimal("0.00"))
+
+    def test_clear_and_guest_carts(self):
+        self.assertEqual(Decimal(self.client.post(reverse("clear_cart")).json()["total"]), 0)
+        self.assertFalse(Cart_Item.objects.exists())
+        guest = Client(HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        guest.post(reverse("add_to_cart", args=[self.shield.id]))
+        data = guest.post(reverse("increment_in_cart", args=[self.shield.id, 1])).json()
+        self.assertEqual((data["item_id"], data["quantity"]), (self.shield.id, 2))
+        self.assertEqual(Decimal(data["total"]), Decimal("40.00"))
+        self.assertEqual(data["cart_count"], 2)
+
+    def test_plain_requests_still_redirect(self):
+        resp = Client().get(reverse("add_to_cart", args=[self.shield.id]))
+        self.assertRedirects(resp, reverse("view_cart"))
@@ -0,0 +1,156 @@
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
+from django.core.cache import caches
+from django.test import TransactionTestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+from shop.models import Product, Cart_Item
+from shop.cart import add_to_cart_item, release_expired_reservations
+
+THREADS = 8
+CLICKS = 10
+
+
+class CartConcurrencyTest(TransactionTestCase):
+    """
+    Hammers the cart endpoints from several threads at once and checks
+    no quantity update is lost and no duplicate cart line appears.
+    On SQLite the test database takes the write lock at the start of
+    every transaction, so writers run one at a time: these tests show
+    that no update is lost, but they cannot show that row locks are
+    taken where needed. RowLockRaceTest covers that on Postgres.
+    """
+
+    def setUp(self):
+        caches["sessions"].clear()
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("in-memory SQLite cannot serve concurrent writers; "
+                          "run against Postgres or a file database")
+        self.user = get_user_model().objects.create_user(username="frank", password="pass")
+        self.product = Product.objects.create(product_name="Javelin", price=Decimal("4.00"),
+                                              stock_quantity=500)
+
+    def hammer(self, url, method="get"):
+        errors = []
+        barrier = threading.Barrier(THREADS)
+
+        def worker():
+            try:
+                client = Client()
+                client.force_login(self.user)
+                barrier.wait(timeout=30)
+                for _ in range(CLICKS):
+                    getattr(client, method)(url)
+            except Exception as exc:  # surfaced in the main thread
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_add_to_cart_counts_every_click(self):
+        self.hammer(reverse("add_to_cart", args=[self.product.id]))
+        item = Cart_Item.objects.get(user=self.user, product=self.product)
+        self.assertEqual(item.quantity, THREADS * CLICKS)
+
+    def test_concurrent_increments_count_every_click(self):
+        add_to_cart_item(self.user, self.product.id, quantity=1)
+        item = Cart_Item.objects.get(user=self.user, product=self.product)
+        self.hammer(reverse("increment_in_cart", args=[item.id, 1]), method="post")
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 1 + THREADS * CLICKS)
+
+    def test_concurrent_decrements_remove_line_once(self):
+        add_to_cart_item(self.user, self.product.id, quantity=THREADS * CLICKS // 2)
+        item = Cart_Item.objects.get(user=self.user, product=self.product)
+        self.hammer(reverse("increment_in_cart", args=[item.id, 0]), method="post")
+        self.assertFalse(Cart_Item.objects.filter(id=item.id).exists())
+        # every reserved unit went back to stock exactly once
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 500)
+        self.assertEqual(self.product.reserved_quantity, 0)
+
+    def test_concurrent_adds_never_oversell(self):
+        self.product.stock_quantity = THREADS * CLICKS // 4
+        self.product.save()
+        self.hammer(reverse("add_to_cart", args=[self.product.id]))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+        self.assertEqual(self.product.reserved_quantity, THREADS * CLICKS // 4)
+        item = Cart_Item.objects.get(user=self.user, product=self.product)
+        self.assertEqual(item.quantity, THREADS * CLICKS // 4)
+
+
+@skipUnless(connection.vendor == "postgresql",
+            "SQLite serialises every writer, so row lock races cannot occur; "
+            "run with a postgres:// TEST_DATABASE_URL")
+class RowLockRaceTest(TransactionTestCase):
+    """
+    Races cart changes against the reservation sweep on Postgres, where
+    transactions run concurrently and only row locks keep them apart.
+    """
+    STOCK = 500
+
+    def setUp(self):
+        caches["sessions"].clear()
+        self.user = get_user_model().objects.create_user(username="gwen", password="pass")
+        self.product = Product.objects.create(product_name="Sling", price=Decimal("1.00"),
+                                              stock_quantity=self.STOCK)
+
+    def run_threads(self, *targets):
+        errors = []
+        barrier = threading.Barrier(len(targets))
+
+        def run(target):
+            try:
+                barrier.wait(timeout=30)
+                target()
+            except Exception as exc:  # surfaced in the main thread
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=[target]) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def expire(self):
+        Cart_Item.objects.filter(user=self.user).update(
+            reserved_until=timezone.now() - timedelta(minutes=1))
+
+    def test_adds_racing_the_sweep_hold_exactly_what_is_reserved(self):
+        add_to_cart_item(self.user, self.product.id)
+        self.expire()
+
+        def add():
+            for _ in range(CLICKS):
+                add_to_cart_item(self.user, self.product.id)
+
+        def sweep():
+            for _ in range(CLICKS * 2):
+                release_expired_reservations()
+                self.expire()
+
+        self.run_threads(sweep, *[add] * (THREADS - 1))
+        self.product.refresh_from_db()
+        held = Cart_Item.objects.filter(
+            product=self.product, reserved_until__isnull=False
+        ).aggregate(units=Sum("quantity"))["units"] or 0
+        self.assertEqual(self.product.reserved_quantity, held)
+        self.assertEqual(self.product.stock_quantity + self.product.reserved_quantity,
+                         self.STOCK)
+        self.assertEqual(Cart_Item.objects.get(user=self.user).quantity,
+                         1 + (THREADS - 1) * CLICKS)
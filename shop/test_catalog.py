@@ -0,0 +1,50 @@
+from decimal import Decimal
+from django.test import TestCase, Client
+from django.urls import reverse
+from shop.models import Product
+from shop.catalog import catalog_page, category_values
+
+
+class CatalogPaginationTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        # 5 listed bows, 2 listed heavy armours and 1 unlisted bow
+        for i in range(5):
+            Product.objects.create(product_name=f"Bow {i}", category="bow", status=True,
+                                   price=Decimal("10.00"), stock_quantity=1)
+        for i in range(2):
+            Product.objects.create(product_name=f"Plate {i}", category="heavy", status=True,
+                                   price=Decimal("90.00"), stock_quantity=1)
+        Product.objects.create(product_name="Hidden Bow", category="bow", status=False,
+                               price=Decimal("10.00"), stock_quantity=1)
+
+    def test_pages_cover_every_listed_product_once(self):
+        seen = []
+        products, cursor = catalog_page(page_size=3)
+        seen += products
+        while cursor:
+            products, cursor = catalog_page(cursor=cursor, page_size=3)
+            seen += products
+        names = [p.product_name for p in seen]
+        self.assertEqual(len(names), 7)
+        self.assertEqual(len(set(names)), 7)
+        self.assertNotIn("Hidden Bow", names)
+
+    def test_category_and_group_filters(self):
+        self.assertEqual(category_values("Ranged Weapons"), ["bow", "crossbow", "exotic"])
+        products, cursor = catalog_page(category="heavy")
+        self.assertEqual(len(products), 2)
+        self.assertIsNone(cursor)
+        products, cursor = catalog_page(category="Ranged Weapons")
+        self.assertEqual(len(products), 5)
+
+    def test_card_query_defers_description(self):
+        products, cursor = catalog_page(page_size=1)
+        self.assertIn("description", products[0].get_deferred_fields())
+
+    def test_product_list_view_and_bad_cursor(self):
+        resp = self.client.get(reverse("product_list"), {"category": "bow"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.context["product_list"]), 5)
+        resp = self.client.get(reverse("product_list"), {"cursor": "not-a-cursor"})
+        self.assertEqual(resp.status_code, 404)
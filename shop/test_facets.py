@@ -0,0 +1,102 @@
+from decimal import Decimal
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from shop.models import Product
+from shop.cart import reserve_stock
+from shop.admin import list_items, delist_items
+from shop.facets import category_counts, facet_counts, rebuild_facet_counts
+
+
+class FacetCountTest(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+        self.client = Client()
+        self.bow = Product.objects.create(product_name="Yew Bow", category="bow", status=True,
+                                          price=Decimal("30.00"), stock_quantity=2)
+        self.plate = Product.objects.create(product_name="Plate", category="heavy", status=True,
+                                            price=Decimal("90.00"), stock_quantity=1)
+        self.hidden = Product.objects.create(product_name="Hidden Bow", category="bow",
+                                             status=False, price=Decimal("30.00"),
+                                             stock_quantity=1)
+        Product.objects.create(product_name="Sold Out Axe", category="onehanded", status=True,
+                               price=Decimal("12.00"), stock_quantity=0)
+
+    def counts(self):
+        return {k: v for k, v in category_counts().items() if v}
+
+    def test_counts_listed_products_with_stock(self):
+        self.assertEqual(self.counts(), {"bow": 1, "heavy": 1})
+        groups = {group["value"]: group["count"] for group in facet_counts()}
+        self.assertEqual(groups, {"Melee Weapons": 0, "Ranged Weapons": 1,
+                                  "Armor": 1, "unknown": 0})
+
+    def test_saves_and_deletes_adjust_counts_without_recounting(self):
+        self.counts()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hidden.status = True
+            self.hidden.save()
+            self.plate.category = "medium"
+            self.plate.save()
+            Product.objects.create(product_name="Sling", category="exotic", status=True,
+                                   price=Decimal("2.00"), stock_quantity=5)
+            self.bow.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts(), {"bow": 1, "medium": 1, "exotic": 1})
+        self.assertEqual(self.counts(), {k: v for k, v in rebuild_facet_counts().items() if v})
+
+    def test_deferred_loads_look_up_stored_state(self):
+        self.counts()
+        product = Product.objects.only("id", "product_name").get(pk=self.bow.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.status = False
+            product.save()
+        self.assertEqual(self.counts(), {"heavy": 1})
+
+    def test_loaded_products_save_without_looking_up_state(self):
+        self.counts()
+        product = Product.objects.get(pk=self.bow.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.status = False
+            with CaptureQueriesContext(connection) as captured:
+                product.save(update_fields=["status"])
+        self.assertFalse([query for query in captured.captured_queries
+                          if query["sql"].startswith("SELECT")])
+        self.assertEqual(self.counts(), {"heavy": 1})
+
+    def test_listing_matches_counts_when_stock_is_held(self):
+        self.counts()
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_stock(self.plate.pk, 1)
+        response = self.client.get(reverse("product_list"))
+        self.assertContains(response, "Plate")
+        self.assertEqual(self.counts(), {"bow": 1, "heavy": 1})
+
+    def test_reservations_do_not_move_counts(self):
+        self.counts()
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_stock(self.plate.pk, 1)
+            plate = Product.objects.get(pk=self.plate.pk)
+            plate.price = Decimal("95.00")
+            plate.save()
+        self.assertEqual(self.counts(), {"bow": 1, "heavy": 1})
+
+    def test_admin_actions_adjust_counts(self):
+        self.counts()
+        with self.captureOnCommitCallbacks(execute=True):
+            delist_items(None, None, Product.objects.filter(category="bow"))
+        self.assertEqual(self.counts(), {"heavy": 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            list_items(None, None, Product.objects.all())
+        self.assertEqual(self.counts(), {"bow": 2, "heavy": 1})
+        self.assertTrue(Product.objects.get(product_name="Sold Out Axe").status)
+
+    def test_catalog_navigation_costs_no_extra_queries(self):
+        self.client.get(reverse("product_list"))
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse("product_list"), {"category": "bow"})
+        self.assertContains(resp, "Ranged Weapons (1)")
+        self.assertContains(resp, "Bow (1)")
+        self.assertContains(resp, "Armor (1)")
@@ -0,0 +1,103 @@
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from shop.models import Product, Cart_Item
+from shop.cart import add_to_cart_item, merge_cart_lines
+from shop.guest_cart import GUEST_CART_COOKIE
+
+
+class GuestCartTest(TestCase):
+    def setUp(self):
+        caches["sessions"].clear()
+        self.user = get_user_model().objects.create_user(username="dora", password="pass")
+        self.client = Client()
+        self.dagger = Product.objects.create(product_name="Dagger", price=Decimal("5.00"),
+                                             stock_quantity=3)
+        self.helm = Product.objects.create(product_name="Helm", price=Decimal("40.00"),
+                                           stock_quantity=2)
+
+    def cookie_cart(self):
+        resp = self.client.get(reverse("view_cart"))
+        return {item.product.id: item.quantity for item in resp.context["cart_items"]}
+
+    def log_in(self):
+        return self.client.post(reverse("account_login"),
+                                {"login": "dora", "password": "pass"})
+
+    def test_guests_fill_a_cart_without_rows_or_reservations(self):
+        self.client.get(reverse("add_to_cart", args=[self.dagger.id]))
+        self.client.get(reverse("add_to_cart", args=[self.dagger.id]))
+        self.client.get(reverse("add_to_cart", args=[self.helm.id]))
+        self.client.post(reverse("increment_in_cart", args=[self.dagger.id, 0]))
+
+        resp = self.client.get(reverse("view_cart"))
+        lines = [(item.product, item.quantity) for item in resp.context["cart_items"]]
+        self.assertEqual(lines, [(self.helm, 1), (self.dagger, 1)])
+        self.assertEqual(resp.context["total_price"], Decimal("45.00"))
+        self.assertFalse(Cart_Item.objects.exists())
+        self.dagger.refresh_from_db()
+        self.assertEqual((self.dagger.stock_quantity, self.dagger.reserved_quantity), (3, 0))
+
+        self.client.get(reverse("remove_from_cart", args=[self.helm.id]))
+        self.assertEqual(self.cookie_cart(), {self.dagger.id: 1})
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+        self.client.get(reverse("clear_cart"))
+        self.assertEqual(self.client.cookies[GUEST_CART_COOKIE].value, "")
+
+    def test_guests_cannot_add_more_than_is_in_stock(self):
+        for _ in range(3):
+            self.client.get(reverse("add_to_cart", args=[self.helm.id]))
+        self.assertEqual(self.cookie_cart(), {self.helm.id: 2})
+
+    def test_a_tampered_cookie_is_an_empty_cart(self):
+        self.client.get(reverse("add_to_cart", args=[self.dagger.id]))
+        self.client.cookies[GUEST_CART_COOKIE] = '{"%d":3}' % self.helm.id
+        self.assertEqual(self.cookie_cart(), {})
+
+    def test_logging_in_merges_the_guest_cart(self):
+        add_to_cart_item(self.user, self.dagger.id)
+        for product in (self.dagger, self.dagger, self.helm, self.helm):
+            self.client.get(reverse("add_to_cart", args=[product.id]))
+        # Someone else takes a helm before the visitor logs in
+        Product.objects.filter(pk=self.helm.pk).update(stock_quantity=1)
+
+        resp = self.log_in()
+        self.assertEqual(resp.status_code, 302)
+        quantities = dict(Cart_Item.objects.filter(user=self.user)
+                          .values_list("product_id", "quantity"))
+        self.assertEqual(quantities, {self.dagger.id: 3, self.helm.id: 1})
+        self.dagger.refresh_from_db()
+        self.helm.refresh_from_db()
+        self.assertEqual((self.dagger.stock_quantity, self.dagger.reserved_quantity), (0, 3))
+        self.assertEqual((self.helm.stock_quantity, self.helm.reserved_quantity), (0, 1))
+        self.assertFalse(Cart_Item.objects.filter(reserved_until__isnull=True).exists())
+        self.assertEqual(self.client.cookies[GUEST_CART_COOKIE].value, "")
+        self.assertIn("Some items in your cart are no longer in stock",
+                      [str(m) for m in get_messages(resp.wsgi_request)])
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_guest_cart_survives_login_with_cookie_sessions(self):
+        self.client.get(reverse("add_to_cart", args=[self.helm.id]))
+        self.log_in()
+        self.assertEqual(Cart_Item.objects.get(user=self.user).product, self.helm)
+
+    def test_merge_takes_a_fixed_number_of_queries(self):
+        def merge(size):
+            products = Product.objects.bulk_create(
+                Product(product_name=f"Bolt {i}", price=Decimal("1.00"), stock_quantity=5)
+                for i in range(size))
+            # Half the products are already in the cart
+            for product in products[::2]:
+                add_to_cart_item(self.user, product.id)
+            # savepoint, lock products, lock lines, reserve, upsert, release
+            with self.assertNumQueries(6):
+                added = merge_cart_lines(self.user, {p.id: 2 for p in products})
+            self.assertEqual(set(added.values()), {2})
+
+        merge(2)
+        merge(20)
+        self.assertEqual(Cart_Item.objects.filter(quantity=3).count(), 11)
@@ -0,0 +1,66 @@
+from decimal import Decimal
+from unittest import mock
+import cloudinary
+from cloudinary import CloudinaryResource
+from django.test import TestCase, Client
+from django.urls import reverse
+from shop.models import Product
+from shop.images import image_url, responsive_sources
+from shop.templatetags.product_images import product_image
+
+
+class ProductImageTest(TestCase):
+    def setUp(self):
+        # URLs need a cloud name, which CLOUDINARY_URL may not provide here
+        cloud_name = cloudinary.config().cloud_name
+        cloudinary.config(cloud_name="demo")
+        self.addCleanup(cloudinary.config, cloud_name=cloud_name)
+        self.client = Client()
+        self.photo = Product.objects.create(
+            product_name="Longsword", status=True, price=Decimal("25.00"),
+            stock_quantity=3, main_image="image/upload/v1712/longsword.jpg")
+        self.plain = Product.objects.create(
+            product_name="Cudgel", status=True, price=Decimal("3.00"), stock_quantity=3)
+
+    def test_has_image_follows_main_image(self):
+        self.assertTrue(self.photo.has_image)
+        self.assertFalse(self.plain.has_image)
+        self.plain.main_image = "image/upload/v1713/cudgel.png"
+        self.plain.save(update_fields=["main_image"])
+        self.plain.refresh_from_db()
+        self.assertTrue(self.plain.has_image)
+
+    def test_urls_are_built_once_per_image_and_transformation(self):
+        product = Product.objects.get(pk=self.photo.pk)
+        self.assertEqual(product.image_url, product.main_image.url)
+        self.assertEqual(image_url(product.main_image, width=400, crop="fill"),
+                         product.main_image.build_url(width=400, crop="fill"))
+        with mock.patch.object(CloudinaryResource, "build_url") as build_url:
+            Product.objects.get(pk=self.photo.pk).image_url
+            image_url(product.main_image, crop="fill", width=400)
+        build_url.assert_not_called()
+
+    def test_catalog_render_builds_no_repeated_urls(self):
+        for i in range(20):
+            Product.objects.create(product_name=f"Spear {i}", status=True, price=Decimal("8.00"),
+                                   stock_quantity=1, main_image="image/upload/v1714/spear.jpg")
+        self.client.get(reverse("product_list"))
+        with mock.patch.object(CloudinaryResource, "build_url") as build_url:
+            resp = self.client.get(reverse("product_list"))
+        build_url.assert_not_called()
+        self.assertContains(resp, "longsword.jpg")
+        self.assertContains(resp, "images/placeholder")
+
+    def test_srcset_offers_every_variant(self):
+        src, srcset, sizes = responsive_sources(self.photo.main_image, "card")
+        self.assertIn("c_limit,f_auto,q_auto,w_480", src)
+        self.assertEqual([c.split()[-1] for c in srcset.split(", ")], ["240w", "480w", "960w"])
+        src, srcset, sizes = responsive_sources(self.plain.main_image, "thumb")
+        self.assertRegex(src, r"images/placeholder-240\.[0-9a-f]{12}\.webp$")
+
+    def test_only_cards_below_the_first_row_load_lazily(self):
+        first = product_image(self.photo, "card", position=1)
+        self.assertIn('fetchpriority="high"', first)
+        self.assertNotIn("loading=", first)
+        self.assertNotIn("loading=", product_image(self.photo, "card", position=3))
+        self.assertIn('loading="lazy"', product_image(self.plain, "card", position=4))
@@ -0,0 +1,49 @@
+from decimal import Decimal
+from unittest import skipUnless
+from django.test import TestCase
+from django.db import connection
+from django.contrib.auth import get_user_model
+from shop.models import Product, Review
+from shop.catalog import listed_products
+
+
+@skipUnless(connection.vendor in ("sqlite", "postgresql"), "query plans checked on SQLite and Postgres only")
+class HotPathIndexTest(TestCase):
+    """
+    Checks the query plans of the hot storefront queries use the
+    indexes declared on the shop models.
+    """
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(username="bob", password="pass")
+        for i in range(20):
+            product = Product.objects.create(product_name=f"Axe {i}", category="twohanded",
+                                             status=bool(i % 2), price=Decimal("12.00"),
+                                             stock_quantity=i % 3)
+            Review.objects.create(product_id=product, username=user, title="Fine",
+                                  content="Sharp.", review_score=4, approved=bool(i % 2))
+        self.product = product
+        if connection.vendor == "postgresql":
+            # tiny test tables would otherwise always be sequentially scanned
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+
+    def assertPlanUses(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, msg=f"Expected {index_name} in plan:\n{plan}")
+
+    def test_catalog_uses_listed_instock_index(self):
+        queryset = listed_products().order_by("created_on", "id")[:13]
+        self.assertPlanUses(queryset, "product_listed_instock_idx")
+
+    def test_status_category_filter_uses_composite_index(self):
+        queryset = Product.objects.filter(status=True, category="twohanded").order_by("created_on")
+        self.assertPlanUses(queryset, "product_status_cat_created_idx")
+
+    def test_published_reviews_use_approved_partial_index(self):
+        queryset = self.product.reviews.filter(approved=True).order_by("-created_on", "-id")
+        self.assertPlanUses(queryset, "review_approved_product_idx")
+
+    def test_moderation_queue_uses_pending_partial_index(self):
+        queryset = Review.objects.filter(approved=False).order_by("created_on")
+        self.assertPlanUses(queryset, "review_pending_created_idx")
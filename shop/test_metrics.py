@@ -0,0 +1,85 @@
+import re
+from decimal import Decimal
+from django.core.cache import caches
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from shop.models import Product
+from shop.metrics import VIEW_METRICS, RequestTiming, ViewMetrics
+
+
+@override_settings(REQUEST_METRICS=True, METRICS_TOKEN="scrape", QUERY_BUDGET=25)
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        # Cached badge counts are keyed by user id, which rolled back tests reuse
+        caches["sessions"].clear()
+        caches["metrics"].clear()
+        VIEW_METRICS.clear()
+        self.client = Client()
+        Product.objects.create(product_name="Buckler", status=True, price=Decimal("9.00"),
+                               stock_quantity=4)
+
+    def scrape(self):
+        return self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape")
+
+    def test_server_timing_reports_queries_and_phases(self):
+        resp = self.client.get(reverse("product_list"))
+        timing = resp["Server-Timing"]
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertGreater(float(re.search(r"tpl;dur=([\d.]+)", timing).group(1)), 0)
+
+    def test_async_views_count_their_queries(self):
+        user = get_user_model().objects.create_user(username="erin", password="pass")
+        self.client.force_login(user)
+        # Session, user, cart lines, cart total and the navbar's
+        # (uncached) badge counts
+        with self.assertNumQueries(5):
+            resp = self.client.get(reverse("view_cart"))
+        self.assertIn('desc="5 queries"', resp["Server-Timing"])
+
+    def test_metrics_endpoint_aggregates_per_view(self):
+        self.client.get(reverse("product_list"))
+        self.client.get(reverse("product_list"))
+        text = self.scrape().content.decode()
+        self.assertIn('shop_requests_total{view="product_list"} 2', text)
+        self.assertIn('shop_request_duration_seconds_count{view="product_list"} 2', text)
+        self.assertIn('shop_request_duration_seconds_bucket{view="product_list",le="+Inf"} 2', text)
+        self.assertIn("# TYPE shop_db_queries_total counter", text)
+
+    def test_metrics_endpoint_sums_every_worker(self):
+        timing = RequestTiming()
+        timing.queries = 3
+        first, second = ViewMetrics("web-1:10"), ViewMetrics("web-2:11")
+        first.record("product_page", timing, 0.02, False)
+        second.record("product_page", timing, 0.3, False)
+        # Not published before METRICS_FLUSH_INTERVAL has passed
+        self.assertEqual(ViewMetrics("web-3:12").totals(), {})
+        first.flush()
+        second.flush()
+        text = self.scrape().content.decode()
+        self.assertIn('shop_requests_total{view="product_page"} 2', text)
+        self.assertIn('shop_db_queries_total{view="product_page"} 6', text)
+        self.assertIn('shop_request_duration_seconds_bucket{view="product_page",le="0.025"} 1',
+                      text)
+
+    def test_metrics_endpoint_needs_staff_or_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+        self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer nope")
+                         .status_code, 404)
+        self.assertEqual(self.scrape().status_code, 200)
+
+    @override_settings(QUERY_BUDGET=0)
+    def test_views_over_the_query_budget_are_flagged(self):
+        with self.assertLogs("shop.metrics", "WARNING") as logs:
+            self.client.get(reverse("product_list"))
+        self.assertIn("product_list ran", logs.output[0])
+        self.assertIn('shop_query_budget_exceeded_total{view="product_list"} 1',
+                      self.scrape().content.decode())
+
+
+class RequestMetricsDisabledTest(TestCase):
+    def test_disabled_metrics_add_nothing(self):
+        resp = self.client.get(reverse("product_list"))
+        self.assertNotIn("Server-Timing", resp)
+        self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer x")
+                         .status_code, 404)
@@ -0,0 +1,101 @@
+import io
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from shop.models import Product, Review
+from shop.facets import set_listed
+from shop.page_cache import (
+    get_product_fragment, invalidate_product, page_cache_stats, product_version,
+    set_product_fragment)
+
+PAGE_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "product_pages": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "test-product-pages",
+    },
+    "catalog": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "catalog"},
+    "sessions": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "sessions"},
+}
+
+
+@override_settings(CACHES=PAGE_CACHES)
+class ProductPageCacheTest(TestCase):
+    def setUp(self):
+        caches["sessions"].clear()
+        caches["product_pages"].clear()
+        self.client = Client()
+        self.user = get_user_model().objects.create_user(username="dave", password="pass")
+        self.product = Product.objects.create(product_name="Flail", price=Decimal("14.00"),
+                                              stock_quantity=2, status=True)
+        self.url = self.product.get_absolute_url()
+
+    def test_anonymous_hit_serves_without_queries(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertContains(second, "Flail")
+        self.assertEqual(page_cache_stats(), {"hits": 1, "misses": 1})
+
+    def test_guests_with_a_cart_hit_without_queries(self):
+        self.client.get(reverse("add_to_cart", args=[self.product.id]))
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            resp = self.client.get(self.url)
+        self.assertContains(resp, 'id="cart-badge">1</span>')
+
+    def test_review_save_invalidates_cached_page(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(product_id=self.product, username=self.user,
+                                  title="Spiky review", content="Ouch.", review_score=3,
+                                  approved=True)
+        self.assertContains(self.client.get(self.url), "Spiky review")
+
+    def test_product_save_invalidates_cached_page(self):
+        self.client.get(self.url)
+        self.product.subtitle = "Now with extra chains"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertContains(self.client.get(self.url), "Now with extra chains")
+
+    def test_wrong_slug_is_not_served_from_cache(self):
+        self.client.get(self.url)
+        resp = self.client.get(reverse("product_page", args=[self.product.id, "mace"]))
+        self.assertRedirects(resp, self.url, status_code=301)
+
+    def test_page_rendered_before_a_change_is_not_stored_as_current(self):
+        slug = self.product.slug
+        version = product_version(self.product.id)
+        # A review commits while the page is being rendered
+        invalidate_product(self.product.id)
+        set_product_fragment(self.product.id, slug, "<p>stale</p>", version)
+        self.assertIsNone(get_product_fragment(self.product.id, slug,
+                                               product_version(self.product.id)))
+
+    def test_sold_out_by_import_is_not_served_from_cache(self):
+        self.product.sku = "FL-1"
+        self.product.save()
+        self.client.get(self.url)
+        path = os.path.join(tempfile.mkdtemp(), "stock.csv")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write("sku,product_name,category,price,stock_quantity,status\n"
+                    "FL-1,Flail,onehanded,14.00,0,true\n")
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("import_products", path, stdout=io.StringIO())
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_delisting_drops_the_cached_page(self):
+        self.client.get(self.url)
+        version = product_version(self.product.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            set_listed(Product.objects.filter(pk=self.product.pk), False)
+        self.assertNotEqual(product_version(self.product.id), version)
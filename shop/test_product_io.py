@@ -0,0 +1,160 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test.utils import CaptureQueriesContext
+from shop.models import Product
+from shop.cart import add_to_cart_item
+from shop.product_io import import_chunk
+from shop.facets import category_counts
+from shop.search import search_products
+
+HEADER = "sku,product_name,subtitle,category,price,stock_quantity,status,description,main_image\n"
+
+
+class ProductImportTest(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, "w", newline="") as f:
+            f.write(content)
+        return path
+
+    def run_import(self, path, **options):
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_products", path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_creates_products_and_skips_invalid_rows(self):
+        Product.objects.create(product_name="War Axe", price=Decimal("9.00"), stock_quantity=1)
+        path = self.write("products.csv", HEADER
+                          + "AX-1,War Axe,Heavy,twohanded,19.50,4,true,Splits shields,\n"
+                          + "AX-2,War Axe,Heavier,twohanded,29.50,2,listed,,image/upload/v1/axe.jpg\n"
+                          + "AX-3,Odd,,polearm,5,1,true,,\n"
+                          + "AX-4,Cheap,,bow,free,1,true,,\n"
+                          + ",Nameless,,bow,5,1,true,,\n")
+        out, err = self.run_import(path)
+        self.assertIn("2 created, 0 updated, 3 skipped", out)
+        self.assertIn("rows/s", out)
+        self.assertIn("Row 3: unknown category 'polearm'", err)
+        self.assertIn("Row 4: invalid price 'free'", err)
+        self.assertIn("Row 5: sku is required", err)
+
+        first, second = Product.objects.filter(sku__in=["AX-1", "AX-2"]).order_by("sku")
+        self.assertEqual((first.slug, second.slug), ("war-axe", "war-axe"))
+        self.assertEqual((first.has_image, second.has_image), (False, True))
+        self.assertEqual((first.price, first.stock_quantity, first.status),
+                         (Decimal("19.50"), 4, True))
+        self.assertEqual(category_counts()["twohanded"], 2)
+        products, _ = search_products("shields")
+        self.assertEqual(products, [first])
+
+    def test_reimport_updates_by_sku(self):
+        path = self.write("a.csv", HEADER + "BW-1,Yew Bow,,bow,30,2,true,,\n")
+        self.run_import(path)
+        product = Product.objects.get(sku="BW-1")
+        path = self.write("b.csv", HEADER + "BW-1,Elm Bow,,crossbow,35,0,false,,\n")
+        out, _ = self.run_import(path)
+        self.assertIn("0 created, 1 updated", out)
+        product.refresh_from_db()
+        self.assertEqual((product.product_name, product.slug, product.category, product.price),
+                         ("Elm Bow", "elm-bow", "crossbow", Decimal("35.00")))
+        self.assertEqual(Product.objects.count(), 1)
+        self.assertEqual(category_counts()["bow"], 0)
+
+    def test_queries_per_batch_do_not_grow_with_rows(self):
+        def import_rows(prefix, count):
+            lines = "".join(f'{{"sku": "{prefix}-{i}", "product_name": "{prefix} {i}", '
+                            f'"price": "1.00", "stock_quantity": 3, "status": "true"}}\n'
+                            for i in range(count))
+            path = self.write(f"{prefix}.jsonl", lines)
+            with CaptureQueriesContext(connection) as queries:
+                self.run_import(path, batch_size=500)
+            return len(queries)
+
+        # Up to the rows SQLite takes in one INSERT (999 parameters)
+        self.assertEqual(import_rows("Bolt", 5), import_rows("Dart", 30))
+        self.assertEqual(Product.objects.count(), 35)
+
+    def test_export_round_trips(self):
+        Product.objects.create(product_name="Helm", sku="HM-1", price=Decimal("12.00"),
+                               stock_quantity=3, status=True, category="heavy",
+                               description="Shiny", main_image="image/upload/v1/helm.jpg")
+        out = io.StringIO()
+        call_command("export_products", format="jsonl", stdout=out, stderr=io.StringIO())
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(rows, [{
+            "sku": "HM-1", "product_name": "Helm", "subtitle": "newProductDesc",
+            "category": "heavy", "price": "12.00", "stock_quantity": 3, "status": "true",
+            "description": "Shiny", "main_image": "image/upload/v1/helm.jpg"}])
+
+        path = os.path.join(self.dir, "export.csv")
+        call_command("export_products", output=path, stderr=io.StringIO())
+        with open(path, newline="") as f:
+            self.assertEqual(next(csv.DictReader(f))["price"], "12.00")
+        out, _ = self.run_import(path)
+        self.assertIn("0 created, 1 updated, 0 skipped", out)
+        self.assertTrue(Product.objects.get(sku="HM-1").has_image)
+
+    def test_reimport_keeps_cart_reservations(self):
+        product = Product.objects.create(product_name="Sabre", sku="SB-1", price=Decimal("8.00"),
+                                         stock_quantity=5, status=True, category="onehanded")
+        user = get_user_model().objects.create_user(username="ivy", password="pass")
+        add_to_cart_item(user, product.id, quantity=2)
+        path = os.path.join(self.dir, "export.jsonl")
+        call_command("export_products", output=path, format="jsonl", stderr=io.StringIO())
+        with open(path) as f:
+            self.assertEqual(json.loads(f.readline())["stock_quantity"], 5)
+
+        # Another unit goes into a cart before the file comes back
+        add_to_cart_item(user, product.id)
+        self.run_import(path)
+        product.refresh_from_db()
+        self.assertEqual((product.stock_quantity, product.reserved_quantity), (2, 3))
+
+    def test_rows_with_less_stock_than_is_reserved_are_rejected(self):
+        product = Product.objects.create(product_name="Sabre", sku="SB-1", price=Decimal("8.00"),
+                                         stock_quantity=5, status=True, category="onehanded")
+        user = get_user_model().objects.create_user(username="ivy", password="pass")
+        add_to_cart_item(user, product.id, quantity=3)
+        path = self.write("p.csv", HEADER
+                          + "SB-1,Curved Sabre,,onehanded,9,1,true,,\n"
+                          + "SB-2,Scimitar,,onehanded,9,1,true,,\n")
+        out, err = self.run_import(path)
+        self.assertIn("1 created, 0 updated, 1 skipped", out)
+        self.assertIn("Row 1: stock_quantity 1 is below the 3 units held in carts", err)
+        product.refresh_from_db()
+        self.assertEqual((product.product_name, product.stock_quantity, product.reserved_quantity),
+                         ("Sabre", 2, 3))
+
+    def test_failed_batch_still_rebuilds_for_committed_batches(self):
+        path = self.write("p.csv", HEADER + "".join(
+            f"HB-{i},Hand Bow {i},,bow,3,1,true,,\n" for i in range(4)))
+        self.assertEqual(category_counts()["bow"], 0)
+        calls = []
+
+        def fail_second(rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError("database went away")
+            return import_chunk(rows)
+
+        with mock.patch("shop.management.commands.import_products.import_chunk", fail_second):
+            with self.assertRaises(RuntimeError):
+                self.run_import(path, batch_size=2)
+        self.assertEqual(category_counts()["bow"], 2)
+        products, _ = search_products("hand")
+        self.assertEqual(len(products), 2)
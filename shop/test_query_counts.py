@@ -0,0 +1,259 @@
+import re
+from collections import Counter
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from shop import urls
+from shop.models import Product, Review, Cart_Item, Wishlist, Wishlist_Item
+from shop.reviews import rebuild_review_aggregates
+from shop.search import rebuild_search_index
+
+# Rows behind each view in the small and large runs; both stay within
+# one page of the catalog (12) and of reviews (10), so a view that
+# queries once per row shows up as a difference
+SIZES = (2, 9)
+
+# Literals differ between otherwise identical statements
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def _statement(sql):
+    return LITERALS.sub("?", sql)
+
+
+class QueryCountTestCase(TestCase):
+    """
+    Base for tests that a view runs the same number of queries however
+    many rows it shows or changes. Each size gets the same cold start:
+    fixtures grown to that size, then every cache cleared.
+    """
+
+    def assertQueriesConstant(self, grow, url, method="get", client=None,
+                              sizes=SIZES, **extra):
+        """
+        Call grow(n) for each size n to bring the view's fixtures to n
+        rows, then request url (a path, or a function returning one for
+        views that use up their target) and compare the query counts.
+        """
+        client = client or self.client
+        runs = []
+        for size in sizes:
+            grow(size)
+            path = url() if callable(url) else url
+            for alias in settings.CACHES:
+                caches[alias].clear()
+            with CaptureQueriesContext(connection) as captured:
+                response = getattr(client, method)(path, **extra)
+            self.assertLess(response.status_code, 400,
+                            f"{method.upper()} {path} with {size} rows")
+            runs.append([query["sql"] for query in captured.captured_queries])
+        for size, queries in zip(sizes[1:], runs[1:]):
+            if len(queries) != len(runs[0]):
+                self.fail(self._scaling_message(
+                    path, sizes[0], runs[0], size, queries))
+
+    def _scaling_message(self, path, small_size, small, size, queries):
+        more = Counter(map(_statement, queries))
+        more.subtract(Counter(map(_statement, small)))
+        lines = [
+            f"{path} ran {len(small)} queries with {small_size} rows "
+            f"but {len(queries)} with {size} rows.",
+            "Statements run a different number of times:",
+        ]
+        lines += [f"  {count:+d}  {sql}"
+                  for sql, count in more.most_common() if count]
+        lines.append(f"Queries with {size} rows:")
+        lines += [f"  {number}. {sql}"
+                  for number, sql in enumerate(queries, start=1)]
+        return "\n".join(lines)
+
+
+class ViewQueryCountTest(QueryCountTestCase):
+    """
+    One test per URL in shop/urls.py, named test_<url name>.
+    """
+
+    def setUp(self):
+        caches["sessions"].clear()
+        self.user = get_user_model().objects.create_user(username="nym", password="pass")
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.product = Product.objects.create(product_name="Anvil", price=Decimal("40.00"),
+                                              stock_quantity=100, status=True)
+        # Made up front, so the first request does not create it
+        self.wishlist = Wishlist.objects.create(user=self.user)
+        self.made = 0
+
+    def make_products(self, count):
+        products = []
+        for _ in range(count):
+            self.made += 1
+            products.append(Product(
+                product_name=f"Relic {self.made}",
+                subtitle="Old", description="Dusty relic", price=Decimal(self.made),
+                stock_quantity=10, status=True))
+        products = Product.objects.bulk_create(products)
+        rebuild_search_index()
+        return products
+
+    def grow_products(self, size):
+        self.make_products(size - Product.objects.exclude(pk=self.product.pk).count())
+
+    def grow_reviews(self, size):
+        # From other users too, so reviewers are not all one cached row
+        missing = size - self.product.reviews.count()
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(username=f"critic{self.made}-{i}") for i in range(missing))
+        self.made += 1
+        Review.objects.bulk_create(
+            Review(product_id=self.product, username=user, title="Solid",
+                   content="Rings true", review_score=4, approved=True)
+            for user in users)
+        rebuild_review_aggregates()
+
+    def grow_own_reviews(self, size):
+        Review.objects.bulk_create(
+            Review(product_id=self.product, username=self.user, title="Mine",
+                   content="Heavy", review_score=5, approved=True)
+            for _ in range(size - self.product.reviews.count()))
+        rebuild_review_aggregates()
+
+    def grow_cart(self, size):
+        missing = size - Cart_Item.objects.filter(user=self.user).count()
+        Cart_Item.objects.bulk_create(
+            Cart_Item(user=self.user, product=product, quantity=2)
+            for product in self.make_products(missing))
+
+    def grow_wishlist(self, size):
+        missing = size - self.wishlist.items.count()
+        Wishlist_Item.objects.bulk_create(
+            Wishlist_Item(wishlist=self.wishlist, product=product)
+            for product in self.make_products(missing))
+
+    def last_cart_item(self):
+        return Cart_Item.objects.filter(user=self.user).latest("pk")
+
+    def test_every_url_has_a_query_count_test(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        missing = sorted(name for name in names if not hasattr(self, f"test_{name}"))
+        self.assertEqual(missing, [], "URLs without a query count test")
+
+    def test_scaling_view_fails_with_its_sql(self):
+        user = self.user
+
+        class LazyCartClient:
+            # Stands in for a view that loads each line's product
+            def get(self, path):
+                for item in Cart_Item.objects.filter(user=user):
+                    item.product.price
+                return HttpResponse()
+
+        with self.assertRaisesRegex(AssertionError, r"different number of times:\n  \+7  SELECT"):
+            self.assertQueriesConstant(self.grow_cart, reverse("view_cart"),
+                                       client=LazyCartClient())
+
+    # ------------------ Product Views ------------------ #
+
+    def test_product_list(self):
+        self.assertQueriesConstant(self.grow_products, reverse("product_list"))
+
+    def test_search(self):
+        self.assertQueriesConstant(self.grow_products, reverse("search") + "?q=relic")
+
+    def test_debug_list(self):
+        self.assertQueriesConstant(self.grow_products, reverse("debug_list"))
+
+    def test_product_page(self):
+        self.assertQueriesConstant(self.grow_reviews, self.product.get_absolute_url())
+
+    def test_product_page_anonymous(self):
+        self.assertQueriesConstant(self.grow_reviews, self.product.get_absolute_url(),
+                                   client=Client())
+
+    def test_legacy_product_page(self):
+        self.assertQueriesConstant(
+            self.grow_products,
+            reverse("legacy_product_page", args=["Anvil", self.product.id]))
+
+    # ------------------ Review Views ------------------ #
+
+    def test_product_reviews(self):
+        self.assertQueriesConstant(self.grow_reviews,
+                                   reverse("product_reviews", args=[self.product.id]))
+
+    def test_review_delete(self):
+        self.assertQueriesConstant(
+            self.grow_own_reviews,
+            lambda: reverse("review_delete", args=[
+                self.product.id, self.product.slug, self.product.reviews.latest("pk").id]))
+
+    # ---------------- Wishlist Views ---------------- #
+
+    def test_view_wishlist(self):
+        self.assertQueriesConstant(self.grow_wishlist, reverse("view_wishlist"))
+
+    def test_add_to_wishlist(self):
+        self.assertQueriesConstant(
+            self.grow_wishlist,
+            lambda: reverse("add_to_wishlist", args=[self.make_products(1)[0].id]),
+            method="post")
+
+    def test_remove_from_wishlist(self):
+        self.assertQueriesConstant(
+            self.grow_wishlist,
+            lambda: reverse("remove_from_wishlist", args=[
+                self.wishlist.items.latest("pk").id]))
+
+    def test_clear_wishlist(self):
+        self.assertQueriesConstant(self.grow_wishlist, reverse("clear_wishlist"))
+
+    def test_save_cart_to_wishlist(self):
+        self.assertQueriesConstant(self.grow_cart, reverse("save_cart_to_wishlist"))
+
+    # ------------------ Cart Views ------------------ #
+
+    def test_view_cart(self):
+        self.assertQueriesConstant(self.grow_cart, reverse("view_cart"))
+
+    def test_view_cart_guest(self):
+        guest = Client()
+
+        def grow(size):
+            for product in self.make_products(size - len(guest.session.get("guest_cart", {}))):
+                guest.get(reverse("add_to_cart", args=[product.id]))
+
+        self.assertQueriesConstant(grow, reverse("view_cart"), client=guest)
+
+    def test_add_to_cart(self):
+        self.assertQueriesConstant(
+            self.grow_cart,
+            lambda: reverse("add_to_cart", args=[self.make_products(1)[0].id]))
+
+    def test_remove_from_cart(self):
+        self.assertQueriesConstant(
+            self.grow_cart,
+            lambda: reverse("remove_from_cart", args=[self.last_cart_item().id]))
+
+    def test_increment_in_cart(self):
+        self.assertQueriesConstant(
+            self.grow_cart,
+            lambda: reverse("increment_in_cart", args=[self.last_cart_item().id, 1]),
+            method="post", HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+
+    def test_clear_cart(self):
+        self.assertQueriesConstant(self.grow_cart, reverse("clear_cart"))
+
+    # ------------------ Instrumentation ------------------ #
+
+    @override_settings(REQUEST_METRICS=True)
+    def test_metrics(self):
+        staff = Client()
+        staff.force_login(get_user_model().objects.create_user(
+            username="warden", password="pass", is_staff=True))
+        self.assertQueriesConstant(self.grow_products, reverse("metrics"), client=staff)
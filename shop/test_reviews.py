@@ -0,0 +1,161 @@
+import io
+import re
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import caches
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from shop.models import Product, Review
+from shop.admin import approve_selected, reject_selected
+from shop.forms import ProductAdminForm
+from shop.reviews import REVIEW_PAGE_SIZE, approve_reviews, rebuild_review_aggregates
+
+
+class ReviewAggregateTest(TestCase):
+    def setUp(self):
+        caches["sessions"].clear()
+        self.user = get_user_model().objects.create_user(username="carol", password="pass")
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.product = Product.objects.create(product_name="Mace", price=Decimal("8.00"),
+                                              stock_quantity=4, status=True)
+        self.url = self.product.get_absolute_url()
+
+    def post_review(self, score):
+        return self.client.post(self.url, {"title": "Hmm", "content": "Heavy.", "review_score": score})
+
+    def test_posting_and_deleting_reviews_updates_totals(self):
+        self.post_review(4)
+        self.post_review(3)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 0)
+        approve_reviews(Review.objects.all())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 2)
+        self.assertEqual(self.product.review_sum, 7)
+        self.assertEqual(self.product.review_average, Decimal("3.5"))
+
+        review = Review.objects.filter(review_score=4).get()
+        self.client.get(reverse("review_delete", args=[self.product.id, self.product.slug, review.id]))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 1)
+        self.assertEqual(self.product.review_average, Decimal("3.0"))
+
+    def test_review_deleted_twice_is_discounted_once(self):
+        self.post_review(4)
+        approve_reviews(Review.objects.all())
+        review = Review.objects.get()
+        url = reverse("review_delete", args=[self.product.id, self.product.slug, review.id])
+        # Another request deletes the row after this one loaded it
+        with mock.patch.object(Review, "delete", return_value=(0, {})):
+            self.client.get(url)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.review_count, self.product.review_sum), (1, 4))
+
+    def test_product_page_does_not_count_reviews(self):
+        self.post_review(5)
+        approve_reviews(Review.objects.all())
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.url)
+        self.assertFalse([q for q in ctx.captured_queries if "COUNT(" in q["sql"]])
+        self.assertEqual(resp.context["review_count"], 1)
+
+    def test_rebuild_command_recomputes_totals(self):
+        Review.objects.create(product_id=self.product, username=self.user,
+                              title="A", content="B", review_score=2, approved=True)
+        Review.objects.create(product_id=self.product, username=self.user,
+                              title="A", content="B", review_score=5, approved=True)
+        Review.objects.create(product_id=self.product, username=self.user,
+                              title="Pending", content="B", review_score=1)
+        with self.assertNumQueries(1):
+            rebuild_review_aggregates()
+        call_command("rebuild_review_aggregates", stdout=io.StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 2)
+        self.assertEqual(self.product.review_sum, 7)
+        self.assertEqual(self.product.review_average, Decimal("3.5"))
+
+    def test_product_forms_leave_review_totals_alone(self):
+        self.assertFalse({"review_average", "review_count", "review_sum"}
+                         & set(ProductAdminForm.base_fields))
+
+
+class ReviewModerationTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="dora", password="pass")
+        self.client = Client()
+        self.products = [
+            Product.objects.create(product_name=f"Flail {i}", price=Decimal("9.00"),
+                                   stock_quantity=2, status=True)
+            for i in range(3)
+        ]
+        for product in self.products:
+            for score in (2, 4):
+                Review.objects.create(product_id=product, username=self.user,
+                                      title=f"Score {score}", content="Spiky.", review_score=score)
+
+    def test_pending_reviews_are_hidden(self):
+        resp = self.client.get(self.products[0].get_absolute_url())
+        self.assertNotContains(resp, "Score 4")
+        self.assertContains(resp, "No one has reviewed this item.")
+
+    def test_bulk_approve_updates_ratings_with_constant_queries(self):
+        with CaptureQueriesContext(connection) as one:
+            approve_selected(None, None, Review.objects.filter(product_id=self.products[0]))
+        with CaptureQueriesContext(connection) as many:
+            approve_selected(None, None, Review.objects.all())
+        self.assertEqual(len(one.captured_queries), len(many.captured_queries))
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual(product.review_count, 2)
+            self.assertEqual(product.review_average, Decimal("3.0"))
+        self.assertContains(self.client.get(self.products[0].get_absolute_url()), "Score 4")
+
+    def test_bulk_reject_removes_reviews_from_ratings(self):
+        approve_reviews(Review.objects.all())
+        reject_selected(None, None, Review.objects.filter(review_score=2))
+        self.products[1].refresh_from_db()
+        self.assertEqual(self.products[1].review_count, 1)
+        self.assertEqual(self.products[1].review_average, Decimal("4.0"))
+        self.assertEqual(Review.objects.count(), 3)
+
+
+class ReviewPaginationTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.product = Product.objects.create(product_name="Halberd", price=Decimal("30.00"),
+                                              stock_quantity=4, status=True)
+        users = [get_user_model().objects.create_user(username=f"critic{i}") for i in range(3)]
+        Review.objects.bulk_create(
+            Review(product_id=self.product, username=users[i % 3], title=f"Review {i}",
+                   content="Pointy.", review_score=i % 6, approved=True)
+            for i in range(25)
+        )
+        self.more_url = reverse("product_reviews", args=[self.product.id])
+
+    def test_page_shows_first_reviews_and_endpoint_pages_through_the_rest(self):
+        resp = self.client.get(self.product.get_absolute_url())
+        self.assertEqual(len(resp.context["reviews"]), REVIEW_PAGE_SIZE)
+        self.assertContains(resp, 'id="reviews-more"')
+        seen = [review.id for review in resp.context["reviews"]]
+        cursor = resp.context["next_cursor"]
+        while cursor:
+            data = self.client.get(self.more_url, {"cursor": cursor}).json()
+            seen += [int(i) for i in re.findall(r'id="review-(\d+)"', data["html"])]
+            cursor = data["next_cursor"]
+        self.assertEqual(seen, list(Review.objects.order_by("-created_on", "-id")
+                                    .values_list("id", flat=True)))
+
+    def test_endpoint_fetches_authors_with_reviews(self):
+        first = self.client.get(self.product.get_absolute_url()).context["next_cursor"]
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(self.more_url, {"cursor": first}).json()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn("critic", data["html"])
+
+    def test_bad_cursor_is_not_found(self):
+        self.assertEqual(self.client.get(self.more_url, {"cursor": "nope"}).status_code, 404)
@@ -0,0 +1,80 @@
+from decimal import Decimal
+from unittest import skipUnless
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib import admin as django_admin
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from shop.models import Product
+from shop.search import matching_products, search_products
+
+
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.longbow = Product.objects.create(
+            product_name="Elven Longbow", subtitle="The archer's bow", category="bow",
+            description="A bow strung with spider silk.", status=True,
+            price=Decimal("40.00"), stock_quantity=3)
+        self.crossbow = Product.objects.create(
+            product_name="Dwarven Crossbow", subtitle="Heavy bolts", category="crossbow",
+            description="A bow that is cranked, not drawn.", status=True,
+            price=Decimal("55.00"), stock_quantity=3)
+        self.plate = Product.objects.create(
+            product_name="Dragonscale Plate", subtitle="Fireproof", category="heavy",
+            description="Made from a very cross dragon.", status=True,
+            price=Decimal("900.00"), stock_quantity=1)
+
+    def test_search_ranks_matches_and_counts_facets(self):
+        products, facets = search_products("bow")
+        self.assertEqual(products[0], self.longbow)
+        self.assertEqual(set(products), {self.longbow, self.crossbow})
+        self.assertEqual(facets, {"bow": 1, "crossbow": 1})
+
+    def test_category_facet_narrows_results(self):
+        products, facets = search_products("bow", category="crossbow")
+        self.assertEqual(products, [self.crossbow])
+        self.assertEqual(facets, {"bow": 1, "crossbow": 1})
+
+    def test_index_follows_product_saves_and_deletes(self):
+        self.plate.product_name = "Dragonscale Hauberk"
+        self.plate.save()
+        self.assertEqual(search_products("hauberk")[0], [self.plate])
+        self.assertEqual(search_products("plate")[0], [])
+        self.plate.delete()
+        self.assertEqual(search_products("hauberk")[0], [])
+
+    def test_search_text_cannot_inject_query_syntax(self):
+        self.assertEqual(list(matching_products(Product.objects.all(), 'bow" OR "')), [])
+        self.assertEqual(search_products('   ')[0], [])
+
+    def test_html_markup_is_not_indexed(self):
+        self.plate.description = (
+            '<p>Made from a <strong>very</strong> cross '
+            '<a href="/lore/">dragon</a> &amp; its hoard.</p>')
+        self.plate.save()
+        self.assertEqual(search_products("strong")[0], [])
+        self.assertEqual(search_products("href")[0], [])
+        self.assertEqual(search_products("amp")[0], [])
+        self.assertEqual(search_products("very cross hoard")[0], [self.plate])
+
+    @skipUnless(connection.vendor == "sqlite", "FTS5 ranking is SQLite only")
+    def test_ranking_matches_the_index_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            search_products("bow")
+        ranking = ctx.captured_queries[-1]["sql"]
+        self.assertEqual(ranking.upper().count("MATCH"), 1)
+        self.assertEqual(ranking.upper().count("SELECT"), 1)
+
+    def test_search_page(self):
+        resp = self.client.get(reverse("search"), {"q": "dragon"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Dragonscale Plate")
+        self.assertContains(resp, "Heavy Armor (1)")
+
+    def test_admin_search_uses_index(self):
+        product_admin = django_admin.site._registry[Product]
+        queryset, may_have_duplicates = product_admin.get_search_results(
+            None, Product.objects.all(), "dwarven")
+        self.assertEqual(list(queryset), [self.crossbow])
+        self.assertFalse(may_have_duplicates)
@@ -0,0 +1,74 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase
+from shop.models import Product, Review, Cart_Item, Wishlist_Item
+from shop.benchmark import percentile
+from shop.facets import category_counts
+
+
+class SeedShopTest(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+
+    def seed(self, **options):
+        out = io.StringIO()
+        call_command("seed_shop", stdout=out, seed=7, batch_size=40, **options)
+        return out.getvalue()
+
+    def test_seeds_every_model_in_batches(self):
+        out = self.seed(products=60, users=6, reviews=2, cart_lines=4, wishlist_items=3)
+        self.assertIn("60 products", out)
+        self.assertEqual(Product.objects.filter(sku__startswith="SEED-").count(), 60)
+        self.assertEqual(Cart_Item.objects.count(), 24)
+        self.assertEqual(Wishlist_Item.objects.count(), 18)
+        self.assertTrue(Review.objects.exists())
+        self.assertEqual(sum(category_counts().values()),
+                         Product.objects.filter(status=True, stock_quantity__gt=0).count())
+
+        reviewed = Product.objects.filter(review_count__gt=0).first()
+        self.assertEqual(reviewed.review_count,
+                         reviewed.reviews.filter(approved=True).count())
+
+        # A second run adds to the first rather than clashing with it
+        self.seed(products=5, users=1, reviews=0, cart_lines=1, wishlist_items=0)
+        self.assertEqual(Product.objects.filter(sku__startswith="SEED-").count(), 65)
+        self.assertTrue(Product.objects.filter(sku="SEED-0000065").exists())
+
+
+class BenchStorefrontTest(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+        caches["product_pages"].clear()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        call_command("seed_shop", stdout=io.StringIO(), seed=3, products=20, users=3,
+                     reviews=1, cart_lines=3, wishlist_items=2)
+
+    def test_percentile_is_nearest_rank(self):
+        timings = list(range(1, 101))
+        self.assertEqual([percentile(timings, p) for p in (50, 95, 99)], [50, 95, 99])
+        self.assertEqual(percentile([4.0], 99), 4.0)
+
+    def test_results_are_saved_and_compared(self):
+        path = os.path.join(self.dir, "bench.json")
+        out = io.StringIO()
+        call_command("bench_storefront", requests=5, warmup=1, output=path, stdout=out)
+        with open(path) as f:
+            results = json.load(f)
+        self.assertEqual(list(results["views"]),
+                         ["product_list", "product_page", "search", "view_cart", "view_wishlist"])
+        self.assertEqual(results["rows"]["cart_items"], 9)
+        for view in results["views"].values():
+            self.assertEqual((view["requests"], view["errors"]), (5, 0))
+            self.assertLessEqual(view["p50_ms"], view["p99_ms"])
+            self.assertGreater(view["queries"], 0)
+
+        out = io.StringIO()
+        call_command("bench_storefront", requests=5, warmup=1, view=["view_cart"],
+                     compare=path, stdout=out)
+        self.assertRegex(out.getvalue(), r"view_cart .*queries \d+(\.\d+)?  \([+-]\d")
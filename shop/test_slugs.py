@@ -0,0 +1,52 @@
+from decimal import Decimal
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from shop.models import Product
+
+
+class ProductSlugTest(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+        self.client = Client()
+        self.product = Product.objects.create(product_name="Frost Brand Sword", status=True,
+                                              price=Decimal("120.00"), stock_quantity=2)
+
+    def test_slugs_follow_names_and_renames(self):
+        twin = Product.objects.create(product_name="Frost Brand Sword",
+                                      price=Decimal("120.00"), stock_quantity=1)
+        self.assertEqual(self.product.slug, "frost-brand-sword")
+        # Pages are found by id, so equal names can share a slug
+        self.assertEqual(twin.slug, "frost-brand-sword")
+        self.assertNotEqual(twin.get_absolute_url(), self.product.get_absolute_url())
+        bulk, = Product.objects.bulk_create([
+            Product(product_name="Frost Brand Sword", price=Decimal("1.00"), stock_quantity=1)])
+        self.assertEqual(bulk.slug, "frost-brand-sword")
+        self.product.product_name = "Flame Tongue"
+        self.product.save(update_fields=["product_name"])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.slug, "flame-tongue")
+
+    def test_detail_lookup_is_by_primary_key(self):
+        url = self.product.get_absolute_url()
+        self.assertEqual(url, f"/products/{self.product.id}/frost-brand-sword/")
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertContains(resp, "Frost Brand Sword")
+        lookups = [q["sql"] for q in ctx.captured_queries if 'FROM "shop_product"' in q["sql"]]
+        self.assertEqual(len(lookups), 1)
+        self.assertIn('"shop_product"."id" = ', lookups[0])
+        self.assertNotIn('"product_name" = ', lookups[0])
+
+    def test_old_and_renamed_urls_redirect_permanently(self):
+        url = self.product.get_absolute_url()
+        resp = self.client.get(f"/Frost Brand Sword {self.product.id}/")
+        self.assertRedirects(resp, url, status_code=301)
+        with self.assertNumQueries(0):
+            resp = self.client.get(f"/Some Old Name {self.product.id}/")
+        self.assertRedirects(resp, url, status_code=301, fetch_redirect_response=False)
+        resp = self.client.get(reverse("product_page", args=[self.product.id, "frost-brand"]))
+        self.assertRedirects(resp, url, status_code=301)
+        self.assertEqual(self.client.get(f"/Frost Brand Sword {self.product.id + 1}/").status_code, 404)
@@ -0,0 +1,76 @@
+import json
+import os
+import shutil
+import tempfile
+from django.conf import settings
+from django.core.management import call_command
+from django.template import Context, Template
+from decimal import Decimal
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.test import SimpleTestCase, TestCase, RequestFactory, override_settings
+from django.urls import reverse
+from whitenoise.middleware import WhiteNoiseMiddleware
+from shop.models import Product
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "shop.storage.BundledStaticFilesStorage"},
+}
+# Only the project's own static/ folder, to keep collectstatic quick
+FINDERS = ["django.contrib.staticfiles.finders.FileSystemFinder"]
+
+
+class StaticBuildTest(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.settings = override_settings(
+            STATIC_ROOT=self.root, STORAGES=STORAGES, STATICFILES_FINDERS=FINDERS,
+            STATIC_PRECOMPRESS=True)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+        with open(os.path.join(self.root, "staticfiles.json")) as manifest:
+            self.paths = json.load(manifest)["paths"]
+
+    def test_manifest_hashes_and_precompresses_files(self):
+        hashed = self.paths["css/style2.css"]
+        self.assertRegex(hashed, r"^css/style2\.[0-9a-f]{12}\.css$")
+        for suffix in ("", ".gz", ".br"):
+            self.assertTrue(os.path.exists(os.path.join(self.root, hashed + suffix)), suffix)
+
+    def test_bundle_joins_its_sources(self):
+        with open(os.path.join(self.root, self.paths["js/product.js"])) as bundle:
+            content = bundle.read()
+        for source in settings.STATIC_BUNDLES["js/product.js"]:
+            with open(os.path.join(settings.BASE_DIR, "static", source)) as f:
+                self.assertIn(f.read().strip(), content)
+        html = Template("{% load static_bundles %}{% static_bundle 'js/product.js' %}").render(Context())
+        self.assertEqual(html, f'<script src="/static/{self.paths["js/product.js"]}"></script>')
+
+    def test_hashed_files_are_served_immutable(self):
+        middleware = WhiteNoiseMiddleware(lambda request: None)
+        response = middleware(RequestFactory().get("/static/" + self.paths["js/product.js"],
+                                                   HTTP_ACCEPT_ENCODING="gzip, br"))
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response["Content-Encoding"], "br")
+
+
+class ManifestTemplateTest(TestCase):
+    """
+    The test runner collects static files first, so pages render against
+    the manifest storage used in production.
+    """
+
+    def test_pages_link_hashed_static_files(self):
+        self.assertTrue(staticfiles_storage.exists("staticfiles.json"))
+        product = Product.objects.create(product_name="Glaive", price=Decimal("9.00"),
+                                         stock_quantity=1, status=True)
+        for url in (reverse("product_list"), product.get_absolute_url(),
+                    reverse("debug_list"), reverse("view_cart")):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertRegex(response.content.decode(),
+                             r"/static/[\w/-]+\.[0-9a-f]{12}\.\w+", url)
+        self.assertContains(self.client.get(reverse("debug_list")),
+                            staticfiles_storage.url("images/placeholder.webp"))
@@ -0,0 +1,129 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import caches
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from shop.models import Product, Cart_Item
+from shop.cart import OutOfStock, add_to_cart_item, adjust_cart_item, release_expired_reservations
+
+
+class StockReservationTest(TestCase):
+    def setUp(self):
+        caches["sessions"].clear()
+        self.user = get_user_model().objects.create_user(username="gina", password="pass")
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.product = Product.objects.create(product_name="Halberd", price=Decimal("30.00"),
+                                              stock_quantity=2, status=True)
+
+    def assertStock(self, available, reserved):
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock_quantity, self.product.reserved_quantity),
+                         (available, reserved))
+
+    def test_adding_reserves_and_refuses_to_oversell(self):
+        add_to_cart_item(self.user, self.product.id)
+        add_to_cart_item(self.user, self.product.id)
+        self.assertStock(0, 2)
+        with self.assertRaises(OutOfStock):
+            add_to_cart_item(self.user, self.product.id)
+        self.assertEqual(Cart_Item.objects.get(user=self.user).quantity, 2)
+        self.assertStock(0, 2)
+
+    def test_adjusting_and_removing_release_stock(self):
+        add_to_cart_item(self.user, self.product.id, quantity=2)
+        item = Cart_Item.objects.get(user=self.user)
+        with self.assertRaises(OutOfStock):
+            adjust_cart_item(self.user, item.id, 1)
+        self.assertEqual(adjust_cart_item(self.user, item.id, -1), 1)
+        self.assertStock(1, 1)
+        self.client.get(reverse("remove_from_cart", args=[item.id]))
+        self.assertStock(2, 0)
+
+    def test_clear_cart_returns_stock(self):
+        add_to_cart_item(self.user, self.product.id, quantity=2)
+        self.client.get(reverse("clear_cart"))
+        self.assertStock(2, 0)
+        self.assertFalse(Cart_Item.objects.exists())
+
+    def test_products_held_in_carts_keep_their_page(self):
+        add_to_cart_item(self.user, self.product.id, quantity=2)
+        self.assertStock(0, 2)
+        self.assertEqual(self.client.get(self.product.get_absolute_url()).status_code, 200)
+        self.assertEqual(Client().get(self.product.get_absolute_url()).status_code, 200)
+        sold_out = Product.objects.create(product_name="Glaive", price=Decimal("9.00"),
+                                          stock_quantity=0)
+        self.assertEqual(self.client.get(sold_out.get_absolute_url()).status_code, 404)
+
+    def test_expired_reservations_are_swept_in_batches(self):
+        other = Product.objects.create(product_name="Pike", price=Decimal("25.00"), stock_quantity=5)
+        add_to_cart_item(self.user, self.product.id, quantity=2)
+        add_to_cart_item(self.user, other.id, quantity=3)
+        Cart_Item.objects.filter(product=self.product).update(
+            reserved_until=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(release_expired_reservations(batch_size=1), 1)
+        self.assertStock(2, 0)
+        # the line stays in the cart without its stock; the unexpired
+        # reservation is untouched
+        lines = dict(Cart_Item.objects.values_list("product", "reserved_until"))
+        self.assertIsNone(lines[self.product.id])
+        self.assertIsNotNone(lines[other.id])
+        other.refresh_from_db()
+        self.assertEqual((other.stock_quantity, other.reserved_quantity), (2, 3))
+        self.assertEqual(release_expired_reservations(), 0)
+        self.assertStock(2, 0)
+
+    def test_released_lines_reserve_again_when_changed(self):
+        add_to_cart_item(self.user, self.product.id, quantity=1)
+        Cart_Item.objects.update(reserved_until=timezone.now() - timedelta(minutes=1))
+        release_expired_reservations()
+        add_to_cart_item(self.user, self.product.id)
+        self.assertStock(0, 2)
+        with self.assertRaises(OutOfStock):
+            add_to_cart_item(self.user, self.product.id)
+        item = Cart_Item.objects.get()
+        self.assertEqual((item.quantity, item.reserved_until is not None), (2, True))
+        self.client.get(reverse("clear_cart"))
+        self.assertStock(2, 0)
+
+    def admin_form_data(self, admin_client):
+        url = reverse("admin:shop_product_change", args=[self.product.id])
+        form = admin_client.get(url).context["adminform"].form
+        data = {name: form[name].value() for name in form.fields
+                if form[name].value() is not None}
+        return url, data
+
+    def test_admin_saves_keep_concurrent_reservations(self):
+        admin_client = Client()
+        admin_client.force_login(get_user_model().objects.create_superuser(
+            username="quartermaster", password="pass"))
+        url, data = self.admin_form_data(admin_client)
+        self.assertEqual(data["on_hand"], 2)
+        self.assertNotIn("reserved_quantity", data)
+        # Reserved while the form is open
+        add_to_cart_item(self.user, self.product.id)
+        data.update(price="35.00", description="Long reach")
+        self.assertEqual(admin_client.post(url, data).status_code, 302)
+        self.assertStock(1, 1)
+
+        url, data = self.admin_form_data(admin_client)
+        data.update(on_hand=5, description="Long reach")
+        admin_client.post(url, data)
+        self.assertStock(4, 1)
+        data["on_hand"] = 0
+        response = admin_client.post(url, data)
+        self.assertContains(response, "1 units are held in carts")
+        self.assertStock(4, 1)
+
+    def test_sweep_command(self):
+        add_to_cart_item(self.user, self.product.id, quantity=1)
+        Cart_Item.objects.update(reserved_until=timezone.now() - timedelta(minutes=1))
+        out = io.StringIO()
+        call_command("release_expired_reservations", stdout=out)
+        self.assertIn("Released the stock of 1 expired cart lines", out.getvalue())
+        self.assertStock(2, 0)
+        self.assertEqual(Cart_Item.objects.get().quantity, 1)
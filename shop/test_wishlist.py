@@ -0,0 +1,81 @@
+from decimal import Decimal
+from django.core.cache import caches
+from django.test import TestCase, Client, AsyncClient
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from shop.models import Product, Cart_Item, Wishlist, Wishlist_Item
+
+
+class BulkCartWishlistTest(TestCase):
+    def setUp(self):
+        caches["sessions"].clear()
+        self.user = get_user_model().objects.create_user(username="erin", password="pass")
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.wishlist = Wishlist.objects.create(user=self.user)
+
+    def fill_cart(self, size):
+        products = Product.objects.bulk_create(
+            Product(product_name=f"Bolt {i}", price=Decimal("2.00"), stock_quantity=5)
+            for i in range(size)
+        )
+        Cart_Item.objects.bulk_create(
+            Cart_Item(user=self.user, product=product, quantity=1) for product in products
+        )
+        return products
+
+    def count_queries(self, url_name):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse(url_name))
+        return len(ctx.captured_queries)
+
+    def test_save_cart_to_wishlist_moves_items_and_skips_duplicates(self):
+        products = self.fill_cart(3)
+        Wishlist_Item.objects.create(wishlist=self.wishlist, product=products[0])
+        self.client.get(reverse("save_cart_to_wishlist"))
+        self.assertFalse(Cart_Item.objects.filter(user=self.user).exists())
+        self.assertEqual(Wishlist_Item.objects.filter(wishlist=self.wishlist).count(), 3)
+
+    def test_save_cart_to_wishlist_query_count_is_constant(self):
+        self.fill_cart(1)
+        small = self.count_queries("save_cart_to_wishlist")
+        Wishlist_Item.objects.all().delete()
+        self.fill_cart(200)
+        large = self.count_queries("save_cart_to_wishlist")
+        self.assertEqual(small, large)
+        self.assertEqual(Wishlist_Item.objects.count(), 200)
+
+    def test_clear_cart_and_wishlist_query_count_is_constant(self):
+        self.fill_cart(1)
+        small_cart = self.count_queries("clear_cart")
+        self.fill_cart(200)
+        self.assertEqual(self.count_queries("clear_cart"), small_cart)
+
+        products = Product.objects.all()[:1]
+        Wishlist_Item.objects.create(wishlist=self.wishlist, product=products[0])
+        small_wishlist = self.count_queries("clear_wishlist")
+        Wishlist_Item.objects.bulk_create(
+            Wishlist_Item(wishlist=self.wishlist, product=product) for product in Product.objects.all()
+        )
+        self.assertEqual(self.count_queries("clear_wishlist"), small_wishlist)
+        self.assertFalse(Wishlist_Item.objects.exists())
+
+
+class AsyncWishlistViewTest(TestCase):
+    def setUp(self):
+        caches["sessions"].clear()
+
+    async def test_add_to_wishlist_json_path(self):
+        user = await get_user_model().objects.acreate_user(username="hal", password="pass")
+        product = await Product.objects.acreate(product_name="Sling", price=Decimal("1.00"), stock_quantity=3)
+        client = AsyncClient()
+        await client.aforce_login(user)
+        resp = await client.post(reverse("add_to_wishlist", args=[product.id]),
+                                 headers={"x-requested-with": "XMLHttpRequest"})
+        self.assertEqual(resp.json(), {"status": "ok", "message": "Saved To Wishlist"})
+        self.assertTrue(await Wishlist_Item.objects.filter(wishlist__user=user, product=product).aexists())
+        resp = await client.get(reverse("view_wishlist"))
+        self.assertContains(resp, "Sling")
+
@@ -6,18 +6,34 @@ urlpatterns = [
         '',
         views.ProductList.as_view(),
         name='product_list'),
+    path(
+        'search/',
+        views.search,
+        name='search'),
+    path(
+        'metrics',
+        views.metrics,
+        name='metrics'),
     path(
         'debug/',
         views.DebugList.as_view(),
         name='debug_list'),
     path(
-        '<str:product_name> <int:product_id>/',
+        'product_reviews/<int:product_id>/',
+        views.product_reviews,
+        name='product_reviews'),
+    path(
+        'products/<int:product_id>/<slug:slug>/',
         views.product_page,
         name='product_page'),
     path(
-        '<str:product_name> <int:product_id>/delete_comment/<int:review_id>',
+        'products/<int:product_id>/<slug:slug>/delete_comment/<int:review_id>',
         views.review_delete,
         name='review_delete'),
+    path(
+        '<str:product_name> <int:product_id>/',
+        views.legacy_product_page,
+        name='legacy_product_page'),
     path(
         'cart/',
         views.view_cart,
@@ -1,22 +1,96 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.shortcuts import (
+    render, get_object_or_404, aget_object_or_404, redirect)
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.views import generic
 from django.contrib import messages
-from django.http import HttpResponseRedirect, JsonResponse
+from django.conf import settings
+from django.http import (
+    Http404, HttpResponse, HttpResponsePermanentRedirect,
+    HttpResponseRedirect, JsonResponse)
+from django.utils.crypto import constant_time_compare
 from django.views.decorators.http import require_POST
-from django.db.models import F, ExpressionWrapper, DecimalField
+from django.db import transaction
+from django.db.models import F, ExpressionWrapper, DecimalField, Q, Sum
+from django.db.models.functions import Coalesce
 from .models import Product, Review, Cart_Item, Wishlist, Wishlist_Item
 from .forms import ReviewForm
+from .catalog import catalog_page, on_hand, product_slug
+from .facets import facet_counts
+from .reviews import record_review, discard_review, review_page
+from .page_cache import (
+    get_product_fragment, product_version, set_product_fragment)
+from .search import search_products
+from .cart import (
+    LINE_COST, OutOfStock, add_to_cart_item, adjust_cart_item, cart_totals,
+    release_cart_items)
+from .guest_cart import (
+    add_to_guest_cart, adjust_guest_cart, clear_guest_cart, guest_cart_lines,
+    guest_cart_totals, remove_from_guest_cart)
+from .metrics import VIEW_METRICS
+from .badges import adjust_badge, forget_badge
+from .context_processors import request_badges
+
+
+async def current_user(request):
+    """
+    Load the user for an async view and share it with request.user, so
+    templates rendered afterwards do not fetch it a second time.
+    """
+    request.user = await request.auser()
+    return request.user
+
 
 # ------------------ Product Views ------------------ #
 
 
 class ProductList(generic.ListView):
     """
-    Displays a list of all products.
+    Displays a keyset-paginated list of listed products,
+    optionally filtered by category or category group, with cached
+    product counts for the category navigation.
     """
-    queryset = Product.objects.all()
-    template_name = 'product_list.html'
+    template_name = 'shop/product_list.html'
+    context_object_name = 'product_list'
+
+    def get_queryset(self):
+        self.category = self.request.GET.get('category') or None
+        products, self.next_cursor = catalog_page(
+            category=self.category,
+            cursor=self.request.GET.get('cursor'))
+        return products
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['category'] = self.category
+        context['next_cursor'] = self.next_cursor
+        context['facets'] = facet_counts(selected=self.category)
+        return context
+
+
+def search(request):
+    """
+    Ranked full-text search over listed products, with per-category
+    result counts for narrowing the search.
+    """
+    query = request.GET.get('q', '')
+    category = request.GET.get('category') or None
+    products, facets = search_products(query, category=category)
+
+    # Facet links follow Product.CATEGORY_CHOICES order
+    facet_links = [
+        {'value': value, 'label': label, 'count': facets[value]}
+        for value, label in Product._meta.get_field('category').flatchoices
+        if value in facets
+    ]
+    return render(request, 'shop/search.html', {
+        'query': query,
+        'category': category,
+        'product_list': products,
+        'facets': facet_links,
+    })
 
 
 class DebugList(generic.ListView):
@@ -24,109 +98,172 @@ class DebugList(generic.ListView):
     Debug view: displays all products for debugging purposes.
     """
     queryset = Product.objects.all()
-    template_name = 'debug_list.html'
+    template_name = 'shop/debug_list.html'
+
+
+def submit_review(request, user, product):
+    """
+    Save a review posted from the product page and add it to the
+    product's rating totals.
+    """
+    review_form = ReviewForm(data=request.POST)
+    if review_form.is_valid():
+        review = review_form.save(commit=False)
+        review.username = user
+        review.product_id = product
+        with transaction.atomic():
+            review.save()
+            record_review(review)
+        product.refresh_from_db(
+            fields=['review_count', 'review_sum', 'review_average'])
+        messages.add_message(
+            request, messages.SUCCESS,
+            'review submitted and awaiting approval'
+        )
 
 
-def product_page(request, product_name, product_id):
+async def product_page(request, product_id, slug):
     """
     Display a single product's detail page, including reviews and review form.
     Handles review submission via POST.
+    The product is looked up by id alone; an outdated slug (e.g. after a
+    rename) redirects permanently to the current URL.
+    Anonymous GETs are served from the product page cache when possible.
     """
-    queryset = Product.objects.exclude(stock_quantity=0)
-    product = get_object_or_404(
-        queryset,
-        product_name=product_name,
-        id=product_id)
-    reviews = product.reviews.all().order_by("-created_on")
-    review_count = product.reviews.all().count()
+    user = await current_user(request)
+    anonymous_get = request.method == "GET" and not user.is_authenticated
+    if anonymous_get:
+        # Read once, before the product and its reviews
+        version = await sync_to_async(product_version)(product_id)
+        fragment = await sync_to_async(get_product_fragment)(
+            product_id, slug, version)
+        if fragment is not None:
+            return await sync_to_async(render)(
+                request, "shop/product_page.html",
+                {"product_fragment": fragment})
+
+    queryset = on_hand(Product.objects.all())
+    product = await aget_object_or_404(queryset, pk=product_id)
+    if product.slug != slug:
+        return HttpResponsePermanentRedirect(product.get_absolute_url())
 
     # Handle review submission
     if request.method == "POST":
-        review_form = ReviewForm(data=request.POST)
-        if review_form.is_valid():
-            review = review_form.save(commit=False)
-            review.username = request.user
-            review.product_id = product
-            review.save()
-            messages.add_message(
-                request, messages.SUCCESS,
-                'review submitted and awaiting approval'
-            )
+        await sync_to_async(submit_review)(request, user, product)
+
+    # First page of reviews; reviews.js loads the rest on scroll
+    reviews, next_cursor = await sync_to_async(review_page)(product.id)
     # Always provide a fresh review form for GET or after POST
     review_form = ReviewForm()
 
-    return render(
-        request,
-        "shop/product_page.html",
-        {
-            "product": product,
-            "reviews": reviews,
-            "review_count": review_count,
-            "review_form": review_form,
-        }
-    )
+    context = {
+        "product": product,
+        "reviews": reviews,
+        "next_cursor": next_cursor,
+        "review_count": product.review_count,
+        "review_form": review_form,
+    }
+    if anonymous_get:
+        fragment = await sync_to_async(render_to_string)(
+            "shop/product_detail.html", context, request)
+        await sync_to_async(set_product_fragment)(
+            product_id, slug, fragment, version)
+        context["product_fragment"] = fragment
+
+    return await sync_to_async(render)(
+        request, "shop/product_page.html", context)
+
+
+async def legacy_product_page(request, product_name, product_id):
+    """
+    Permanently redirect an old "<name> <id>/" product URL to the
+    product's slug URL, using the cached id -> slug map. The name is
+    ignored, so links to renamed products keep working.
+    """
+    slug = await sync_to_async(product_slug)(product_id)
+    if slug is None:
+        raise Http404("No such product")
+    return HttpResponsePermanentRedirect(
+        reverse('product_page', args=[product_id, slug]))
 
 # ------------------ Review Views ------------------ #
 
 
-def review_delete(request, product_name, product_id, review_id):
+async def product_reviews(request, product_id):
+    """
+    JSON endpoint for the next page of a product's reviews, after the
+    ?cursor= position. Returns the rendered reviews and the cursor for
+    the page after them (null on the last page).
+    """
+    await current_user(request)
+    reviews, next_cursor = await sync_to_async(review_page)(
+        product_id, request.GET.get('cursor'))
+    html = await sync_to_async(render_to_string)(
+        "shop/review_list.html", {"reviews": reviews}, request)
+    return JsonResponse({"html": html, "next_cursor": next_cursor})
+
+
+def review_delete(request, product_id, slug, review_id):
     """
     Delete an individual review if the current user is the author.
     Shows a success or error message and redirects to the product page.
     """
-    queryset = Product.objects.exclude(stock_quantity=0)
-    product = get_object_or_404(queryset, product_name=product_name, id=product_id)
+    queryset = on_hand(Product.objects.all())
+    product = get_object_or_404(queryset, pk=product_id)
     review = get_object_or_404(Review, pk=review_id)
 
     if review.username == request.user:
-        review.delete()
+        with transaction.atomic():
+            deleted, _ = review.delete()
+            # A concurrent request may have deleted it first
+            if deleted:
+                discard_review(review)
         messages.add_message(request, messages.SUCCESS, 'Review deleted!')
     else:
         messages.add_message(request, messages.ERROR,
                              'You can only delete your own reviews!')
 
-    return HttpResponseRedirect(
-        reverse(
-            'product_page',
-            args=[
-                product_name,
-                product_id]))
+    return HttpResponseRedirect(product.get_absolute_url())
 
 
 # ---------------- Wishlist Views ---------------- #
 
 
-def view_wishlist(request):
+async def view_wishlist(request):
     """
     Display the current user's wishlist, with items sorted by line cost
     (product.price * wishlist_item.quantity).
     """
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
+    user = await current_user(request)
+    wishlist, created = await Wishlist.objects.aget_or_create(user=user)
 
     # Annotate each wishlist item with a computed line_total and sort by it descending
-    wishlist_items = Wishlist_Item.objects.filter(wishlist=wishlist).annotate(
+    wishlist_items = Wishlist_Item.objects.filter(
+        wishlist=wishlist
+    ).select_related('product').annotate(
         line_total=ExpressionWrapper(
             F('product__price'),
             output_field=DecimalField(max_digits=12, decimal_places=2)
         )
     ).order_by('-line_total')
 
-    return render(request, 'shop/wishlist.html', {
-        'wishlist_items': wishlist_items,
+    return await sync_to_async(render)(request, 'shop/wishlist.html', {
+        'wishlist_items': [item async for item in wishlist_items],
         'wishlist': wishlist,
     })
 
-def add_to_wishlist(request, product):
+async def add_to_wishlist(request, product):
     """
     Add a product to the user's wishlist. For normal requests redirect to view_wishlist.
     For AJAX requests return JSON so the frontend can show a modal without redirect.
     """
-    product = get_object_or_404(Product, id=product)
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-    wishlist_item, created = Wishlist_Item.objects.get_or_create(
+    user = await current_user(request)
+    product = await aget_object_or_404(Product, id=product)
+    wishlist, created = await Wishlist.objects.aget_or_create(user=user)
+    item, created = await Wishlist_Item.objects.aget_or_create(
         product=product, wishlist=wishlist)
-    # ensure saved (get_or_create already saved when created)
-    wishlist_item.save()
+    if created:
+        await sync_to_async(adjust_badge)(user.pk, 'wishlist', 1)
 
     # Return JSON for AJAX requests (fetch/XHR)
     if request.headers.get("x-requested-with") == "XMLHttpRequest":
@@ -145,6 +282,7 @@ def remove_from_wishlist(request, item_id):
     queryset = Wishlist_Item.objects.filter(wishlist=wishlist)
     wishlist_item = get_object_or_404(queryset, id=item_id)
     wishlist_item.delete()
+    adjust_badge(request.user.pk, 'wishlist', -1)
     return redirect('view_wishlist')
 
 
@@ -153,15 +291,19 @@ def save_cart_to_wishlist(request):
     Remove all items from the current user's cart, and adds them to the user's wishlist.
     Redirects to the cart view.
     """
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-
-    cart_items = Cart_Item.objects.filter(user=request.user)
-    for item in cart_items:
-        wishlist_item, created = Wishlist_Item.objects.get_or_create(
-        product=item.product, wishlist=wishlist)
-        # ensure saved (get_or_create already saved when created)
-        wishlist_item.save()
-        item.delete()
+    with transaction.atomic():
+        wishlist, created = Wishlist.objects.get_or_create(user=request.user)
+
+        cart_items = Cart_Item.objects.filter(user=request.user)
+        # Products already on the wishlist are skipped by the
+        # (wishlist, product) unique_together constraint
+        Wishlist_Item.objects.bulk_create(
+            [Wishlist_Item(wishlist=wishlist, product_id=product_id)
+             for product_id in cart_items.values_list('product_id', flat=True)],
+            ignore_conflicts=True)
+        # How many were new is not reported, so count the wishlist again
+        forget_badge([request.user.pk], 'wishlist')
+        release_cart_items(cart_items)
     return redirect('view_wishlist')
 
 
@@ -172,57 +314,112 @@ def clear_wishlist(request):
     """
     wishlist, created = Wishlist.objects.get_or_create(user=request.user)
 
-    wishlist_items = Wishlist_Item.objects.filter(wishlist=wishlist)
-    for item in wishlist_items:
-        item.delete()
+    removed, _ = Wishlist_Item.objects.filter(wishlist=wishlist).delete()
+    adjust_badge(request.user.pk, 'wishlist', -removed)
     return redirect('view_wishlist')
 
 
 # ------------------ Cart Views ------------------ #
 
 
-def view_cart(request):
+async def view_cart(request):
     """
     Display the current user's cart, with items sorted by line cost
-    (product.price * cart_item.quantity).
+    (product.price * cart_item.quantity). Visitors who are not logged
+    in see the guest cart kept in their cookie.
     """
-    cart_items = Cart_Item.objects.filter(user=request.user).annotate(
-        line_total=ExpressionWrapper(
-            F('product__price') * F('quantity'),
-            output_field=DecimalField(max_digits=12, decimal_places=2)
-        )
+    user = await current_user(request)
+    if not user.is_authenticated:
+        cart_items, total_price = await sync_to_async(guest_cart_lines)(
+            request)
+        return await sync_to_async(render)(request, 'shop/cart.html', {
+            'cart_items': cart_items,
+            'total_price': total_price
+        })
+
+    cart_items = Cart_Item.objects.filter(
+        user=user
+    ).select_related('product').annotate(
+        line_total=LINE_COST
     ).order_by('-line_total')
 
-    # total_price computed as before
-    total_price = sum(item.product.price * item.quantity for item in cart_items)
+    # Sum the line totals in the database rather than per row in Python
+    total_price = (await cart_items.aaggregate(
+        total=Coalesce(Sum('line_total'), Decimal('0.00'))
+    ))['total']
 
-    return render(request, 'shop/cart.html', {
-        'cart_items': cart_items,
+    return await sync_to_async(render)(request, 'shop/cart.html', {
+        'cart_items': [item async for item in cart_items],
         'total_price': total_price
     })
 
 
+def cart_change(request, line, message=None, error=False):
+    """
+    Finish a change to the cart. AJAX requests (fetch/XHR) get JSON with
+    the changed line's new quantity and cost and the new cart total, so
+    cart.html can update in place; other requests get the message on
+    the cart page. The JSON also carries the navbar's cart count.
+    line selects the changed line: a Q over Cart_Item for logged-in
+    users, the product id for guest carts, or None when the cart was
+    emptied.
+    """
+    if request.headers.get("x-requested-with") != "XMLHttpRequest":
+        if message:
+            messages.add_message(
+                request, messages.ERROR if error else messages.SUCCESS,
+                message)
+        return redirect('view_cart')
+
+    if line is None:
+        totals = {'total': Decimal('0.00'), 'item_id': None,
+                  'quantity': 0, 'line_total': Decimal('0.00')}
+    elif request.user.is_authenticated:
+        totals = cart_totals(request.user, line)
+    else:
+        totals = guest_cart_totals(request, line)
+    return JsonResponse(
+        {'status': 'error' if error else 'ok', 'message': message or '',
+         'cart_count': request_badges(request)['cart'], **totals},
+        status=409 if error else 200)
+
+
 def add_to_cart(request, product):
     """
-    Add a product to the user's cart, or increment quantity if already present.
-    Redirects to the cart view.
+    Add a product to the user's cart, or increment quantity if already present,
+    reserving the stock for it. Visitors who are not logged in add it to
+    their guest cart, which reserves stock once they log in.
+    Redirects to the cart view, or returns JSON for AJAX requests.
     """
-    product = Product.objects.get(id=product)
-    cart_item, created = Cart_Item.objects.get_or_create(
-        product=product, user=request.user)
-    cart_item.quantity += 1
-    cart_item.save()
-    return redirect('view_cart')
+    product = get_object_or_404(Product, id=product)
+    try:
+        if request.user.is_authenticated:
+            line = Q(product_id=product.id)
+            add_to_cart_item(request.user, product.id)
+        else:
+            line = product.id
+            add_to_guest_cart(request, product)
+    except OutOfStock:
+        return cart_change(
+            request, line, f"Sorry, {product.product_name} is out of stock",
+            error=True)
+    return cart_change(request, line)
 
 
 def remove_from_cart(request, item_id):
     """
-    Remove a specific item from the user's cart.
-    Redirects to the cart view.
+    Remove a specific item from the user's cart, returning its stock.
+    For guest carts the item id is the product id.
+    Redirects to the cart view, or returns JSON for AJAX requests.
     """
-    cart_item = Cart_Item.objects.get(id=item_id)
-    cart_item.delete()
-    return redirect('view_cart')
+    if not request.user.is_authenticated:
+        if not remove_from_guest_cart(request, item_id):
+            raise Http404("No such cart item")
+        return cart_change(request, item_id)
+    cart_items = Cart_Item.objects.filter(id=item_id, user=request.user)
+    if not release_cart_items(cart_items):
+        raise Http404("No such cart item")
+    return cart_change(request, Q(id=item_id))
 
 
 @require_POST
@@ -230,34 +427,60 @@ def increment_in_cart(request, cart_item_id, add_subtract):
     """
     Adjust Cart_Item.quantity by +1 (add_subtract=1) or -1 (add_subtract=0).
     If quantity would become <= 0, remove the Cart_Item.
-    Only modifies items owned by the current user.
+    Only modifies items owned by the current user, or for visitors the
+    product with that id in their guest cart.
+    Redirects to the cart view, or returns JSON for AJAX requests.
     """
-    # Ensure we only touch items belonging to the logged-in user
-    cart_item = get_object_or_404(Cart_Item, id=cart_item_id, user=request.user)
+    # Normalize add_subtract to a +1/-1 change, applied in the database
+    delta = -1 if int(add_subtract) == 0 else 1
+
+    # Only items belonging to the logged-in user are touched
+    try:
+        if request.user.is_authenticated:
+            line = Q(id=cart_item_id)
+            quantity = adjust_cart_item(request.user, cart_item_id, delta)
+        else:
+            line = cart_item_id
+            quantity = adjust_guest_cart(request, cart_item_id, delta)
+    except OutOfStock:
+        return cart_change(request, line, "No more in stock", error=True)
+    if quantity is None:
+        raise Http404("No such cart item")
+
+    if quantity == 0:
+        return cart_change(request, line, "Item removed from cart")
+    return cart_change(request, line, "Cart updated")
 
-    # Normalize add_subtract to int and apply change
-    if int(add_subtract) == 0:
-        cart_item.quantity = max(0, cart_item.quantity - 1)
-    else:
-        cart_item.quantity += 1
 
-    # If quantity is zero or less, delete the item; otherwise save the new quantity
-    if cart_item.quantity <= 0:
-        cart_item.delete()
-        messages.add_message(request, messages.SUCCESS, "Item removed from cart")
+def clear_cart(request):
+    """
+    Remove all items from the current user's cart, returning their stock.
+    Redirects to the cart view, or returns JSON for AJAX requests.
+    """
+    if not request.user.is_authenticated:
+        clear_guest_cart(request)
     else:
-        cart_item.save()
-        messages.add_message(request, messages.SUCCESS, "Cart updated")
+        release_cart_items(Cart_Item.objects.filter(user=request.user))
+    return cart_change(request, None)
 
-    return redirect('view_cart')
 
+# ------------------ Instrumentation ------------------ #
 
-def clear_cart(request):
+
+def metrics(request):
     """
-    Remove all items from the current user's cart.
-    Redirects to the cart view.
+    Per-view request counts, query counts and timings of all worker
+    processes in the Prometheus text format. Only exists while
+    REQUEST_METRICS is on; open to staff, or to scrapers sending
+    METRICS_TOKEN as a bearer token.
     """
-    cart_items = Cart_Item.objects.filter(user=request.user)
-    for item in cart_items:
-        item.delete()
-    return redirect('view_cart')
+    if not getattr(settings, 'REQUEST_METRICS', False):
+        raise Http404("Metrics are disabled")
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    bearer = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not (request.user.is_staff
+            or (token and constant_time_compare(bearer, token))):
+        raise Http404("Metrics are disabled")
+    return HttpResponse(
+        VIEW_METRICS.exposition(),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
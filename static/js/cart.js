@@ -0,0 +1,104 @@
+// Cart page: send +/-, remove and clear as AJAX requests and patch the
+// changed line and the total in place instead of reloading the cart.
+document.addEventListener("DOMContentLoaded", () => {
+    const form = document.getElementById("orderForm");
+    const itemsContainer = document.getElementById("cart-items-list");
+    if (!form || !itemsContainer) return;
+
+    const csrfInput = form.querySelector("input[name=csrfmiddlewaretoken]");
+    const csrftoken = csrfInput ? csrfInput.value : "";
+    const totalEl = document.getElementById("cart-total");
+    const emptyEl = document.getElementById("cart-empty");
+    const alertEl = document.getElementById("cart-alert");
+
+    // Same format as the line totals: whole numbers without decimals
+    function formatGold(value) {
+        const amount = parseFloat(value) || 0;
+        return Number.isInteger(amount) ? String(amount) : amount.toFixed(2);
+    }
+
+    function showAlert(message) {
+        if (!alertEl) return;
+        alertEl.textContent = message;
+        alertEl.classList.toggle("d-none", !message);
+    }
+
+    function updateLine(card, data) {
+        if (!data.item_id || data.quantity <= 0) {
+            card.remove();
+            return;
+        }
+        const qtyInput = card.querySelector("input[type=number]");
+        const priceEl = card.querySelector(".product-price-total");
+        if (qtyInput) qtyInput.value = data.quantity;
+        if (priceEl) {
+            priceEl.dataset.quantity = data.quantity;
+            priceEl.textContent = formatGold(data.line_total) + " GP";
+        }
+    }
+
+    function updateTotal(data) {
+        if (totalEl) totalEl.textContent = formatGold(data.total);
+        // Navbar badge (base.html) only exists while the cart is not empty
+        const badgeEl = document.getElementById("cart-badge");
+        if (badgeEl) {
+            badgeEl.textContent = data.cart_count;
+            badgeEl.classList.toggle("d-none", !data.cart_count);
+        }
+        if (emptyEl) {
+            emptyEl.classList.toggle("d-none", !!itemsContainer.querySelector(".cart-item"));
+        }
+    }
+
+    // POST a cart change; on any failure fall back to the plain request
+    function send(url, card, fallback) {
+        fetch(url, {
+            method: "POST",
+            headers: {
+                "X-Requested-With": "XMLHttpRequest",
+                "X-CSRFToken": csrftoken,
+            },
+        })
+            .then((r) => {
+                if (r.status !== 200 && r.status !== 409) throw new Error(r.status);
+                return r.json();
+            })
+            .then((data) => {
+                if (data.status === "ok") {
+                    if (card) {
+                        updateLine(card, data);
+                    } else {
+                        itemsContainer.querySelectorAll(".cart-item").forEach((el) => el.remove());
+                    }
+                }
+                updateTotal(data);
+                showAlert(data.status === "ok" ? "" : data.message);
+            })
+            .catch(fallback);
+    }
+
+    // +/- buttons submit the outer form to their formaction
+    itemsContainer.addEventListener("click", (ev) => {
+        const step = ev.target.closest(".cart-step");
+        if (step) {
+            ev.preventDefault();
+            send(step.getAttribute("formaction"), step.closest(".cart-item"),
+                () => form.requestSubmit(step));
+            return;
+        }
+        const remove = ev.target.closest(".cart-remove");
+        if (remove) {
+            ev.preventDefault();
+            send(remove.href, remove.closest(".cart-item"),
+                () => { window.location.href = remove.href; });
+        }
+    });
+
+    const clear = document.getElementById("cart-clear");
+    if (clear) {
+        clear.addEventListener("click", (ev) => {
+            ev.preventDefault();
+            send(clear.href, null, () => { window.location.href = clear.href; });
+        });
+    }
+});
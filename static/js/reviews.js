@@ -7,25 +7,65 @@ const deleteButtons = document.getElementsByClassName("btn-delete");
 const deleteConfirm = document.getElementById("deleteConfirm");
 
 /**
-* Initializes deletion functionality for the provided delete buttons.
+* Handles clicks on delete buttons, including those of reviews loaded later.
 * 
-* For each button in the `deleteButtons` collection:
-* - Retrieves the associated comment's ID upon click.
+* When a `.btn-delete` button inside the reviews container is clicked:
+* - Retrieves the associated comment's ID.
 * - Updates the `deleteConfirm` link's href to point to the 
 * deletion endpoint for the specific comment.
 * - Displays a confirmation modal (`deleteModal`) to prompt 
 * the user for confirmation before deletion.
 */
-for (let button of deleteButtons) {
-    console.log("Delete button is "+button);
-  button.addEventListener("click", (e) => {
-    console.log("button is clicked");
-    let reviewid = e.target.getAttribute("data-review_id");
-    console.log(`e.target is ${e.target} and reviewid is ${reviewid}`);
-    deleteConfirm.href = `delete_comment/${reviewid}`;
-    deleteModal.show();
-  });
-}
+const reviewsContainer = document.getElementById("reviews-container");
+reviewsContainer.addEventListener("click", (e) => {
+  const button = e.target.closest(".btn-delete");
+  if (!button) return;
+  let reviewid = button.getAttribute("data-review_id");
+  deleteConfirm.href = `delete_comment/${reviewid}`;
+  deleteModal.show();
+});
 
+/**
+* Loads the next page of reviews from the JSON endpoint when the
+* "More reviews" button is clicked or scrolls into view.
+* 
+* - Fetches `data-url?cursor=<data-cursor>` and inserts the returned
+* reviews above the button, initializing their star ratings.
+* - Stores the next cursor on the button, or removes the button once
+* the last page has been loaded.
+*/
+const moreButton = document.getElementById("reviews-more");
+let loadingReviews = false;
 
+function loadMoreReviews() {
+  if (loadingReviews || !moreButton.isConnected) return;
+  loadingReviews = true;
+  const url = `${moreButton.dataset.url}?cursor=${encodeURIComponent(moreButton.dataset.cursor)}`;
+  fetch(url, { headers: { "X-Requested-With": "XMLHttpRequest" } })
+    .then((r) => r.json())
+    .then((data) => {
+      const page = document.createElement("div");
+      page.innerHTML = data.html;
+      moreButton.before(page);
+      if (window.jQuery && jQuery.fn.rating) {
+        jQuery(page).find(".display-review-score").rating({ showClear: false, showCaption: false });
+      }
+      if (data.next_cursor) {
+        moreButton.dataset.cursor = data.next_cursor;
+      } else {
+        moreButton.remove();
+      }
+    })
+    .finally(() => {
+      loadingReviews = false;
+    });
+}
 
+if (moreButton) {
+  moreButton.addEventListener("click", loadMoreReviews);
+  if ("IntersectionObserver" in window) {
+    new IntersectionObserver((entries) => {
+      if (entries.some((entry) => entry.isIntersecting)) loadMoreReviews();
+    }, { rootMargin: "200px" }).observe(moreButton);
+  }
+}